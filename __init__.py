@@ -5,13 +5,12 @@ interact with AI models through a Facebook-like chat widget. It supports both
 cloud-based (HuggingFace) and local (LM Studio) AI backends.
 """
 
-import os
 import FreeCAD
 import FreeCADGui
-from PySide import QtGui
-from gui.chat_widget import ChatWidget
 
-# Global chat widget instance
+# Global chat widget instance; the GUI and AI modules (Qt widgets, aiohttp,
+# asyncio) are only imported when the chat is first opened so the addon adds
+# next to nothing to FreeCAD's startup
 chat_widget = None
 
 class AIChatWorkbench(FreeCADGui.Workbench):
@@ -109,6 +108,8 @@ class AIChatCommand:
         global chat_widget
         
         if chat_widget is None:
+            from gui.chat_widget import ChatWidget
+            
             # Create new chat widget instance
             chat_widget = ChatWidget(FreeCADGui.getMainWindow())
         
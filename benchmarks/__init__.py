@@ -0,0 +1 @@
+"""Benchmarks for the core AI backends against a local mock server."""
@@ -0,0 +1,259 @@
+"""Benchmark the LM Studio and HuggingFace backends against a mock server.
+
+Drives ``LMStudioService`` and ``HuggingFaceService`` through the
+non-streaming and streaming paths at several concurrency levels and
+context sizes, and writes one JSON document of results::
+
+    python -m benchmarks.bench_backends --output bench.json
+    python -m benchmarks.bench_backends --concurrency 1 8 --context 0 4000 \\
+        --latency 0.1 --token-rate 50 --baseline bench.json
+
+Scenario names and result keys are stable, so files from two versions can
+be diffed directly or passed back in with ``--baseline``.
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tracemalloc
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from core.metrics import percentile
+from core.context_builder import ContextBuilder
+from core.session_pool import session_pool
+from utils.settings import settings
+from .mock_server import MockServer
+
+BACKENDS = ("lmstudio", "huggingface")
+MODES = ("generate", "stream")
+PROMPT = "Suggest a fillet radius for a 3 mm aluminium bracket."
+
+def make_backend(name: str, base_url: str):
+    """Create an initialized backend pointed at the mock server."""
+    if name == "lmstudio":
+        from core.lmstudio_backend import LMStudioService
+        service = LMStudioService()
+        service.initialize()
+        service.api_base = f"{base_url}/v1"
+    else:
+        from core.huggingface_backend import HuggingFaceService
+        service = HuggingFaceService()
+        service.initialize()
+        service.endpoint = f"{base_url}/models/"
+        service.api_key = "benchmark"
+        service.headers = {"Authorization": "Bearer benchmark"}
+    service.session = session_pool.get_session(base_url)
+    return service
+
+def make_context(tokens: int, builder: ContextBuilder) -> List[Dict]:
+    """Build alternating turns totalling roughly ``tokens`` tokens."""
+    context = []
+    total = 0
+    turn = " ".join(f"word{index}" for index in range(100))
+    while total < tokens:
+        role = "user" if len(context) % 2 == 0 else "assistant"
+        msg = {"role": role, "content": turn}
+        context.append(msg)
+        total += builder.message_tokens(msg)
+    return context
+
+async def timed_request(service, mode: str, context: List[Dict]) -> Dict:
+    """Send one request and return its latency and time to first token."""
+    started = time.perf_counter()
+    first_token = None
+    try:
+        if mode == "stream":
+            async for _ in service.stream_response(PROMPT, context):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+        else:
+            await service.generate_response(PROMPT, context)
+    except Exception as e:
+        return {"error": str(e)}
+    latency = time.perf_counter() - started
+    # A non-streaming response delivers its first token with the last one
+    return {"latency": latency, "ttft": first_token if first_token is not None else latency}
+
+async def run_requests(service, mode: str, context: List[Dict], requests: int,
+                       concurrency: int) -> List[Dict]:
+    """Run ``requests`` requests with at most ``concurrency`` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one():
+        async with semaphore:
+            return await timed_request(service, mode, context)
+
+    return await asyncio.gather(*(run_one() for _ in range(requests)))
+
+async def memory_per_request(service, mode: str, context: List[Dict], concurrency: int) -> int:
+    """Return the peak traced allocation per in-flight request, in bytes.
+
+    Measured in a separate pass because tracing slows every allocation and
+    would distort the timing figures.
+    """
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await run_requests(service, mode, context, concurrency, concurrency)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return max(peak - baseline, 0) // concurrency
+
+async def run_scenario(server: MockServer, service, mode: str, concurrency: int,
+                       context_tokens: int, requests: int, builder: ContextBuilder) -> Dict:
+    """Benchmark one backend/mode/concurrency/context combination."""
+    context = make_context(context_tokens, builder)
+
+    # Warm the connection pool so the first requests do not pay for connects
+    await run_requests(service, mode, context, concurrency, concurrency)
+
+    bytes_before = server.bytes_received
+    requests_before = server.requests
+    started = time.perf_counter()
+    results = await run_requests(service, mode, context, requests, concurrency)
+    elapsed = time.perf_counter() - started
+    sent = server.requests - requests_before
+
+    latencies = [result["latency"] for result in results if "error" not in result]
+    ttfts = [result["ttft"] for result in results if "error" not in result]
+    errors = [result["error"] for result in results if "error" in result]
+
+    return {
+        "backend": service.name,
+        "mode": mode,
+        "concurrency": concurrency,
+        "context_tokens": context_tokens,
+        "requests": requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "elapsed": elapsed,
+        "requests_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "ttft_p50": percentile(ttfts, 0.5),
+        "ttft_p99": percentile(ttfts, 0.99),
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p99": percentile(latencies, 0.99),
+        "request_bytes": (server.bytes_received - bytes_before) // sent if sent else 0,
+        "memory_per_request": await memory_per_request(service, mode, context, concurrency)
+    }
+
+async def run_benchmarks(args) -> Dict:
+    """Start the mock server and run every requested scenario."""
+    server = MockServer(latency=args.latency, token_rate=args.token_rate, tokens=args.tokens)
+    base_url = await server.start()
+    builder = ContextBuilder.from_settings()
+    results = []
+    try:
+        for name in args.backends:
+            service = make_backend(name, base_url)
+            service.parameters["max_tokens"] = args.tokens
+            for mode in args.modes:
+                for concurrency in args.concurrency:
+                    for context_tokens in args.context:
+                        result = await run_scenario(
+                            server, service, mode, concurrency,
+                            context_tokens, args.requests, builder
+                        )
+                        print(f"{scenario_name(result)}: {result['requests_per_sec']:.1f} req/s, "
+                              f"ttft p50 {format_ms(result['ttft_p50'])}", file=sys.stderr)
+                        results.append(result)
+            await service.close()
+    finally:
+        await session_pool.close()
+        await server.stop()
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "aiohttp": aiohttp.__version__,
+            "connection_pool": settings.get("ai_backend", "connection_pool")
+        },
+        "server": {
+            "latency": args.latency,
+            "token_rate": args.token_rate,
+            "tokens": args.tokens
+        },
+        "results": results
+    }
+
+def scenario_name(result: Dict) -> str:
+    """Return the stable identifier of a scenario."""
+    return (f"{result['backend']}/{result['mode']}/"
+            f"c{result['concurrency']}/ctx{result['context_tokens']}")
+
+def format_ms(seconds: Optional[float]) -> str:
+    """Format a duration in milliseconds."""
+    return "n/a" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+def compare(report: Dict, baseline: Dict) -> List[str]:
+    """Describe how each scenario changed relative to ``baseline``."""
+    previous = {scenario_name(result): result for result in baseline.get("results", [])}
+    lines = []
+    for result in report["results"]:
+        name = scenario_name(result)
+        old = previous.get(name)
+        if old is None:
+            lines.append(f"{name}: new scenario")
+            continue
+        changes = []
+        for key in ("requests_per_sec", "ttft_p50", "latency_p99", "memory_per_request"):
+            if result[key] is None or not old.get(key):
+                continue
+            changes.append(f"{key} {(result[key] - old[key]) / old[key]:+.1%}")
+        lines.append(f"{name}: " + ", ".join(changes))
+    return lines
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_backends",
+        description="Benchmark the AI backends against a local mock server."
+    )
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16],
+                        help="concurrency levels to run (default: 1 4 16)")
+    parser.add_argument("--context", nargs="+", type=int, default=[0, 1000, 4000],
+                        help="context sizes in estimated tokens (default: 0 1000 4000)")
+    parser.add_argument("--requests", type=int, default=32,
+                        help="requests per scenario (default: 32)")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="mock server delay before the first token in seconds (default: 0.05)")
+    parser.add_argument("--token-rate", type=float, default=1000.0,
+                        help="mock server tokens per second, 0 for no pacing (default: 1000)")
+    parser.add_argument("--tokens", type=int, default=64,
+                        help="tokens per response (default: 64)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    """Run the benchmarks from the command line."""
+    args = parse_args(argv)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    report = asyncio.run(run_benchmarks(args))
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline is not None:
+        for line in compare(report, baseline):
+            print(line, file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Measure what importing the addon's modules costs.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` so
+earlier imports cannot hide its cost::
+
+    python -m benchmarks.bench_import --budget-ms 150
+    python -m benchmarks.bench_import core.ai_service gui.chat_widget
+
+The report lists the cumulative import time per module and the heavy
+dependencies it pulled in. The addon's ``__init__.py`` runs inside FreeCAD on
+every launch, so instead of timing it (which needs FreeCAD) the report lists
+its top-level imports; anything besides FreeCAD itself is startup cost. With
+``--budget-ms`` the exit status is 1 if a module exceeds the budget or the
+startup path imports more than FreeCAD.
+
+Each module is imported ``--repeat`` times and the fastest run is reported,
+as a single cold import varies by tens of milliseconds. Most of
+``core.ai_service`` is ``asyncio`` itself (about 60 ms), which the 150 ms
+budget leaves room for.
+"""
+
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["utils.settings", "core.ai_service", "core.metrics", "core.history_store"]
+HEAVY_PACKAGES = ("aiohttp", "asyncio", "jsonschema", "PySide", "numpy", "sqlite3")
+STARTUP_ALLOWED = {"FreeCAD", "FreeCADGui"}
+
+# -X importtime lines: "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+def measure(module: str, repeat: int = 1) -> Dict:
+    """Import ``module`` in fresh interpreters and return its lowest cost."""
+    results = [_measure_once(module) for _ in range(max(1, repeat))]
+    succeeded = [result for result in results if result["ok"]]
+    if not succeeded:
+        return results[0]
+    return min(succeeded, key=lambda result: result["cumulative_ms"])
+
+def _measure_once(module: str) -> Dict:
+    """Import ``module`` in a fresh interpreter and return its cost."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ADDON_DIR,
+        capture_output=True,
+        text=True
+    )
+    result = {"module": module, "ok": process.returncode == 0}
+    if not result["ok"]:
+        result["error"] = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else ""
+        return result
+
+    imported = {}
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imported[match.group(3)] = int(match.group(2))
+    result["cumulative_ms"] = imported.get(module, 0) / 1000
+    result["modules_imported"] = len(imported)
+    result["heavy"] = sorted(name for name in imported if name in HEAVY_PACKAGES)
+    return result
+
+def startup_imports() -> List[str]:
+    """Return the modules ``__init__.py`` imports at top level."""
+    with open(os.path.join(ADDON_DIR, "__init__.py"), 'r') as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            names.append(node.module)
+    return names
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_import",
+        description="Measure the import cost of the addon's modules."
+    )
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES,
+                        help=f"modules to import (default: {' '.join(DEFAULT_MODULES)})")
+    parser.add_argument("--budget-ms", type=float,
+                        help="fail if any module takes longer than this to import")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="import each module this many times and keep the fastest (default: 3)")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    """Run the import benchmark from the command line."""
+    args = parse_args(argv)
+    startup = startup_imports()
+    report = {
+        "python": sys.version.split()[0],
+        "startup_imports": startup,
+        "modules": [measure(module, args.repeat) for module in args.modules]
+    }
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.budget_ms is None:
+        return 0
+    failed = False
+    extra = [name for name in startup if name not in STARTUP_ALLOWED]
+    if extra:
+        print(f"__init__.py imports more than FreeCAD at startup: {', '.join(extra)}", file=sys.stderr)
+        failed = True
+    for result in report["modules"]:
+        if result["ok"] and result["cumulative_ms"] > args.budget_ms:
+            print(f"{result['module']} took {result['cumulative_ms']:.1f} ms "
+                  f"(budget {args.budget_ms:.1f} ms)", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import json
+import asyncio
+from typing import Optional
+from aiohttp import web
+
+class MockServer:
+    """In-process stand-in for the LM Studio and HuggingFace HTTP APIs.
+
+    Serves the OpenAI-compatible ``/v1/chat/completions`` route used by
+    LM Studio and the HuggingFace inference ``/models/<id>`` route, both
+    streaming (server-sent events) and non-streaming, plus LM Studio's
+    ``/v1/embeddings`` (hashed word features, after ``latency``). Every response waits
+    ``latency`` seconds before its first byte and then produces ``tokens``
+    tokens at ``token_rate`` tokens per second, so backend overhead can be
+    measured without a model or network in the way.
+    """
+
+    def __init__(self, latency: float = 0.05, token_rate: float = 200.0, tokens: int = 64,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self.bytes_received = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        """Return the scheme://host:port the server listens on."""
+        return f"http://{self.host}:{self.port}"
+
+    def _app(self) -> web.Application:
+        """Build the aiohttp application."""
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/v1/embeddings", self.embeddings)
+        app.router.add_post("/models/{model:.+}", self.text_generation)
+        return app
+
+    async def start(self) -> str:
+        """Start listening and return the base URL."""
+        self._runner = web.AppRunner(self._app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Pick up the port the OS assigned when port 0 was requested
+        self.port = self._runner.addresses[0][1]
+        return self.base_url
+
+    async def stop(self):
+        """Stop the server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _token_count(self, requested: Optional[int]) -> int:
+        """Return how many tokens to produce for a request."""
+        return min(self.tokens, requested) if requested else self.tokens
+
+    async def _read(self, request: web.Request) -> dict:
+        """Read a JSON request body and count it."""
+        body = await request.read()
+        self.requests += 1
+        self.bytes_received += len(body)
+        return json.loads(body)
+
+    async def _tokens(self, count: int):
+        """Yield ``count`` tokens paced at the configured token rate."""
+        await asyncio.sleep(self.latency)
+        interval = 1.0 / self.token_rate if self.token_rate else 0.0
+        for index in range(count):
+            if interval:
+                await asyncio.sleep(interval)
+            yield f"tok{index} "
+
+    async def _stream(self, request: web.Request, events) -> web.StreamResponse:
+        """Write ``events`` as a server-sent events response."""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            async for event in events:
+                data = event if isinstance(event, str) else json.dumps(event)
+                await response.write(f"data: {data}\n\n".encode("utf-8"))
+            await response.write_eof()
+        except ConnectionResetError:
+            # The client cancelled the stream
+            pass
+        return response
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        """Serve an OpenAI-compatible chat completion."""
+        payload = await self._read(request)
+        count = self._token_count(payload.get("max_tokens"))
+        model = payload.get("model", "mock")
+
+        if payload.get("stream"):
+            async def events():
+                async for token in self._tokens(count):
+                    yield {"model": model, "choices": [{"index": 0, "delta": {"content": token}}]}
+                yield {"model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield "[DONE]"
+            return await self._stream(request, events())
+
+        text = "".join([token async for token in self._tokens(count)])
+        return web.json_response({
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop"
+            }],
+            "usage": {"completion_tokens": count}
+        })
+
+    async def text_generation(self, request: web.Request) -> web.StreamResponse:
+        """Serve a HuggingFace text-generation request."""
+        payload = await self._read(request)
+        count = self._token_count(payload.get("parameters", {}).get("max_new_tokens"))
+
+        if payload.get("stream"):
+            async def events():
+                generated = []
+                async for token in self._tokens(count):
+                    generated.append(token)
+                    yield {"token": {"id": len(generated), "text": token, "special": False},
+                           "generated_text": None}
+                yield {"token": {"id": 0, "text": "</s>", "special": True},
+                       "generated_text": "".join(generated)}
+            return await self._stream(request, events())
+
+        text = "".join([token async for token in self._tokens(count)])
+        return web.json_response([{"generated_text": text}])
+
+    async def embeddings(self, request: web.Request) -> web.StreamResponse:
+        """Serve an OpenAI-compatible embeddings request."""
+        from core.embeddings import HashingEmbedder
+        payload = await self._read(request)
+        texts = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+        await asyncio.sleep(self.latency)
+        embedder = HashingEmbedder(64)
+        return web.json_response({
+            "model": payload.get("model", "mock"),
+            "data": [
+                {"index": index, "embedding": embedder.vector(text)}
+                for index, text in enumerate(texts)
+            ]
+        })
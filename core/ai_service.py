@@ -1,6 +1,13 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Awaitable, Dict, List, Optional
+import asyncio
+import atexit
+import concurrent.futures
+import contextlib
 import json
+import os
+import threading
+import time
 from utils.settings import settings
 
 class AIResponse:
@@ -9,9 +16,50 @@ class AIResponse:
         self.text = text
         self.metadata = metadata or {}
 
+class CancellationToken:
+    """Handle to an in-flight request running on the service loop.
+    
+    Cancelling it cancels the request task, which closes the underlying HTTP
+    response so the backend stops generating output nobody will read.
+    """
+    
+    def __init__(self, future: concurrent.futures.Future):
+        self.future = future
+    
+    def cancel(self) -> bool:
+        """Cancel the request; returns False if it already finished."""
+        return self.future.cancel()
+    
+    @property
+    def cancelled(self) -> bool:
+        """Whether the request was cancelled."""
+        return self.future.cancelled()
+    
+    def done(self) -> bool:
+        """Whether the request finished, failed or was cancelled."""
+        return self.future.done()
+    
+    def result(self, timeout: Optional[float] = None) -> AIResponse:
+        """Wait for and return the response."""
+        return self.future.result(timeout)
+    
+    def add_done_callback(self, callback):
+        """Call ``callback(token)`` once the request is done (on any thread)."""
+        self.future.add_done_callback(lambda future: callback(self))
+
 class AIService(ABC):
     """Abstract base class for AI service implementations."""
     
+    # Backend identifier, model name and sampling parameters; together they
+    # determine what a given prompt produces and are used for cache keys
+    name = ""
+    model = None
+    parameters: Dict = {}
+    
+    # Services that call other backends (the router) take scheduler slots
+    # per backend call instead of the manager taking one per request
+    self_scheduled = False
+    
     @abstractmethod
     def initialize(self) -> bool:
         """Initialize the AI service with current settings."""
@@ -22,10 +70,37 @@ class AIService(ABC):
         """Generate a response to the given message."""
         pass
     
+    async def stream_response(self, message: str, context: List[Dict] = None) -> AsyncIterator[str]:
+        """Yield the response to the given message as incremental text deltas.
+        
+        Backends that support token streaming override this; the default
+        falls back to a single delta containing the full response.
+        """
+        response = await self.generate_response(message, context)
+        yield response.text
+    
     @abstractmethod
     def is_available(self) -> bool:
         """Check if the service is available and properly configured."""
         pass
+    
+    def use_model(self, model: str):
+        """Point an initialized service at a different model."""
+        self.model = model
+    
+    def reconfigure(self, delta: Dict) -> bool:
+        """Apply changed settings to the running service.
+        
+        ``delta`` maps dotted ``ai_backend`` key paths (as delivered by
+        ``Settings.subscribe``) to their new values. Returns True if the
+        change was applied in place, or False if the service has to be
+        rebuilt; the default cannot apply anything.
+        """
+        return False
+    
+    async def close(self):
+        """Release any resources held by the service."""
+        pass
 
 class AIServiceFactory:
     """Factory for creating AI service instances."""
@@ -33,49 +108,666 @@ class AIServiceFactory:
     @staticmethod
     def create_service():
         """Create an AI service instance based on current settings."""
-        backend = settings.get("ai_backend", "active_backend")
-        
+        return AIServiceFactory.create_backend(settings.get("ai_backend", "active_backend"))
+    
+    @staticmethod
+    def create_backend(backend: str):
+        """Create an AI service instance for the named backend."""
         if backend == "huggingface":
             from .huggingface_backend import HuggingFaceService
             return HuggingFaceService()
         elif backend == "lmstudio":
             from .lmstudio_backend import LMStudioService
             return LMStudioService()
+        elif backend == "auto":
+            from .router import RoutingService
+            return RoutingService()
         else:
             raise ValueError(f"Unknown AI backend: {backend}")
 
 class AIServiceManager:
-    """Manages AI service lifecycle and configuration."""
+    """Manages AI service lifecycle and configuration.
+    
+    Requests run on a dedicated event loop thread owned by the manager so the
+    Qt GUI thread never blocks on network I/O. Callers hand coroutines to
+    ``submit()`` and receive a ``concurrent.futures.Future``.
+    
+    The manager follows settings changes: services are reconfigured in place
+    where they can be, and only rebuilt (or reconnected) when they cannot.
+    """
+    
+    # Settings sections the manager and its services depend on
+    SETTINGS_SECTIONS = ("ai_backend", "routing", "retry", "context", "cache", "scheduler")
+    
+    # Cache settings read on every request rather than when the cache is built
+    CACHE_LIVE_KEYS = ("cache.enabled", "cache.cache_sampled")
     
     def __init__(self):
         self._service = None
-        self._initialize_service()
+        self._cache = None
+        self._context_builder = None
+        self._retry = None
+        self._metrics = None
+        self._metric_sinks = []
+        self._target_services = {}
+        # "first" fan-out targets still running after their request returned
+        self._detached = set()
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        # Initialize in the background so whoever creates the manager (the
+        # chat window opening) does not wait on the backend
+        self.submit(self._warm_up())
+        self._unsubscribe = settings.subscribe("", self._on_settings_changed)
+        atexit.register(self.shutdown)
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background event loop thread if it is not running."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._run_loop,
+                    name="AIServiceLoop",
+                    daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+    
+    def _run_loop(self):
+        """Run the background event loop until shutdown."""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+    
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        """Schedule a coroutine on the background loop and return its future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+    
+    def run_sync(self, func, *args):
+        """Call a function on the loop thread and wait for its result.
+        
+        Service sessions are bound to the loop they are created on, so
+        (re)initialization must happen on the background loop as well.
+        """
+        async def call():
+            return func(*args)
+        return self.submit(call()).result()
     
     def _initialize_service(self):
-        """Initialize or reinitialize the AI service."""
+        """Initialize or reinitialize the AI service.
+        
+        Runs on the background loop; the previous service is closed
+        asynchronously while pooled connections stay open.
+        """
+        old_service = self._service
         self._service = AIServiceFactory.create_service()
+        if old_service is not None:
+            asyncio.ensure_future(old_service.close())
         if not self._service.initialize():
             raise RuntimeError("Failed to initialize AI service")
     
-    async def generate_response(self, message: str, context: List[Dict] = None) -> AIResponse:
-        """Generate a response using the current AI service."""
+    async def _warm_up(self):
+        """Initialize the service ahead of the first request."""
+        try:
+            self._initialize_service()
+        except Exception as e:
+            print(f"Failed to initialize AI service: {str(e)}")
+    
+    def _on_settings_changed(self, changes: Dict):
+        """Hand relevant settings changes to the service loop."""
+        if any(key.split(".")[0] in self.SETTINGS_SECTIONS for key in changes):
+            self.submit(self._reconfigure(changes))
+    
+    async def _reconfigure(self, changes: Dict):
+        """Apply changed settings, rebuilding services only when necessary."""
+        sections = {key.split(".")[0] for key in changes}
+        if "retry" in sections:
+            self._retry = None
+        if "context" in sections:
+            self._context_builder = None
+        if "scheduler" in sections:
+            from .scheduler import update_limits
+            update_limits()
+        if any(key.startswith("cache.") and key not in self.CACHE_LIVE_KEYS for key in changes):
+            self._cache = None
+        
+        backend_delta = {key: value for key, value in changes.items() if key.startswith("ai_backend.")}
+        routing_delta = {key: value for key, value in changes.items() if key.startswith("routing.")}
+        
+        reconnect = any(key.startswith("ai_backend.connection_pool.") for key in changes)
+        if reconnect:
+            # Connector limits are fixed when a session is created
+            from .session_pool import session_pool
+            await session_pool.close()
+        rebuild = reconnect or "ai_backend.active_backend" in changes
+        
+        service = self._service
+        if service is not None and not rebuild:
+            if backend_delta and not service.reconfigure(backend_delta):
+                rebuild = True
+            reconfigure_routing = getattr(service, "reconfigure_routing", None)
+            if routing_delta and reconfigure_routing is not None and not reconfigure_routing(routing_delta):
+                rebuild = True
+        if rebuild and service is not None:
+            try:
+                self._initialize_service()
+            except Exception as e:
+                print(f"Failed to reinitialize AI service: {str(e)}")
+        
+        for key, target in list(self._target_services.items()):
+            delta = backend_delta
+            if key[1] is not None:
+                # A fan-out target keeps the model it was created for
+                delta = {
+                    name: value for name, value in backend_delta.items()
+                    if not name.endswith((".model", ".model_path"))
+                }
+            if reconnect or (delta and not target.reconfigure(delta)):
+                del self._target_services[key]
+                await target.close()
+    
+    def _retry_policy(self):
+        """Return the retry policy shared by all backends."""
+        if self._retry is None:
+            from .retry import RetryPolicy
+            self._retry = RetryPolicy.from_settings()
+        return self._retry
+    
+    def _builder(self):
+        """Return the shared context builder (and token estimator)."""
+        if self._context_builder is None:
+            from .context_builder import ContextBuilder
+            self._context_builder = ContextBuilder.from_settings()
+        return self._context_builder
+    
+    def _slot(self, service: AIService, metrics=None):
+        """Return the scheduler slot a request to ``service`` has to hold."""
+        from .scheduler import get_scheduler, timed_slot
+        if service.self_scheduled:
+            return contextlib.nullcontext()
+        return timed_slot(get_scheduler(service.name), metrics)
+    
+    def scheduler_stats(self) -> Dict:
+        """Return running and waiting request counts per backend."""
+        from .scheduler import scheduler_stats
+        return scheduler_stats()
+    
+    async def _background(self, coro: Awaitable):
+        """Run ``coro`` with background priority, behind interactive requests."""
+        from .scheduler import PRIORITY_BACKGROUND, request_origin
+        request_origin.set((None, PRIORITY_BACKGROUND))
+        return await coro
+    
+    def build_context(self, history: List[Dict], message: str, summarizer=None,
+                      retriever=None, document: Optional[str] = None) -> List[Dict]:
+        """Pack as much recent history as fits the active model's token budget.
+        
+        With a ``ConversationSummarizer``, turns it already covers are replaced
+        by its summary, and once enough turns fall out of the budget a summary
+        update is scheduled on the background loop. With an ``AnswerRetriever``,
+        room is left for the earlier answers it adds when the request starts.
+        A ``document`` digest is placed first as a system message.
+        """
+        builder = self._builder()
+        service = self._service
+        budget = builder.budget_for(
+            service.name if service else None,
+            service.model if service else None
+        )
+        if retriever is not None:
+            budget = max(budget - retriever.reserve_tokens(builder.chars_per_token), 0)
+        document_msg = None
+        if document:
+            document_msg = {"role": "system", "content": document}
+            budget = max(budget - builder.message_tokens(document_msg), 0)
+        
+        summary = None
+        if summarizer is not None:
+            history = summarizer.uncovered(history)
+            summary = summarizer.summary or None
+        
+        dropped, context = builder.pack(history, message, budget, summary)
+        
+        if summarizer is not None and summarizer.should_update(dropped, builder.count_tokens):
+            summarizer.updating = True
+            self.submit(self._background(summarizer.update(list(dropped), self.generate_response)))
+        if document_msg is not None:
+            context = [document_msg] + context
+        return context
+    
+    def _cache_key(self, service: AIService, message: str, context: List[Dict] = None) -> Optional[str]:
+        """Return the response cache key, or None if caching does not apply."""
+        config = settings.get("cache")
+        if not config["enabled"]:
+            return None
+        
+        # Sampled responses differ on every call unless the user opts in
+        parameters = service.parameters
+        if parameters.get("temperature", 0) > 0 and not config["cache_sampled"]:
+            return None
+        
+        if self._cache is None:
+            from .response_cache import ResponseCache
+            self._cache = ResponseCache.from_settings()
+        return self._cache.make_key(
+            service.name,
+            service.model,
+            message,
+            context,
+            parameters
+        )
+    
+    def backend_health(self) -> Dict:
+        """Return rolling health figures per backend when routing is active."""
+        health = getattr(self._service, "health", None)
+        return health() if health is not None else {}
+    
+    def cache_stats(self) -> Dict:
+        """Return response cache hit/miss counters."""
+        if self._cache is None:
+            return {"hits": 0, "misses": 0, "hit_rate": 0.0, "size": 0}
+        return self._cache.stats()
+    
+    def clear_cache(self):
+        """Drop all cached responses."""
+        if self._cache is not None:
+            self._cache.clear()
+    
+    def _metrics_buffer(self):
+        """Return the in-memory metrics buffer, creating the sinks on first use."""
+        if self._metrics is None:
+            from .metrics import JsonlSink, RingBufferSink
+            config = settings.get("metrics")
+            self._metrics = RingBufferSink(config["buffer_size"])
+            self._metric_sinks.insert(0, self._metrics)
+            if config["jsonl_path"]:
+                self._metric_sinks.append(JsonlSink(os.path.join(
+                    os.path.dirname(settings.addon_path),
+                    config["jsonl_path"]
+                )))
+        return self._metrics
+    
+    def add_metrics_sink(self, sink):
+        """Also send every request's metrics to ``sink`` (a ``MetricsSink``)."""
+        self._metrics_buffer()
+        self._metric_sinks.append(sink)
+    
+    def metrics_summary(self, count: Optional[int] = None) -> Dict:
+        """Return rolling p50/p95 timings over the most recent requests."""
+        return self._metrics_buffer().summary(count)
+    
+    def recent_metrics(self, count: Optional[int] = None) -> List[Dict]:
+        """Return the metrics entries of the most recent requests."""
+        return self._metrics_buffer().recent(count)
+    
+    def metrics_prometheus(self) -> str:
+        """Return the buffered request metrics in Prometheus text format."""
+        from .metrics import prometheus_text
+        buffer = self._metrics_buffer()
+        return prometheus_text(buffer.recent(), buffer.totals())
+    
+    def _start_metrics(self, service: AIService, message: str, context: List[Dict] = None,
+                       metrics=None, stream: bool = False):
+        """Begin measuring a request on the current task."""
+        from .metrics import RequestMetrics, current_request
+        metrics = metrics if metrics is not None else RequestMetrics()
+        metrics.backend = service.name
+        metrics.model = service.model
+        metrics.stream = stream
+        builder = self._builder()
+        metrics.prompt_tokens = builder.count_tokens(message) + sum(
+            builder.message_tokens(msg) for msg in context or []
+        )
+        current_request.set(metrics)
+        return metrics
+    
+    def _finish_metrics(self, metrics, text: str, error: Optional[BaseException] = None) -> Dict:
+        """Stop measuring a request, record it in the sinks and return its entry."""
+        from .metrics import current_request
+        current_request.set(None)
+        metrics.completion_tokens = self._builder().count_tokens(text) if text else 0
+        metrics.finish(error)
+        entry = metrics.as_dict()
+        self._metrics_buffer()
+        for sink in self._metric_sinks:
+            try:
+                sink.record(entry)
+            except Exception as e:
+                print(f"Failed to record metrics: {str(e)}")
+        return entry
+    
+    def _current_service(self) -> AIService:
+        """Return the current service, reinitializing it if it is unavailable."""
         if not self._service or not self._service.is_available():
             self._initialize_service()
+        return self._service
+    
+    async def generate_response(self, message: str, context: List[Dict] = None,
+                                service: Optional[AIService] = None) -> AIResponse:
+        """Generate a response using the current (or the given) AI service."""
+        service = service or self._current_service()
+        metrics = self._start_metrics(service, message, context)
+        
+        cache_key = self._cache_key(service, message, context)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                metrics.cached = True
+                response = AIResponse(cached["text"], dict(cached["metadata"], cached=True))
+                response.metadata["metrics"] = self._finish_metrics(metrics, response.text)
+                return response
+        
+        attempts = []
+        
+        async def attempt():
+            metrics.new_attempt()
+            async with self._slot(service, metrics):
+                return await service.generate_response(message, context)
         
         try:
-            return await self._service.generate_response(message, context)
+            response = await self._retry_policy().run(attempt, attempts)
         except Exception as e:
             # Log the error and return an error response
             error_msg = f"Error generating response: {str(e)}"
+            metrics.retries = max(len(attempts) - 1, 0)
             return AIResponse(
                 text="I apologize, but I encountered an error while processing your request. "
                      "Please check your settings and try again.",
-                metadata={"error": error_msg}
+                metadata={
+                    "error": error_msg,
+                    "attempts": attempts,
+                    "metrics": self._finish_metrics(metrics, "", e)
+                }
             )
+        
+        response.metadata["attempts"] = attempts
+        response.metadata["retries"] = len(attempts) - 1
+        # A router reports the backend that actually answered
+        metrics.backend = response.metadata.get("backend", metrics.backend)
+        metrics.model = response.metadata.get("model", metrics.model)
+        metrics.retries = len(attempts) - 1
+        response.metadata["metrics"] = self._finish_metrics(metrics, response.text)
+        if cache_key is not None:
+            self._cache.put(cache_key, response.text, response.metadata)
+        return response
+    
+    async def stream_response(self, message: str, context: List[Dict] = None,
+                              attempts: Optional[List[Dict]] = None,
+                              service: Optional[AIService] = None,
+                              metrics=None) -> AsyncIterator[str]:
+        """Stream a response using the current (or the given) AI service.
+        
+        Failures before the first delta are retried under the retry policy;
+        each attempt is recorded in ``attempts`` when a list is given, and
+        timings and counters are filled into ``metrics`` (a
+        ``RequestMetrics``) when one is given.
+        """
+        service = service or self._current_service()
+        metrics = self._start_metrics(service, message, context, metrics, stream=True)
+        
+        cache_key = self._cache_key(service, message, context)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                metrics.cached = True
+                metrics.backend = cached["metadata"].get("backend", metrics.backend)
+                metrics.model = cached["metadata"].get("model", metrics.model)
+                self._finish_metrics(metrics, cached["text"])
+                yield cached["text"]
+                return
+        
+        policy = self._retry_policy()
+        attempts = attempts if attempts is not None else []
+        deltas = []
+        error = None
+        started = time.monotonic()
+        try:
+            while True:
+                attempt = len(attempts) + 1
+                attempt_started = time.monotonic()
+                metrics.new_attempt()
+                try:
+                    async with self._slot(service, metrics):
+                        async for delta in service.stream_response(message, context):
+                            metrics.mark("first_token")
+                            deltas.append(delta)
+                            yield delta
+                except Exception as e:
+                    # Only retry while nothing has been shown to the user
+                    delay = None if deltas else policy.next_delay(attempt, e, started)
+                    attempts.append(policy.record(attempt, attempt_started, e, delay))
+                    metrics.retries = len(attempts) - 1
+                    if delay is not None:
+                        await asyncio.sleep(delay)
+                        continue
+                    print(f"Error streaming response: {str(e)}")
+                    error = e
+                    if not deltas:
+                        yield ("I apologize, but I encountered an error while processing your request. "
+                               "Please check your settings and try again.")
+                    return
+                attempts.append(policy.record(attempt, attempt_started))
+                metrics.retries = len(attempts) - 1
+                break
+        except (asyncio.CancelledError, GeneratorExit) as e:
+            error = e
+            raise
+        finally:
+            self._finish_metrics(metrics, "".join(deltas), error)
+        
+        if cache_key is not None and deltas:
+            # A router sets the backend that actually streamed
+            self._cache.put(cache_key, "".join(deltas), {
+                "model": metrics.model,
+                "backend": metrics.backend
+            })
+    
+    def request(self, message: str, context: List[Dict] = None, stream: bool = False,
+                on_delta=None, conversation: Optional[str] = None,
+                priority: int = 0, retriever=None, on_retrieved=None) -> CancellationToken:
+        """Start a request on the background loop and return its cancellation token.
+        
+        With ``stream`` set, ``on_delta(delta)`` is called on the loop thread
+        for every text delta. The token resolves to the complete ``AIResponse``.
+        When the backend is busy the request waits in ``conversation``'s queue;
+        lower ``priority`` values are served first. With an ``AnswerRetriever``,
+        similar earlier answers are passed to ``on_retrieved(results)`` and
+        added to the context before the request is sent.
+        """
+        async def run():
+            from .scheduler import request_origin
+            request_origin.set((conversation, priority))
+            nonlocal context
+            if retriever is not None:
+                results = await retriever.retrieve(message, context)
+                if on_retrieved is not None:
+                    on_retrieved(results)
+                context = retriever.augment(context, results)
+            if not stream:
+                return await self.generate_response(message, context)
+            
+            from .metrics import RequestMetrics
+            deltas = []
+            attempts = []
+            metrics = RequestMetrics()
+            async for delta in self.stream_response(message, context, attempts, metrics=metrics):
+                deltas.append(delta)
+                if on_delta is not None:
+                    on_delta(delta)
+            return AIResponse("".join(deltas), {
+                "model": metrics.model,
+                "backend": metrics.backend,
+                "attempts": attempts,
+                "retries": max(len(attempts) - 1, 0),
+                "metrics": metrics.as_dict()
+            })
+        
+        return CancellationToken(self.submit(run()))
+    
+    def get_target_service(self, target: Dict) -> AIService:
+        """Return a warm service for a fan-out ``{"backend", "model"}`` target."""
+        key = (target["backend"], target.get("model"))
+        service = self._target_services.get(key)
+        if service is None or not service.is_available():
+            service = AIServiceFactory.create_backend(target["backend"])
+            if not service.initialize():
+                raise RuntimeError(f"Failed to initialize {target['backend']} backend")
+            if target.get("model"):
+                service.use_model(target["model"])
+            self._target_services[key] = service
+        return service
+    
+    async def generate_many(self, message: str, context: List[Dict] = None,
+                            targets: Optional[List[Dict]] = None, mode: str = "all",
+                            on_delta=None, on_result=None,
+                            rest: Optional[List] = None) -> List[Optional[AIResponse]]:
+        """Send one prompt to several backend/model targets concurrently.
+        
+        ``targets`` defaults to ``fanout.targets``. With ``on_delta`` set,
+        targets stream and ``on_delta(index, delta)`` is called per delta;
+        ``on_result(index, response)`` is called as each target finishes.
+        
+        Modes:
+        - ``"all"``: wait for every target; returns all responses in order.
+        - ``"first"``: return as soon as one target succeeds; the others keep
+          running and report through ``on_result``. Their tasks are appended
+          to ``rest`` so the caller can await or cancel them; without it they
+          are cancelled when the manager shuts down.
+        - ``"cancel_rest"``: return the first success and cancel the others.
+        
+        The returned list holds None for targets that have not finished.
+        """
+        targets = targets if targets is not None else settings.get("fanout", "targets")
+        results = [None] * len(targets)
+        
+        async def run(index, target):
+            started = time.monotonic()
+            try:
+                service = self.get_target_service(target)
+                if on_delta is None:
+                    response = await self.generate_response(message, context, service=service)
+                else:
+                    from .metrics import RequestMetrics
+                    deltas = []
+                    metrics = RequestMetrics()
+                    async for delta in self.stream_response(message, context, service=service,
+                                                            metrics=metrics):
+                        deltas.append(delta)
+                        on_delta(index, delta)
+                    response = AIResponse("".join(deltas), {
+                        "model": service.model,
+                        "backend": service.name,
+                        "metrics": metrics.as_dict()
+                    })
+            except Exception as e:
+                response = AIResponse("", {
+                    "model": target.get("model"),
+                    "backend": target["backend"],
+                    "error": f"Error generating response: {str(e)}"
+                })
+            response.metadata["latency"] = time.monotonic() - started
+            results[index] = response
+            if on_result is not None:
+                on_result(index, response)
+            return response
+        
+        tasks = [asyncio.ensure_future(run(index, target)) for index, target in enumerate(targets)]
+        if mode == "all":
+            await asyncio.gather(*tasks)
+            return results
+        
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if any(not task.result().metadata.get("error") for task in done):
+                    break
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            raise
+        if mode == "cancel_rest":
+            for task in pending:
+                task.cancel()
+        elif rest is not None:
+            rest.extend(pending)
+        else:
+            for task in pending:
+                self._detached.add(task)
+                task.add_done_callback(self._detached.discard)
+        return results
+    
+    def request_many(self, message: str, context: List[Dict] = None,
+                     targets: Optional[List[Dict]] = None, mode: str = "all",
+                     on_delta=None, on_result=None, conversation: Optional[str] = None,
+                     priority: int = 0) -> CancellationToken:
+        """Start ``generate_many`` on the background loop and return its token.
+        
+        In ``"first"`` mode the token stays pending until every target has
+        finished, so cancelling it also stops the targets still running.
+        """
+        async def run():
+            from .scheduler import request_origin
+            request_origin.set((conversation, priority))
+            rest = []
+            results = await self.generate_many(message, context, targets, mode, on_delta, on_result, rest)
+            # Cancelling the gather cancels the remaining targets with it
+            await asyncio.gather(*rest)
+            return results
+        
+        return CancellationToken(self.submit(run()))
     
     def switch_backend(self):
         """Switch to a different AI backend."""
-        self._initialize_service()
+        self.run_sync(self._initialize_service)
+    
+    async def _close(self):
+        """Close the current service and all pooled connections."""
+        from .session_pool import session_pool
+        for task in list(self._detached):
+            task.cancel()
+        if self._service is not None:
+            await self._service.close()
+        for service in self._target_services.values():
+            await service.close()
+        await session_pool.close()
+    
+    def shutdown(self):
+        """Close the current service and stop the background loop."""
+        self._unsubscribe()
+        with self._loop_lock:
+            loop, thread = self._loop, self._loop_thread
+            self._loop = None
+            self._loop_thread = None
+        if loop is None:
+            return
+        
+        if loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self._close(), loop).result(timeout=5)
+            except Exception as e:
+                print(f"Failed to close AI service: {str(e)}")
+        
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        if not thread.is_alive():
+            loop.close()
+
+# The manager starts a thread and an event loop, so it is only created on
+# first use rather than when the addon is imported
+_service_manager = None
+_service_manager_lock = threading.Lock()
+
+def get_service_manager() -> AIServiceManager:
+    """Return the global service manager, creating it on first use."""
+    global _service_manager
+    with _service_manager_lock:
+        if _service_manager is None:
+            _service_manager = AIServiceManager()
+        return _service_manager
 
-# Create global service manager instance
-service_manager = AIServiceManager()
+def __getattr__(name):
+    # Keep ``from core.ai_service import service_manager`` working, lazily
+    if name == "service_manager":
+        return get_service_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,208 @@
+"""Headless batch prompt runner.
+
+Reads prompts from a JSONL file, sends them through ``AIServiceManager``
+with bounded concurrency and appends one JSONL result per prompt::
+
+    python -m core.batch prompts.jsonl results.jsonl --concurrency 4
+
+Each input line is ``{"id": ..., "prompt": ..., "context": [...]}``; ``id``
+defaults to the line number and ``context`` is optional. Prompts whose id
+already has a successful result in the output file are skipped, so an
+interrupted run can be resumed by running the same command again. Once a
+run finishes, the output keeps one result per id: a retried prompt's new
+result replaces its earlier error.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, List, Optional, Set
+
+from .context_builder import ContextBuilder
+from .metrics import percentile
+
+def load_prompts(path: str) -> List[Dict]:
+    """Read prompts from a JSONL file, assigning line numbers as default ids."""
+    prompts = []
+    with open(path, 'r') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt": record}
+            record.setdefault("id", number)
+            prompts.append(record)
+    return prompts
+
+def completed_ids(path: str, retry_errors: bool = True) -> Set[str]:
+    """Return the ids that already have a result in the output file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn last line from an interrupted run
+                continue
+            if retry_errors and record.get("error"):
+                continue
+            done.add(str(record.get("id")))
+    return done
+
+def dedupe_results(path: str):
+    """Rewrite the output file with one result per id, in first-seen order.
+
+    A later result replaces an earlier one unless it is an error and the
+    earlier one is not. Torn lines are dropped.
+    """
+    if not os.path.exists(path):
+        return
+    results = {}
+    lines = 0
+    with open(path, 'r') as f:
+        for line in f:
+            lines += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            key = str(record.get("id"))
+            earlier = results.get(key)
+            if earlier is None or not record.get("error") or earlier.get("error"):
+                results[key] = record
+    if len(results) == lines:
+        return
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        for record in results.values():
+            f.write(json.dumps(record) + "\n")
+    os.replace(temp_path, path)
+
+async def run_batch(manager, prompts: List[Dict], output_path: str, concurrency: int = 4,
+                    target: Optional[Dict] = None) -> Dict:
+    """Run ``prompts`` through ``manager`` and append results to ``output_path``.
+
+    Must run on the manager's event loop. Token counts are taken from the
+    request metrics. Returns summary statistics.
+    """
+    builder = ContextBuilder.from_settings()
+    semaphore = asyncio.Semaphore(concurrency)
+    service = manager.get_target_service(target) if target else None
+    latencies = []
+    errors = 0
+    started = time.monotonic()
+
+    with open(output_path, 'a') as out:
+        async def run_one(record):
+            nonlocal errors
+            prompt = record["prompt"]
+            context = record.get("context") or []
+            async with semaphore:
+                request_started = time.monotonic()
+                try:
+                    response = await manager.generate_response(prompt, context, service=service)
+                    text = response.text
+                    metadata = response.metadata
+                    error = metadata.get("error")
+                except Exception as e:
+                    text = ""
+                    metadata = {}
+                    error = str(e)
+                latency = time.monotonic() - request_started
+
+            if error:
+                errors += 1
+                text = ""
+            else:
+                latencies.append(latency)
+            metrics = metadata.get("metrics")
+            if metrics is None:
+                # The request failed before it was measured
+                metrics = {
+                    "prompt_tokens": builder.count_tokens(prompt) + sum(
+                        builder.message_tokens(msg) for msg in context
+                    ),
+                    "completion_tokens": 0
+                }
+
+            result = {
+                "id": record["id"],
+                "prompt": prompt,
+                "response": text,
+                "error": error,
+                "latency": latency,
+                "prompt_tokens": metrics["prompt_tokens"],
+                "completion_tokens": metrics["completion_tokens"] if text else 0,
+                "backend": metadata.get("backend"),
+                "model": metadata.get("model"),
+                "retries": metadata.get("retries", 0),
+                "cached": metadata.get("cached", False)
+            }
+            # One complete line per result keeps the file resumable
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+        await asyncio.gather(*(run_one(record) for record in prompts))
+
+    dedupe_results(output_path)
+    elapsed = time.monotonic() - started
+    return {
+        "prompts": len(prompts),
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(prompts) / elapsed if elapsed else 0.0,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95)
+    }
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m core.batch",
+        description="Run a JSONL file of prompts against the configured AI backend."
+    )
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("output", help="JSONL file to append results to")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="maximum number of requests in flight (default: 4)")
+    parser.add_argument("--backend", help="backend to use instead of the active one")
+    parser.add_argument("--model", help="model to use with --backend")
+    parser.add_argument("--no-retry-errors", action="store_true",
+                        help="when resuming, skip prompts whose earlier result was an error")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    """Run the batch from the command line."""
+    from .ai_service import get_service_manager
+
+    args = parse_args(argv)
+    prompts = load_prompts(args.input)
+    done = completed_ids(args.output, retry_errors=not args.no_retry_errors)
+    remaining = [record for record in prompts if str(record["id"]) not in done]
+    print(f"{len(remaining)} of {len(prompts)} prompts to run "
+          f"({len(prompts) - len(remaining)} already done)", file=sys.stderr)
+
+    target = {"backend": args.backend, "model": args.model} if args.backend else None
+    service_manager = get_service_manager()
+    summary = service_manager.submit(run_batch(
+        service_manager,
+        remaining,
+        args.output,
+        concurrency=args.concurrency,
+        target=target
+    )).result()
+    service_manager.shutdown()
+
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
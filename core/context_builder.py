@@ -0,0 +1,136 @@
+import re
+import math
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from utils.settings import settings
+
+# Words and individual punctuation marks; a cheap stand-in for BPE pieces
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+class ContextBuilder:
+    """Packs recent conversation history into a per-model token budget.
+
+    Token counts are estimated locally (no tokenizer download) and cached per
+    message text, so rebuilding the context on every send only estimates the
+    messages that are new since the last call. History is packed newest
+    first until the budget is used up; older turns are either dropped or
+    condensed into a short system note.
+    """
+
+    MESSAGE_OVERHEAD = 4
+    CACHE_SIZE = 4096
+
+    def __init__(self, budgets: Dict = None, chars_per_token: float = 4.0,
+                 overflow: str = "drop", summary_ratio: float = 0.2):
+        self.budgets = budgets or {"default": 2048}
+        self.chars_per_token = chars_per_token
+        self.overflow = overflow
+        self.summary_ratio = summary_ratio
+        self._token_cache = OrderedDict()
+
+    @classmethod
+    def from_settings(cls):
+        """Create a builder from the ``context`` settings section."""
+        config = settings.get("context")
+        return cls(
+            budgets=config["budgets"],
+            chars_per_token=config["chars_per_token"],
+            overflow=config["overflow"],
+            summary_ratio=config["summary_ratio"]
+        )
+
+    def budget_for(self, backend: str = None, model: str = None) -> int:
+        """Return the token budget for a model, falling back to its backend."""
+        for key in (model, backend):
+            if key and key in self.budgets:
+                return self.budgets[key]
+        return self.budgets["default"]
+
+    def count_tokens(self, text: str) -> int:
+        """Estimate the number of tokens in ``text``."""
+        cached = self._token_cache.get(text)
+        if cached is not None:
+            self._token_cache.move_to_end(text)
+            return cached
+
+        count = max(
+            len(TOKEN_PATTERN.findall(text)),
+            math.ceil(len(text) / self.chars_per_token)
+        )
+        self._token_cache[text] = count
+        if len(self._token_cache) > self.CACHE_SIZE:
+            self._token_cache.popitem(last=False)
+        return count
+
+    def message_tokens(self, msg: Dict) -> int:
+        """Estimate the tokens a message costs, including role framing."""
+        return self.count_tokens(msg["content"]) + self.MESSAGE_OVERHEAD
+
+    def pack(self, history: List[Dict], message: str, budget: int,
+             summary: Optional[str] = None) -> Tuple[List[Dict], List[Dict]]:
+        """Split ``history`` into the dropped turns and the context to send.
+
+        The budget covers the context plus the new ``message``. A ``summary``
+        of earlier turns, when given, is placed first as a system message and
+        counted against the budget.
+        """
+        remaining = budget - self.count_tokens(message) - self.MESSAGE_OVERHEAD
+
+        prefix = []
+        if summary:
+            summary_msg = {"role": "system", "content": summary}
+            remaining -= self.message_tokens(summary_msg)
+            prefix.append(summary_msg)
+
+        selected = []
+        index = len(history)
+        while index > 0:
+            msg = history[index - 1]
+            cost = self.message_tokens(msg)
+            if cost > remaining:
+                break
+            remaining -= cost
+            selected.append({"role": msg["role"], "content": msg["content"]})
+            index -= 1
+        selected.reverse()
+
+        dropped = history[:index]
+        if dropped and not summary and self.overflow == "summarize":
+            note = self.condense(dropped, int(budget * self.summary_ratio))
+            if note:
+                prefix.append({"role": "system", "content": note})
+                # Make room for the note by giving up the oldest kept turns
+                remaining -= self.count_tokens(note) + self.MESSAGE_OVERHEAD
+                while selected and remaining < 0:
+                    remaining += self.message_tokens(selected.pop(0))
+                    index += 1
+                dropped = history[:index]
+
+        return dropped, prefix + selected
+
+    def build(self, history: List[Dict], message: str, budget: int,
+              summary: Optional[str] = None) -> List[Dict]:
+        """Return the most recent history that fits ``budget`` tokens."""
+        return self.pack(history, message, budget, summary)[1]
+
+    def condense(self, messages: List[Dict], budget: int) -> str:
+        """Condense dropped turns into a short extractive note.
+
+        Keeps the first sentence of each turn, newest first, until the
+        budget runs out.
+        """
+        lines = []
+        remaining = budget - self.count_tokens("Earlier in the conversation:")
+        for msg in reversed(messages):
+            first_sentence = re.split(r"(?<=[.!?])\s|\n", msg["content"].strip(), 1)[0]
+            line = f"- {msg['role']}: {first_sentence}"
+            cost = self.count_tokens(line)
+            if cost > remaining:
+                break
+            remaining -= cost
+            lines.append(line)
+
+        if not lines:
+            return ""
+        lines.reverse()
+        return "Earlier in the conversation:\n" + "\n".join(lines)
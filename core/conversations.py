@@ -0,0 +1,323 @@
+import os
+import json
+import atexit
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+from utils.settings import settings
+from .ai_service import get_service_manager
+from .history_store import HistoryStore
+from .retrieval import AnswerRetriever
+from .search_index import SearchIndex
+from .summarizer import ConversationSummarizer
+
+# The conversation that keeps the single-chat history files, so history
+# recorded before conversations existed opens as the first one
+DEFAULT_CONVERSATION = "default"
+
+class Conversation:
+    """One named chat thread with its own history log and rolling summary.
+
+    ``messages`` holds the loaded tail of the history plus everything
+    recorded since; ``unsaved`` the messages not yet appended to the log.
+    """
+
+    def __init__(self, conversation_id: str, title: str, history: HistoryStore,
+                 summarizer: Optional[ConversationSummarizer] = None,
+                 index: Optional[SearchIndex] = None,
+                 retriever: Optional[AnswerRetriever] = None):
+        self.id = conversation_id
+        self.title = title
+        self.history = history
+        self.summarizer = summarizer
+        self.index = index
+        self.retriever = retriever
+        self.messages: List[Dict] = []
+        self.unsaved: List[Dict] = []
+        self._cursor = 0
+
+    @property
+    def has_older(self) -> bool:
+        """Whether older messages than the loaded ones exist."""
+        return bool(self._cursor)
+
+    def load_recent(self, limit: int) -> List[Dict]:
+        """Load the most recent ``limit`` messages and return them."""
+        self._update_index()
+        messages, self._cursor = self.history.read_page(limit=limit)
+        self.messages = messages + self.unsaved
+        return messages
+
+    def load_older(self, limit: int) -> List[Dict]:
+        """Load the page before the loaded messages and return it."""
+        if not self._cursor:
+            return []
+        messages, self._cursor = self.history.read_page(self._cursor, limit=limit)
+        self.messages[:0] = messages
+        return messages
+
+    def record(self, role: str, content: str, **extra) -> Dict:
+        """Add a message, saving it right away if auto-save is enabled."""
+        msg = {
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now().isoformat()
+        }
+        msg.update(extra)
+        self.messages.append(msg)
+        self.unsaved.append(msg)
+        if settings.get("history", "auto_save"):
+            self.save()
+        return msg
+
+    def save(self):
+        """Append unsaved messages to the history log."""
+        try:
+            for msg in self.unsaved:
+                self.history.append(msg)
+            self.unsaved = []
+        except Exception as e:
+            print(f"Failed to save chat history: {str(e)}")
+        self._update_index()
+
+    def _update_index(self):
+        """Index whatever was appended to the history log, in the background."""
+        if self.retriever is not None:
+            self.retriever.schedule_update(self.id, self.history)
+        if self.index is not None:
+            self.index.schedule_update(self.id, self.history)
+
+    def build_context(self, message: str, document: Optional[str] = None) -> List[Dict]:
+        """Return the context for ``message`` from this conversation's history.
+
+        ``document`` is a digest of the user's model placed ahead of the history.
+        """
+        return get_service_manager().build_context(
+            [msg for msg in self.messages if not msg.get("alternate")],
+            message,
+            summarizer=self.summarizer,
+            retriever=self.retriever,
+            document=document
+        )
+
+    def export(self) -> List[Dict]:
+        """Return the whole conversation, not just the loaded tail."""
+        return self.history.load() + self.unsaved
+
+    def flush(self):
+        """Save pending messages and force them to disk."""
+        self.save()
+        self.history.sync()
+
+    def close(self):
+        """Save pending messages and close the history log."""
+        self.save()
+        self.history.close()
+
+class ConversationManager:
+    """Named conversations stored side by side in the history directory.
+
+    ``conversations.json`` lists the conversations in tab order with their
+    titles. Each conversation has its own history log and summary under
+    ``conversations/``; the default one keeps ``chat_history.jsonl`` and
+    ``summary.json``. Conversations are opened on first use, so a long list
+    of them costs one small index read at startup. With ``search.enabled``
+    every conversation feeds one shared ``SearchIndex``, and with
+    ``retrieval.enabled`` one shared ``AnswerRetriever``.
+    """
+
+    INDEX_FILE = "conversations.json"
+    SUBDIRECTORY = "conversations"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.entries: List[Dict] = []
+        self.active = DEFAULT_CONVERSATION
+        self._open: Dict[str, Conversation] = {}
+        self.search_index: Optional[SearchIndex] = None
+        if settings.get("search", "enabled"):
+            try:
+                self.search_index = SearchIndex(os.path.join(directory, "search.db"))
+            except Exception as e:
+                print(f"Failed to open search index: {str(e)}")
+        self.retriever: Optional[AnswerRetriever] = None
+        if settings.get("retrieval", "enabled"):
+            if not AnswerRetriever.available():
+                print("Answer retrieval needs NumPy, which is not installed")
+            else:
+                try:
+                    self.retriever = AnswerRetriever.from_settings(os.path.join(directory, "retrieval"))
+                except Exception as e:
+                    print(f"Failed to open answer index: {str(e)}")
+        self._load_index()
+        # The chat window is hidden and shown again, so histories and the
+        # index stay open until FreeCAD exits
+        atexit.register(self.close)
+
+    @classmethod
+    def from_settings(cls):
+        """Create a manager for the configured history directory."""
+        return cls(os.path.join(
+            os.path.dirname(settings.addon_path),
+            settings.get("history", "save_path")
+        ))
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, self.INDEX_FILE)
+
+    def _load_index(self):
+        """Load the conversation list, starting with the default conversation."""
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    index = json.load(f)
+                self.entries = index.get("conversations", [])
+                self.active = index.get("active", self.active)
+            except Exception as e:
+                print(f"Failed to load conversation list: {str(e)}")
+        if not self.entries:
+            self.entries = [{
+                "id": DEFAULT_CONVERSATION,
+                "title": "Chat",
+                "created": datetime.now().isoformat()
+            }]
+        if self.entry(self.active) is None:
+            self.active = self.entries[0]["id"]
+
+    def _save_index(self):
+        """Atomically store the conversation list."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({"conversations": self.entries, "active": self.active}, f, indent=2)
+            os.replace(temp_path, self.index_path)
+        except Exception as e:
+            print(f"Failed to save conversation list: {str(e)}")
+
+    def _filenames(self, conversation_id: str) -> Dict[str, str]:
+        """Return the history and summary file names, relative to the directory."""
+        if conversation_id == DEFAULT_CONVERSATION:
+            return {"history": "chat_history.jsonl", "summary": "summary.json"}
+        return {
+            "history": os.path.join(self.SUBDIRECTORY, f"{conversation_id}.jsonl"),
+            "summary": os.path.join(self.SUBDIRECTORY, f"{conversation_id}.summary.json")
+        }
+
+    def entry(self, conversation_id: str) -> Optional[Dict]:
+        """Return the index entry of a conversation, or None."""
+        for entry in self.entries:
+            if entry["id"] == conversation_id:
+                return entry
+        return None
+
+    def list(self) -> List[Dict]:
+        """Return the conversations in tab order."""
+        return list(self.entries)
+
+    def get(self, conversation_id: str) -> Conversation:
+        """Return a conversation, opening its history on first use."""
+        conversation = self._open.get(conversation_id)
+        if conversation is None:
+            entry = self.entry(conversation_id)
+            if entry is None:
+                raise KeyError(f"Unknown conversation: {conversation_id}")
+            filenames = self._filenames(conversation_id)
+            conversation = Conversation(
+                conversation_id,
+                entry["title"],
+                HistoryStore.from_settings(os.path.join(self.directory, filenames["history"])),
+                ConversationSummarizer.from_settings(os.path.join(self.directory, filenames["summary"]))
+                if settings.get("summary", "enabled") else None,
+                self.search_index,
+                self.retriever
+            )
+            self._open[conversation_id] = conversation
+        return conversation
+
+    def create(self, title: Optional[str] = None) -> Conversation:
+        """Start a new, empty conversation."""
+        conversation_id = uuid.uuid4().hex[:12]
+        self.entries.append({
+            "id": conversation_id,
+            "title": title or f"Chat {len(self.entries) + 1}",
+            "created": datetime.now().isoformat()
+        })
+        self._save_index()
+        return self.get(conversation_id)
+
+    def rename(self, conversation_id: str, title: str):
+        """Change a conversation's title."""
+        entry = self.entry(conversation_id)
+        if entry is None:
+            raise KeyError(f"Unknown conversation: {conversation_id}")
+        entry["title"] = title
+        if conversation_id in self._open:
+            self._open[conversation_id].title = title
+        self._save_index()
+
+    def reorder(self, conversation_ids: List[str]):
+        """Store the conversations in the given order."""
+        position = {conversation_id: index for index, conversation_id in enumerate(conversation_ids)}
+        self.entries.sort(key=lambda entry: position.get(entry["id"], len(position)))
+        self._save_index()
+
+    def set_active(self, conversation_id: str):
+        """Remember the conversation to show first next time."""
+        if conversation_id != self.active and self.entry(conversation_id) is not None:
+            self.active = conversation_id
+            self._save_index()
+
+    def delete(self, conversation_id: str):
+        """Remove a conversation and its history files."""
+        entry = self.entry(conversation_id)
+        if entry is None:
+            return
+        conversation = self._open.pop(conversation_id, None)
+        if conversation is not None:
+            conversation.history.close()
+        filenames = list(self._filenames(conversation_id).values())
+        filenames.append(f"{filenames[0]}.scanned")
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Failed to delete {filename}: {str(e)}")
+        if self.search_index is not None:
+            self.search_index.schedule_delete(conversation_id)
+        if self.retriever is not None:
+            self.retriever.remove_conversation(conversation_id)
+        self.entries.remove(entry)
+        if self.active == conversation_id:
+            self.active = self.entries[0]["id"] if self.entries else DEFAULT_CONVERSATION
+        self._save_index()
+
+    def search(self, query: str, **filters) -> List[Dict]:
+        """Search all conversations; see ``SearchIndex.search`` for the filters.
+
+        Each result also carries the ``title`` of its conversation.
+        """
+        if self.search_index is None:
+            return []
+        filters.setdefault("limit", settings.get("search", "max_results"))
+        results = self.search_index.search(query, **filters)
+        for result in results:
+            entry = self.entry(result["conversation"])
+            result["title"] = entry["title"] if entry else result["conversation"]
+        return results
+
+    def flush(self):
+        """Save every open conversation without closing it."""
+        for conversation in self._open.values():
+            conversation.flush()
+
+    def close(self):
+        """Save and close every open conversation; only done at shutdown."""
+        for conversation in self._open.values():
+            conversation.close()
+        self._open.clear()
+        if self.search_index is not None:
+            self.search_index.close()
@@ -0,0 +1,376 @@
+import json
+import math
+import hashlib
+from collections import Counter
+from typing import Dict, List, Tuple
+from utils.settings import settings
+
+# Sketch constraints that carry a length or angle worth quoting
+DIMENSIONAL_CONSTRAINTS = ("Distance", "DistanceX", "DistanceY", "Radius", "Diameter", "Angle")
+
+def _round(value: float) -> float:
+    """Round a coordinate for display, folding -0.0 into 0.0."""
+    return round(value, 3) + 0.0
+
+def _format_number(value: float) -> str:
+    """Format a rounded number without trailing zeros."""
+    return f"{_round(value):g}"
+
+class DocumentContext:
+    """Compact digest of the active FreeCAD document for the system prompt.
+
+    Each object is serialized into a small dict (type, label, placement,
+    shape bounds, sketch constraints, group children) that is cached until
+    the object changes: a document observer drops an object's digest when
+    one of its properties changes, and an object whose touch/recompute
+    state differs from the cached one is serialized again as well. While
+    nothing in the document or the selection has changed, the rendered
+    digest is returned as is, so a large assembly costs one dictionary
+    lookup per send instead of a walk over its tree.
+
+    FreeCAD's API is not thread-safe, so ``digest`` must be called on the
+    GUI thread.
+    """
+
+    MAX_SELECTION = 20
+    MAX_USES = 8
+
+    def __init__(self):
+        # Per document: object name -> (object state, digest)
+        self._digests: Dict[str, Dict[str, Tuple[Tuple, Dict]]] = {}
+        # Per document: change counter bumped by the observer
+        self._versions: Dict[str, int] = {}
+        # Per document: (render key, rendered text)
+        self._rendered: Dict[str, Tuple[Tuple, str]] = {}
+        # Per document: (version, content hash)
+        self._fingerprints: Dict[str, Tuple[int, str]] = {}
+        self._observing = False
+
+    # Document observer slots, called by FreeCAD on the GUI thread
+
+    def _changed(self, obj):
+        try:
+            document = obj.Document.Name
+            name = obj.Name
+        except Exception:
+            return
+        self._versions[document] = self._versions.get(document, 0) + 1
+        self._digests.get(document, {}).pop(name, None)
+
+    def slotCreatedObject(self, obj):
+        self._changed(obj)
+
+    def slotDeletedObject(self, obj):
+        self._changed(obj)
+
+    def slotChangedObject(self, obj, prop):
+        self._changed(obj)
+
+    def slotRecomputedObject(self, obj):
+        self._changed(obj)
+
+    def slotRelabelDocument(self, doc):
+        self._versions[doc.Name] = self._versions.get(doc.Name, 0) + 1
+
+    def slotDeletedDocument(self, doc):
+        for cache in (self._digests, self._versions, self._rendered, self._fingerprints):
+            cache.pop(doc.Name, None)
+
+    def _observe(self, FreeCAD):
+        """Register as a document observer on first use."""
+        if self._observing:
+            return
+        try:
+            FreeCAD.addDocumentObserver(self)
+            self._observing = True
+        except Exception as e:
+            print(f"Document changes cannot be tracked, digests are rebuilt per send: {str(e)}")
+
+    def digest(self) -> str:
+        """Return the digest of the active document, or "" if there is none.
+
+        Failures are logged and yield "", so the digest never blocks a send.
+        """
+        config = settings.get("document_context")
+        if not config["enabled"]:
+            return ""
+        try:
+            import FreeCAD
+        except ImportError:
+            return ""
+        doc = FreeCAD.ActiveDocument
+        if doc is None:
+            return ""
+
+        try:
+            self._observe(FreeCAD)
+            selection = self._selection(doc) if config["include_selection"] else []
+            key = (
+                self._versions.get(doc.Name, 0),
+                tuple((sel.ObjectName, tuple(sel.SubElementNames)) for sel in selection),
+                config["format"],
+                config["max_chars"]
+            )
+            cached = self._rendered.get(doc.Name)
+            if self._observing and cached is not None and cached[0] == key:
+                return cached[1]
+
+            objects = self._collect(doc)
+            selected = self._describe_selection(selection)
+            if config["format"] == "json":
+                text = self._render_json(doc, objects, selected, config["max_chars"])
+            else:
+                text = self._render_text(doc, objects, selected, config["max_chars"])
+            self._rendered[doc.Name] = (key, text)
+            return text
+        except Exception as e:
+            print(f"Failed to describe the FreeCAD document: {str(e)}")
+            return ""
+
+    def fingerprint(self) -> str:
+        """Return a hash of the active document's content, or "" if there is none.
+
+        Equal fingerprints mean every object digest is the same, so work
+        that depends only on the document can be reused.
+        """
+        try:
+            import FreeCAD
+        except ImportError:
+            return ""
+        doc = FreeCAD.ActiveDocument
+        if doc is None:
+            return ""
+        self._observe(FreeCAD)
+        version = self._versions.get(doc.Name, 0)
+        cached = self._fingerprints.get(doc.Name)
+        if self._observing and cached is not None and cached[0] == version:
+            return cached[1]
+        content = json.dumps(self._collect(doc), sort_keys=True, separators=(",", ":"))
+        fingerprint = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        self._fingerprints[doc.Name] = (version, fingerprint)
+        return fingerprint
+
+    def snapshot(self, doc) -> Dict[str, Dict]:
+        """Return the digest of every object in ``doc`` by name."""
+        return self._collect(doc)
+
+    def _collect(self, doc) -> Dict[str, Dict]:
+        """Return the digest of every object in ``doc``, serializing only changed ones."""
+        cache = self._digests.get(doc.Name, {})
+        current = {}
+        for obj in doc.Objects:
+            state = tuple(obj.State)
+            entry = cache.get(obj.Name)
+            if entry is None or entry[0] != state:
+                try:
+                    entry = (state, self._serialize(obj, state))
+                except Exception as e:
+                    entry = (state, {"name": obj.Name, "type": obj.TypeId, "error": str(e)})
+            current[obj.Name] = entry
+        # Rebuilding the dict drops objects that no longer exist
+        self._digests[doc.Name] = current
+        return {name: entry[1] for name, entry in current.items()}
+
+    def _serialize(self, obj, state: Tuple) -> Dict:
+        """Serialize one document object."""
+        digest = {"name": obj.Name, "type": obj.TypeId}
+        if obj.Label != obj.Name:
+            digest["label"] = obj.Label
+        if not getattr(obj, "Visibility", True):
+            digest["hidden"] = True
+        if "Invalid" in state or "Error" in state:
+            digest["error"] = "recompute failed"
+
+        placement = getattr(obj, "Placement", None)
+        if placement is not None and not placement.isIdentity():
+            base = placement.Base
+            rotation = placement.Rotation
+            digest["placement"] = {
+                "at": [_round(base.x), _round(base.y), _round(base.z)],
+                "axis": [_round(rotation.Axis.x), _round(rotation.Axis.y), _round(rotation.Axis.z)],
+                "angle": _round(math.degrees(rotation.Angle))
+            }
+
+        children = [child.Name for child in getattr(obj, "Group", None) or []]
+        if children:
+            digest["children"] = children
+        uses = [dep.Name for dep in obj.OutList if dep.Name not in children]
+        if uses:
+            digest["uses"] = uses[:self.MAX_USES]
+
+        shape = getattr(obj, "Shape", None)
+        if shape is not None and not shape.isNull():
+            box = shape.BoundBox
+            digest["shape"] = {
+                "type": shape.ShapeType,
+                "size": [_round(box.XLength), _round(box.YLength), _round(box.ZLength)]
+            }
+            if shape.ShapeType in ("Solid", "CompSolid", "Compound"):
+                digest["shape"]["volume"] = _round(shape.Volume)
+
+        if obj.TypeId == "Sketcher::SketchObject":
+            digest["sketch"] = self._sketch(obj)
+        return digest
+
+    @staticmethod
+    def _sketch(obj) -> Dict:
+        """Summarize a sketch's geometry and constraints."""
+        constraints = obj.Constraints
+        dimensions = {}
+        for index, constraint in enumerate(constraints):
+            if constraint.Type not in DIMENSIONAL_CONSTRAINTS:
+                continue
+            value = constraint.Value
+            if constraint.Type == "Angle":
+                value = math.degrees(value)
+            dimensions[constraint.Name or f"{constraint.Type}{index + 1}"] = _round(value)
+        sketch = {
+            "geometry": len(obj.Geometry),
+            "constraints": dict(Counter(constraint.Type for constraint in constraints)),
+            "dimensions": dimensions
+        }
+        fully_constrained = getattr(obj, "FullyConstrained", None)
+        if fully_constrained is not None:
+            sketch["fully_constrained"] = bool(fully_constrained)
+        return sketch
+
+    def _selection(self, doc) -> List:
+        """Return the GUI selection in ``doc``, or nothing outside the GUI."""
+        try:
+            import FreeCADGui
+            return FreeCADGui.Selection.getSelectionEx(doc.Name)[:self.MAX_SELECTION]
+        except Exception:
+            return []
+
+    @staticmethod
+    def _describe_selection(selection) -> List[Dict]:
+        """Describe selected objects and sub-elements, with face type and area."""
+        selected = []
+        for sel in selection:
+            if not sel.SubElementNames:
+                selected.append({"object": sel.ObjectName})
+                continue
+            for sub_name, sub in zip(sel.SubElementNames, sel.SubObjects):
+                item = {"object": sel.ObjectName, "element": sub_name}
+                if sub_name.startswith("Face"):
+                    item["surface"] = type(sub.Surface).__name__
+                    item["area"] = _round(sub.Area)
+                elif sub_name.startswith("Edge"):
+                    item["length"] = _round(sub.Length)
+                selected.append(item)
+        return selected
+
+    @staticmethod
+    def _tree_order(objects: Dict[str, Dict]) -> List[Tuple[int, Dict]]:
+        """Return (depth, digest) pairs with group children under their group."""
+        contained = {child for digest in objects.values() for child in digest.get("children", ())}
+        ordered = []
+        visited = set()
+
+        def visit(name, depth):
+            if name in visited or name not in objects:
+                return
+            visited.add(name)
+            digest = objects[name]
+            ordered.append((depth, digest))
+            for child in digest.get("children", ()):
+                visit(child, depth + 1)
+
+        for name in objects:
+            if name not in contained:
+                visit(name, 0)
+        # Objects only reachable through a group cycle
+        for name in objects:
+            visit(name, 0)
+        return ordered
+
+    @staticmethod
+    def describe(digest: Dict) -> str:
+        """Render one object digest as a line of text."""
+        text = digest["name"]
+        if "label" in digest:
+            text += f' "{digest["label"]}"'
+        text += f' [{digest["type"]}]'
+        placement = digest.get("placement")
+        if placement:
+            text += " at ({})".format(", ".join(_format_number(v) for v in placement["at"]))
+            if placement["angle"]:
+                axis = ", ".join(_format_number(v) for v in placement["axis"])
+                text += f" rotated {_format_number(placement['angle'])}° about ({axis})"
+        shape = digest.get("shape")
+        if shape:
+            text += "; {} {} mm".format(shape["type"], "×".join(_format_number(v) for v in shape["size"]))
+            if "volume" in shape:
+                text += f", volume {_format_number(shape['volume'])} mm³"
+        sketch = digest.get("sketch")
+        if sketch:
+            counts = ", ".join(f"{kind} {count}" for kind, count in sorted(sketch["constraints"].items()))
+            text += f"; {sketch['geometry']} geometries, {sum(sketch['constraints'].values())} constraints"
+            if counts:
+                text += f" ({counts})"
+            if sketch["dimensions"]:
+                text += "; " + ", ".join(
+                    f"{name}={_format_number(value)}" for name, value in sketch["dimensions"].items()
+                )
+            if sketch.get("fully_constrained"):
+                text += "; fully constrained"
+        if "uses" in digest:
+            text += "; uses " + ", ".join(digest["uses"])
+        if digest.get("hidden"):
+            text += " (hidden)"
+        if "error" in digest:
+            text += f" (error: {digest['error']})"
+        return text
+
+    def _render_text(self, doc, objects: Dict[str, Dict], selected: List[Dict], max_chars: int) -> str:
+        """Render the digest as an indented outline of at most ``max_chars``."""
+        lines = [
+            f'Active FreeCAD document "{doc.Label}" ({len(objects)} objects; '
+            "lengths in mm, angles in degrees):"
+        ]
+        if selected:
+            items = []
+            for item in selected:
+                text = item["object"]
+                if "element" in item:
+                    text += "." + item["element"]
+                details = [item["surface"]] if "surface" in item else []
+                if "area" in item:
+                    details.append(f"area {_format_number(item['area'])} mm²")
+                if "length" in item:
+                    details.append(f"length {_format_number(item['length'])} mm")
+                if details:
+                    text += f" ({', '.join(details)})"
+                items.append(text)
+            lines.append("Selected: " + "; ".join(items))
+
+        length = sum(len(line) + 1 for line in lines)
+        ordered = self._tree_order(objects)
+        for shown, (depth, digest) in enumerate(ordered):
+            line = "  " * depth + "- " + self.describe(digest)
+            if length + len(line) + 1 > max_chars:
+                lines.append(f"... {len(ordered) - shown} more objects")
+                break
+            lines.append(line)
+            length += len(line) + 1
+        return "\n".join(lines)
+
+    def _render_json(self, doc, objects: Dict[str, Dict], selected: List[Dict], max_chars: int) -> str:
+        """Render the digest as compact JSON of at most about ``max_chars``."""
+        head = json.dumps({"document": doc.Label, "selection": selected}, separators=(",", ":"))[:-1]
+        parts = []
+        length = len(head)
+        ordered = self._tree_order(objects)
+        for _, digest in ordered:
+            part = json.dumps(digest, separators=(",", ":"), ensure_ascii=False)
+            if length + len(part) + 1 > max_chars:
+                break
+            parts.append(part)
+            length += len(part) + 1
+        text = head + ',"objects":[' + ",".join(parts) + "]"
+        if len(parts) < len(ordered):
+            text += f',"omitted":{len(ordered) - len(parts)}'
+        return text + "}"
+
+# Global digest cache shared by all chat tabs
+document_context = DocumentContext()
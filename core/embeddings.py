@@ -0,0 +1,156 @@
+from abc import ABC, abstractmethod
+import re
+import hashlib
+from typing import Callable, Dict, List, Optional
+from utils.settings import settings
+
+# Lower-cased words; hashed features are built from these and their pairs
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+class Embedder(ABC):
+    """Turns texts into fixed-size vectors for similarity search.
+
+    Subclasses implement ``embed``; the vectors need not be normalized.
+    ``signature`` identifies the vector space, so an index built with one
+    embedder is not searched with another.
+    """
+
+    name = ""
+    # Whether embedding calls go to a backend server (and take its slots)
+    remote = False
+
+    @property
+    def signature(self) -> str:
+        return self.name
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Return one vector per text."""
+        pass
+
+class HashingEmbedder(Embedder):
+    """Feature-hashed bag of words and word pairs.
+
+    Needs no model or network, so it always works, but it only finds
+    rephrasings that share vocabulary; a real embedding model also finds
+    answers worded differently.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.dimensions}"
+
+    def vector(self, text: str) -> List[float]:
+        """Return the hashed feature vector of ``text``."""
+        vector = [0.0] * self.dimensions
+        words = WORD_PATTERN.findall(text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            # The top bit picks the sign so colliding features tend to cancel
+            vector[digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        return vector
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self.vector(text) for text in texts]
+
+class LMStudioEmbedder(Embedder):
+    """Embeddings from a local model served by LM Studio (``/v1/embeddings``)."""
+
+    name = "lmstudio"
+    remote = True
+
+    def __init__(self, api_base: str, model: str):
+        self.api_base = api_base
+        self.model = model
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        from .retry import error_from_response
+        from .session_pool import session_pool
+        session = session_pool.get_session(self.api_base)
+        async with session.post(
+            f"{self.api_base}/embeddings",
+            json={"model": self.model, "input": texts},
+            timeout=session_pool.request_timeout()
+        ) as response:
+            if response.status != 200:
+                raise await error_from_response(response)
+            data = await response.json()
+        return [item["embedding"] for item in sorted(data["data"], key=lambda item: item["index"])]
+
+class HuggingFaceEmbedder(Embedder):
+    """Embeddings from the HuggingFace inference API (feature extraction)."""
+
+    name = "huggingface"
+    remote = True
+
+    def __init__(self, endpoint: str, model: str, api_key: str):
+        self.endpoint = endpoint
+        self.model = model
+        self.headers = {"Authorization": f"Bearer {api_key}"}
+
+    @property
+    def signature(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        from .retry import error_from_response
+        from .session_pool import session_pool
+        session = session_pool.get_session(self.endpoint)
+        async with session.post(
+            f"{self.endpoint.rstrip('/')}/{self.model}",
+            json={"inputs": texts, "options": {"wait_for_model": True}},
+            headers=self.headers,
+            timeout=session_pool.request_timeout()
+        ) as response:
+            if response.status != 200:
+                raise await error_from_response(response)
+            result = await response.json()
+        return [self._pool(item) for item in result]
+
+    @staticmethod
+    def _pool(item) -> List[float]:
+        """Mean-pool per-token vectors; sentence models already return one vector."""
+        if item and isinstance(item[0], list):
+            return [sum(column) / len(item) for column in zip(*item)]
+        return item
+
+def _lmstudio_embedder() -> Embedder:
+    config = settings.get("ai_backend", "lmstudio")
+    return LMStudioEmbedder(
+        f"http://{config['host']}:{config['port']}/v1",
+        settings.get("retrieval", "model")
+    )
+
+def _huggingface_embedder() -> Embedder:
+    config = settings.get("ai_backend", "huggingface")
+    return HuggingFaceEmbedder(config["endpoint"], settings.get("retrieval", "model"), config["api_key"])
+
+def _hashing_embedder() -> Embedder:
+    return HashingEmbedder(settings.get("retrieval", "dimensions"))
+
+# Factories by ``retrieval.embedder`` name; add entries with register_embedder
+EMBEDDERS: Dict[str, Callable[[], Embedder]] = {
+    "hashing": _hashing_embedder,
+    "lmstudio": _lmstudio_embedder,
+    "huggingface": _huggingface_embedder
+}
+
+def register_embedder(name: str, factory: Callable[[], Embedder]):
+    """Make an embedding function available as ``retrieval.embedder = name``."""
+    EMBEDDERS[name] = factory
+
+def create_embedder(name: Optional[str] = None) -> Embedder:
+    """Create the configured (or the named) embedder."""
+    name = name or settings.get("retrieval", "embedder")
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder: {name}")
+    return EMBEDDERS[name]()
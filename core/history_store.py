@@ -0,0 +1,307 @@
+import os
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+from utils.settings import settings
+
+class HistoryStore:
+    """Append-only JSONL chat history.
+
+    Each message is one line, so recording a message costs O(1) I/O no matter
+    how long the history is. Lines are flushed to the OS on every append and
+    fsynced in batches. A torn trailing line left by a crash is truncated on
+    open, and corrupt records found while reading are removed by compaction,
+    which rewrites the log atomically.
+
+    Paged reads only ever see the recent end of the log, so on close the
+    whole log is also scanned once it has grown ``compact_growth`` times
+    since the last scan; the size at that scan is kept next to the log.
+
+    Opening the store and reading recent messages only touch the end of the
+    file, so startup cost does not grow with the size of the history.
+    """
+
+    READ_BLOCK = 64 * 1024
+    # Smaller logs are cheap to read in full and are not scanned on growth
+    MIN_SCAN_SIZE = 1024 * 1024
+
+    def __init__(self, path: str, fsync_batch: int = 20, fsync_interval: float = 1.0,
+                 compact_threshold: int = 1000, compact_growth: float = 2.0):
+        self.path = path
+        self.scan_path = f"{path}.scanned"
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
+        self.compact_growth = compact_growth
+        # Byte offsets of corrupt records, so re-reading one counts it once
+        self._dead_offsets = set()
+        self._pending_sync = 0
+        self._last_sync = time.monotonic()
+        self._file = None
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._migrate_legacy_history()
+        self._recover()
+
+    @classmethod
+    def from_settings(cls, filename: str = "chat_history.jsonl"):
+        """Create a store from the ``history`` settings section.
+
+        A relative ``filename`` is taken from the history directory.
+        """
+        config = settings.get("history")
+        history_dir = os.path.join(
+            os.path.dirname(settings.addon_path),
+            config["save_path"]
+        )
+        return cls(
+            os.path.join(history_dir, filename),
+            fsync_batch=config["fsync_batch"],
+            fsync_interval=config["fsync_interval"],
+            compact_threshold=config["compact_threshold"],
+            compact_growth=config["compact_growth"]
+        )
+
+    def _migrate_legacy_history(self):
+        """Convert a full-file ``chat_history.json`` into the append-only log."""
+        legacy_path = os.path.join(os.path.dirname(self.path), "chat_history.json")
+        if os.path.exists(self.path) or not os.path.exists(legacy_path):
+            return
+
+        try:
+            with open(legacy_path, 'r') as f:
+                messages = json.load(f)
+            self._rewrite(messages)
+            os.replace(legacy_path, f"{legacy_path}.migrated")
+        except Exception as e:
+            print(f"Failed to migrate chat history: {str(e)}")
+
+    def _recover(self):
+        """Truncate a torn trailing record left by a crash."""
+        if not os.path.exists(self.path):
+            return
+
+        size = os.path.getsize(self.path)
+        if size == 0:
+            return
+
+        with open(self.path, 'r+b') as f:
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+
+            # Walk back to the end of the last complete record
+            position = size
+            good_offset = 0
+            while position > 0:
+                read_size = min(self.READ_BLOCK, position)
+                position -= read_size
+                f.seek(position)
+                index = f.read(read_size).rfind(b"\n")
+                if index >= 0:
+                    good_offset = position + index + 1
+                    break
+
+            f.truncate(good_offset)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @property
+    def dead_records(self) -> int:
+        """Number of distinct corrupt records seen since the last compaction."""
+        return len(self._dead_offsets)
+
+    def _decode(self, line: bytes, offset: int) -> Optional[Dict]:
+        """Decode the log line at byte ``offset``, returning None for corrupt records."""
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            self._dead_offsets.add(offset)
+            return None
+        return record
+
+    def _open(self):
+        """Open the log for appending."""
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def append(self, message: Dict):
+        """Append one message and fsync once the batch size or interval is reached."""
+        f = self._open()
+        f.write(json.dumps(message).encode("utf-8") + b"\n")
+        f.flush()
+        self._pending_sync += 1
+        if (self._pending_sync >= self.fsync_batch or
+                time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+
+    def sync(self):
+        """Force buffered records to disk."""
+        if self._file is not None and self._pending_sync:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._pending_sync = 0
+        self._last_sync = time.monotonic()
+
+    def clear(self):
+        """Delete all messages."""
+        self._close_file()
+        with open(self.path, 'wb') as f:
+            os.fsync(f.fileno())
+        self._dead_offsets.clear()
+
+    def load(self) -> List[Dict]:
+        """Return all messages in order."""
+        messages = []
+        if not os.path.exists(self.path):
+            return messages
+
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                record = self._decode(line, offset)
+                offset += len(line)
+                if record is not None:
+                    messages.append(record)
+        return messages
+
+    def read_page(self, before: Optional[int] = None, limit: int = 100) -> Tuple[List[Dict], int]:
+        """Return up to ``limit`` messages stored before byte offset ``before``.
+
+        Reads backwards from the end of the file (or from ``before``) and
+        returns the messages in order together with the offset of the oldest
+        one, which is passed as ``before`` to fetch the previous page. An
+        offset of 0 means there are no older messages.
+        """
+        if not os.path.exists(self.path):
+            return [], 0
+
+        messages = []
+        with open(self.path, 'rb') as f:
+            if before is None:
+                f.seek(0, os.SEEK_END)
+                before = f.tell()
+
+            # buffer holds the unprocessed bytes [position, position + len(buffer))
+            position = before
+            buffer = b""
+            while len(messages) < limit:
+                index = buffer.rfind(b"\n", 0, max(len(buffer) - 1, 0))
+                if index < 0 and position > 0:
+                    read_size = min(self.READ_BLOCK, position)
+                    position -= read_size
+                    f.seek(position)
+                    buffer = f.read(read_size) + buffer
+                    continue
+                if not buffer:
+                    break
+
+                line = buffer[index + 1:]
+                buffer = buffer[:index + 1]
+                if line.strip():
+                    record = self._decode(line, position + index + 1)
+                    if record is not None:
+                        messages.append(record)
+
+        messages.reverse()
+        return messages, position + len(buffer)
+
+    def size(self) -> int:
+        """Return the size of the log in bytes."""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read_from(self, offset: int) -> Tuple[List[Dict], int]:
+        """Return the messages stored after byte ``offset`` and the end offset.
+
+        Only complete lines are read, so the returned offset can be passed
+        back later to pick up messages appended since.
+        """
+        if not os.path.exists(self.path):
+            return [], 0
+
+        messages = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    record = self._decode(line, offset)
+                    if record is not None:
+                        messages.append(record)
+                offset += len(line)
+        return messages, offset
+
+    def maybe_compact(self):
+        """Compact the log once enough corrupt records have been seen.
+
+        A log that has grown ``compact_growth`` times since its last scan is
+        read in full first, which finds corrupt records paged reads never
+        reached; it is only rewritten if any were found.
+        """
+        if self.dead_records >= self.compact_threshold:
+            self.compact()
+            return
+        if not self._needs_scan():
+            return
+        self._close_file()
+        messages = self.load()
+        if self.dead_records:
+            self._rewrite(messages)
+        else:
+            self._mark_scanned()
+
+    def _needs_scan(self) -> bool:
+        """Return True if the log has grown enough since the last full scan."""
+        size = self.size()
+        if size < self.MIN_SCAN_SIZE:
+            return False
+        try:
+            with open(self.scan_path, 'r') as f:
+                scanned = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            scanned = 0
+        return size >= scanned * self.compact_growth
+
+    def _mark_scanned(self):
+        """Record the size of the log as of a full scan."""
+        try:
+            with open(self.scan_path, 'w') as f:
+                f.write(str(self.size()))
+        except OSError as e:
+            print(f"Failed to record history scan: {str(e)}")
+
+    def compact(self):
+        """Rewrite the log with only valid messages."""
+        self._close_file()
+        self._rewrite(self.load())
+
+    def _rewrite(self, messages: List[Dict]):
+        """Atomically replace the log with ``messages``."""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as f:
+            for message in messages:
+                f.write(json.dumps(message).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._dead_offsets.clear()
+        self._mark_scanned()
+
+    def _close_file(self):
+        """Sync and close the append handle."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        """Sync, compact if worthwhile and close the log."""
+        self._close_file()
+        self.maybe_compact()
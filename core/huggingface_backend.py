@@ -1,17 +1,26 @@
 import json
+import asyncio
 import aiohttp
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 from .ai_service import AIService, AIResponse
+from .retry import RetryableError, error_from_response
+from .session_pool import session_pool
+from .sse import iter_sse_events
 from utils.settings import settings
 
 class HuggingFaceService(AIService):
     """HuggingFace API implementation of the AI service."""
     
+    name = "huggingface"
+    
     def __init__(self):
         self.api_key = None
         self.model = None
         self.endpoint = None
         self.session = None
+        self.timeout = None
+        self.headers = {}
+        self.parameters = {}
     
     def initialize(self) -> bool:
         """Initialize the service with current settings."""
@@ -19,22 +28,18 @@ class HuggingFaceService(AIService):
         self.api_key = config["api_key"]
         self.model = config["model"]
         self.endpoint = config["endpoint"]
+        self.parameters = dict(settings.get("ai_backend", "generation"))
         
-        # Create aiohttp session
-        if self.session:
-            self.session.close()
-        self.session = aiohttp.ClientSession(headers={
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        })
+        # Borrow a pooled aiohttp session for the endpoint; the API key is
+        # sent per request so changing it keeps the warm connections
+        self.headers = {"Authorization": f"Bearer {self.api_key}"}
+        self.session = session_pool.get_session(self.endpoint)
+        self.timeout = session_pool.request_timeout()
         
         return bool(self.api_key and self.model and self.endpoint)
     
-    async def generate_response(self, message: str, context: List[Dict] = None) -> AIResponse:
-        """Generate a response using the HuggingFace API."""
-        if not self.is_available():
-            raise RuntimeError("HuggingFace service is not properly configured")
-        
+    def _build_payload(self, message: str, context: List[Dict] = None, stream: bool = False) -> Dict:
+        """Build the text-generation request payload."""
         # Prepare the conversation history
         conversation = []
         if context:
@@ -50,24 +55,40 @@ class HuggingFaceService(AIService):
             "content": message
         })
         
-        # Prepare the API request
-        api_url = f"{self.endpoint.rstrip('/')}/{self.model}"
         payload = {
             "inputs": self._format_conversation(conversation),
             "parameters": {
-                "max_new_tokens": 1000,
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "do_sample": True,
+                "max_new_tokens": self.parameters["max_tokens"],
+                "do_sample": False,
                 "return_full_text": False
             }
         }
+        # The inference API rejects a zero temperature, so greedy decoding
+        # is requested by disabling sampling instead
+        if self.parameters["temperature"] > 0:
+            payload["parameters"].update({
+                "temperature": self.parameters["temperature"],
+                "top_p": self.parameters["top_p"],
+                "do_sample": True
+            })
+        if stream:
+            payload["stream"] = True
+        return payload
+    
+    async def generate_response(self, message: str, context: List[Dict] = None) -> AIResponse:
+        """Generate a response using the HuggingFace API."""
+        if not self.is_available():
+            raise RuntimeError("HuggingFace service is not properly configured")
+        
+        # Prepare the API request
+        api_url = f"{self.endpoint.rstrip('/')}/{self.model}"
+        payload = self._build_payload(message, context)
         
         try:
-            async with self.session.post(api_url, json=payload) as response:
+            async with self.session.post(api_url, json=payload, headers=self.headers,
+                                         timeout=self.timeout) as response:
                 if response.status != 200:
-                    error_text = await response.text()
-                    raise RuntimeError(f"API request failed: {error_text}")
+                    raise await error_from_response(response)
                 
                 result = await response.json()
                 
@@ -85,32 +106,86 @@ class HuggingFaceService(AIService):
                     }
                 )
                 
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"HuggingFace request timed out")
+        except RetryableError:
+            raise
+        except aiohttp.ClientConnectionError as e:
+            raise RetryableError(f"Could not connect to HuggingFace: {str(e)}")
         except Exception as e:
             raise RuntimeError(f"Error calling HuggingFace API: {str(e)}")
     
+    async def stream_response(self, message: str, context: List[Dict] = None) -> AsyncIterator[str]:
+        """Stream a response using the HuggingFace text-generation streaming protocol."""
+        if not self.is_available():
+            raise RuntimeError("HuggingFace service is not properly configured")
+        
+        api_url = f"{self.endpoint.rstrip('/')}/{self.model}"
+        payload = self._build_payload(message, context, stream=True)
+        
+        try:
+            async with self.session.post(api_url, json=payload, headers=self.headers,
+                                         timeout=self.timeout) as response:
+                if response.status != 200:
+                    raise await error_from_response(response)
+                
+                try:
+                    async for event in iter_sse_events(response):
+                        if "error" in event:
+                            raise RuntimeError(event["error"])
+                        token = event.get("token") or {}
+                        if token.get("special"):
+                            continue
+                        text = token.get("text")
+                        if text:
+                            yield text
+                except (asyncio.CancelledError, GeneratorExit):
+                    # Drop the connection so the endpoint stops generating
+                    response.close()
+                    raise
+                
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"HuggingFace request timed out")
+        except RetryableError:
+            raise
+        except aiohttp.ClientConnectionError as e:
+            raise RetryableError(f"Could not connect to HuggingFace: {str(e)}")
+        except Exception as e:
+            raise RuntimeError(f"Error calling HuggingFace API: {str(e)}")
+    
+    def reconfigure(self, delta: Dict) -> bool:
+        """Apply changed settings in place; only a new endpoint host reconnects."""
+        config = settings.get("ai_backend", "huggingface")
+        if any(key.startswith("ai_backend.generation.") for key in delta):
+            self.parameters = dict(settings.get("ai_backend", "generation"))
+        if any(key.startswith("ai_backend.timeouts.") for key in delta):
+            self.timeout = session_pool.request_timeout()
+        if "ai_backend.huggingface.api_key" in delta:
+            self.api_key = config["api_key"]
+            self.headers = {"Authorization": f"Bearer {self.api_key}"}
+        if "ai_backend.huggingface.model" in delta:
+            self.model = config["model"]
+        if "ai_backend.huggingface.endpoint" in delta:
+            self.endpoint = config["endpoint"]
+            # Sessions are pooled per origin, so a new path keeps the connections
+            self.session = session_pool.get_session(self.endpoint)
+        return bool(self.api_key and self.model and self.endpoint)
+    
     def is_available(self) -> bool:
         """Check if the service is available and properly configured."""
-        return bool(self.api_key and self.model and self.endpoint and self.session)
+        return bool(self.api_key and self.model and self.endpoint and self.session and not self.session.closed)
     
     def _format_conversation(self, messages: List[Dict]) -> str:
         """Format the conversation history for the model."""
-        formatted = ""
-        for msg in messages:
-            role = msg["role"]
-            content = msg["content"]
-            
-            if role == "user":
-                formatted += f"Human: {content}\n"
-            elif role == "assistant":
-                formatted += f"Assistant: {content}\n"
-            elif role == "system":
-                formatted += f"System: {content}\n"
-        
-        formatted += "Assistant:"
-        return formatted
+        prefixes = {"user": "Human", "assistant": "Assistant", "system": "System"}
+        parts = [
+            f"{prefixes[msg['role']]}: {msg['content']}\n"
+            for msg in messages
+            if msg["role"] in prefixes
+        ]
+        parts.append("Assistant:")
+        return "".join(parts)
     
     async def close(self):
-        """Close the aiohttp session."""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        """Release the pooled aiohttp session."""
+        self.session = None
@@ -1,18 +1,28 @@
 import json
+import asyncio
 import aiohttp
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 from .ai_service import AIService, AIResponse
+from .retry import RetryableError, error_from_response
+from .session_pool import session_pool
+from .sse import iter_sse_events
 from utils.settings import settings
 
 class LMStudioService(AIService):
     """LM Studio local API implementation of the AI service."""
     
+    name = "lmstudio"
+    
     def __init__(self):
         self.host = None
         self.port = None
         self.model_path = None
         self.session = None
+        self.timeout = None
         self.api_base = None
+        self.model = None
+        self.model_id = None
+        self.parameters = {}
     
     def initialize(self) -> bool:
         """Initialize the service with current settings."""
@@ -20,22 +30,18 @@ class LMStudioService(AIService):
         self.host = config["host"]
         self.port = config["port"]
         self.model_path = config["model_path"]
+        self.model = self.model_path or "local"
+        self.parameters = dict(settings.get("ai_backend", "generation"))
         self.api_base = f"http://{self.host}:{self.port}/v1"
         
-        # Create aiohttp session
-        if self.session:
-            self.session.close()
-        self.session = aiohttp.ClientSession(headers={
-            "Content-Type": "application/json"
-        })
+        # Borrow a pooled aiohttp session for the endpoint
+        self.session = session_pool.get_session(self.api_base)
+        self.timeout = session_pool.request_timeout()
         
         return bool(self.host and self.port)
     
-    async def generate_response(self, message: str, context: List[Dict] = None) -> AIResponse:
-        """Generate a response using the LM Studio local API."""
-        if not self.is_available():
-            raise RuntimeError("LM Studio service is not properly configured")
-        
+    def _build_payload(self, message: str, context: List[Dict] = None, stream: bool = False) -> Dict:
+        """Build the chat/completions request payload."""
         # Prepare the conversation history
         messages = []
         if context:
@@ -50,20 +56,32 @@ class LMStudioService(AIService):
             "content": message
         })
         
-        # Prepare the API request
-        api_url = f"{self.api_base}/chat/completions"
         payload = {
             "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 1000,
-            "stream": False
+            "temperature": self.parameters["temperature"],
+            "max_tokens": self.parameters["max_tokens"],
+            "top_p": self.parameters["top_p"],
+            "stream": stream
         }
+        # Only name a model when one was chosen explicitly; otherwise LM Studio
+        # answers with whatever model is loaded
+        if self.model_id:
+            payload["model"] = self.model_id
+        return payload
+    
+    async def generate_response(self, message: str, context: List[Dict] = None) -> AIResponse:
+        """Generate a response using the LM Studio local API."""
+        if not self.is_available():
+            raise RuntimeError("LM Studio service is not properly configured")
+        
+        # Prepare the API request
+        api_url = f"{self.api_base}/chat/completions"
+        payload = self._build_payload(message, context)
         
         try:
-            async with self.session.post(api_url, json=payload) as response:
+            async with self.session.post(api_url, json=payload, timeout=self.timeout) as response:
                 if response.status != 200:
-                    error_text = await response.text()
-                    raise RuntimeError(f"API request failed: {error_text}")
+                    raise await error_from_response(response)
                 
                 result = await response.json()
                 
@@ -76,20 +94,81 @@ class LMStudioService(AIService):
                 return AIResponse(
                     text=generated_text,
                     metadata={
-                        "model": "local",
+                        "model": self.model,
                         "backend": "lmstudio"
                     }
                 )
                 
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"LM Studio request timed out")
+        except RetryableError:
+            raise
+        except aiohttp.ClientConnectionError as e:
+            raise RetryableError(f"Could not connect to LM Studio: {str(e)}")
         except Exception as e:
             raise RuntimeError(f"Error calling LM Studio API: {str(e)}")
     
+    async def stream_response(self, message: str, context: List[Dict] = None) -> AsyncIterator[str]:
+        """Stream a response from the LM Studio chat/completions SSE endpoint."""
+        if not self.is_available():
+            raise RuntimeError("LM Studio service is not properly configured")
+        
+        api_url = f"{self.api_base}/chat/completions"
+        payload = self._build_payload(message, context, stream=True)
+        
+        try:
+            async with self.session.post(api_url, json=payload, timeout=self.timeout) as response:
+                if response.status != 200:
+                    raise await error_from_response(response)
+                
+                try:
+                    async for chunk in iter_sse_events(response):
+                        choices = chunk.get("choices") or []
+                        if not choices:
+                            continue
+                        delta = choices[0].get("delta", {}).get("content")
+                        if delta:
+                            yield delta
+                except (asyncio.CancelledError, GeneratorExit):
+                    # Drop the connection so LM Studio stops generating
+                    response.close()
+                    raise
+                
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"LM Studio request timed out")
+        except RetryableError:
+            raise
+        except aiohttp.ClientConnectionError as e:
+            raise RetryableError(f"Could not connect to LM Studio: {str(e)}")
+        except Exception as e:
+            raise RuntimeError(f"Error calling LM Studio API: {str(e)}")
+    
+    def use_model(self, model: str):
+        """Request a specific loaded LM Studio model by identifier."""
+        self.model = model
+        self.model_id = model
+    
+    def reconfigure(self, delta: Dict) -> bool:
+        """Apply changed settings in place; only a new host or port reconnects."""
+        config = settings.get("ai_backend", "lmstudio")
+        if any(key.startswith("ai_backend.generation.") for key in delta):
+            self.parameters = dict(settings.get("ai_backend", "generation"))
+        if any(key.startswith("ai_backend.timeouts.") for key in delta):
+            self.timeout = session_pool.request_timeout()
+        if "ai_backend.lmstudio.model_path" in delta:
+            self.model_path = config["model_path"]
+            self.model = self.model_path or "local"
+        if "ai_backend.lmstudio.host" in delta or "ai_backend.lmstudio.port" in delta:
+            self.host = config["host"]
+            self.port = config["port"]
+            self.api_base = f"http://{self.host}:{self.port}/v1"
+            self.session = session_pool.get_session(self.api_base)
+        return bool(self.host and self.port)
+    
     def is_available(self) -> bool:
         """Check if the service is available and properly configured."""
-        return bool(self.host and self.port and self.session)
+        return bool(self.host and self.port and self.session and not self.session.closed)
     
     async def close(self):
-        """Close the aiohttp session."""
-        if self.session:
-            await self.session.close()
-            self.session = None
+        """Release the pooled aiohttp session."""
+        self.session = None
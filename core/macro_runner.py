@@ -0,0 +1,89 @@
+"""Runs one macro job inside FreeCADCmd; started by ``MacroRunner``.
+
+The job file named by ``AICHAT_MACRO_JOB`` gives the document copy to open
+(or none for a new document), the macro, where to write the result and the
+memory budget. The result lists the objects the macro created, changed and
+removed with their digests, its printed output and, if it failed, the
+traceback.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import traceback
+import contextlib
+
+def _limit_memory(megabytes):
+    """Let the process grow by at most ``megabytes`` from here on (POSIX only).
+
+    FreeCAD itself maps a lot of address space, so the budget is added to
+    what is already mapped.
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            mapped = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        mapped = 0
+    limit = mapped + megabytes * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _run(job, result):
+    sys.path.insert(0, job["addon_path"])
+
+    import FreeCAD
+    from core.document_context import DocumentContext
+
+    if job["document"]:
+        doc = FreeCAD.openDocument(job["document"])
+    else:
+        doc = FreeCAD.newDocument("Macro")
+    FreeCAD.setActiveDocument(doc.Name)
+    before = DocumentContext().snapshot(doc)
+
+    with open(job["macro"], 'r') as f:
+        code = f.read()
+    if job["memory_mb"]:
+        _limit_memory(job["memory_mb"])
+    output = io.StringIO()
+    started = time.monotonic()
+    try:
+        with contextlib.redirect_stdout(output):
+            exec(compile(code, "<macro>", "exec"), {"__name__": "__main__", "FreeCAD": FreeCAD, "App": FreeCAD})
+            doc.recompute()
+        result["ok"] = True
+    except BaseException as e:
+        # Skip this frame so the traceback starts in the macro
+        result["error"] = "".join(traceback.format_exception(type(e), e, e.__traceback__.tb_next))
+    result["duration"] = time.monotonic() - started
+    result["output"] = output.getvalue()[-job["max_output"]:]
+
+    # A fresh instance, as recomputed objects may look untouched again
+    after = DocumentContext().snapshot(doc)
+    result["created"] = {name: digest for name, digest in after.items() if name not in before}
+    result["changed"] = {
+        name: digest for name, digest in after.items()
+        if name in before and before[name] != digest
+    }
+    result["removed"] = [name for name in before if name not in after]
+
+def main():
+    with open(os.environ["AICHAT_MACRO_JOB"], 'r') as f:
+        job = json.load(f)
+    result = {"ok": False}
+    try:
+        _run(job, result)
+    except BaseException:
+        result["ok"] = False
+        result["error"] = traceback.format_exc()
+    with open(job["result"], 'w') as f:
+        json.dump(result, f)
+
+# FreeCADCmd runs the script as __main__; importing it does nothing
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import os
+import re
+import sys
+import json
+import shutil
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+import traceback
+import concurrent.futures
+from collections import OrderedDict
+from typing import Dict, Optional
+from utils.settings import settings
+from .document_context import document_context
+
+# Fenced Python blocks in a response; unlabeled blocks are not assumed to be Python
+CODE_BLOCK = re.compile(r"```(?:python|py)[ \t]*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "macro_runner.py")
+
+# Executable names of FreeCAD's console application
+FREECAD_CMD_NAMES = ("FreeCADCmd", "freecadcmd", "FreeCADCmd.exe")
+
+def extract_macro(text: str) -> Optional[str]:
+    """Return the Python code blocks of a response joined in order, or None."""
+    blocks = [block.strip("\n") for block in CODE_BLOCK.findall(text or "")]
+    blocks = [block for block in blocks if block.strip()]
+    return "\n\n".join(blocks) if blocks else None
+
+def macro_hash(code: str) -> str:
+    """Hash a macro, ignoring trailing whitespace."""
+    normalized = "\n".join(line.rstrip() for line in code.strip().splitlines())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+class MacroRunner:
+    """Runs AI-generated macros in a separate FreeCADCmd process.
+
+    ``start`` saves a copy of the active document on the GUI thread, then
+    runs the macro against the copy in FreeCADCmd from the service loop,
+    so neither the geometry work nor a runaway macro can block or crash
+    the GUI. The process is killed after ``macros.timeout`` seconds and
+    may grow by ``macros.memory_mb`` (POSIX). Results are cached by macro
+    hash and document fingerprint, so running the same macro on an
+    unchanged document returns the earlier result straight away.
+
+    The process is isolated from FreeCAD's GUI, not from the system: a
+    macro can still read and write files.
+    """
+
+    MAX_OUTPUT = 4000
+
+    def __init__(self):
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        # Results are stored on the service loop and looked up on the GUI thread
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def find_freecad_cmd() -> Optional[str]:
+        """Return the configured FreeCADCmd, the one next to FreeCAD, or one on PATH."""
+        configured = settings.get("macros", "freecad_cmd")
+        if configured:
+            return configured
+        try:
+            import FreeCAD
+            bin_dir = os.path.join(FreeCAD.getHomePath(), "bin")
+        except ImportError:
+            bin_dir = None
+        for name in FREECAD_CMD_NAMES:
+            if bin_dir and os.path.exists(os.path.join(bin_dir, name)):
+                return os.path.join(bin_dir, name)
+        for name in FREECAD_CMD_NAMES:
+            path = shutil.which(name)
+            if path:
+                return path
+        return None
+
+    @staticmethod
+    def key(code: str) -> str:
+        """Return the cache key of ``code`` run on the active document as it is now."""
+        return f"{macro_hash(code)}:{document_context.fingerprint()}"
+
+    def verified(self, code: str) -> bool:
+        """Whether ``code`` ran without error on a copy of the document as it is now."""
+        result = self.cached(self.key(code))
+        return result is not None and bool(result.get("ok"))
+
+    def cached(self, key: str) -> Optional[Dict]:
+        """Return the cached result for a run key."""
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+
+    def _store(self, key: str, result: Dict):
+        """Cache a result, evicting the least recently used ones."""
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > settings.get("macros", "cache_size"):
+                self._cache.popitem(last=False)
+
+    def start(self, code: str) -> concurrent.futures.Future:
+        """Start running ``code`` and return a future for its result dict.
+
+        Must be called on the GUI thread, which owns the document. The
+        result has ``ok``, ``error``, ``output``, ``duration``, the
+        ``created``/``changed`` object digests and the ``removed`` names,
+        and ``cached`` when it was reused.
+        """
+        key = self.key(code)
+        result = self.cached(key)
+        if result is not None:
+            future = concurrent.futures.Future()
+            future.set_result(dict(result, cached=True))
+            return future
+
+        from .ai_service import get_service_manager
+        try:
+            job = self._prepare(code)
+        except Exception as e:
+            future = concurrent.futures.Future()
+            future.set_result({"ok": False, "error": f"Failed to prepare the macro: {str(e)}"})
+            return future
+        return get_service_manager().submit(self._run(key, job))
+
+    def _prepare(self, code: str) -> Dict:
+        """Write the macro, a copy of the active document and the job file."""
+        freecad_cmd = self.find_freecad_cmd()
+        if freecad_cmd is None:
+            raise RuntimeError("FreeCADCmd was not found; set macros.freecad_cmd")
+
+        directory = tempfile.mkdtemp(prefix="aichat-macro-")
+        job = {
+            "directory": directory,
+            "command": freecad_cmd,
+            "addon_path": settings.addon_path,
+            "document": None,
+            "macro": os.path.join(directory, "macro.py"),
+            "result": os.path.join(directory, "result.json"),
+            "memory_mb": settings.get("macros", "memory_mb"),
+            "max_output": self.MAX_OUTPUT
+        }
+        with open(job["macro"], 'w') as f:
+            f.write(code)
+        try:
+            import FreeCAD
+            doc = FreeCAD.ActiveDocument
+        except ImportError:
+            doc = None
+        if doc is not None:
+            job["document"] = os.path.join(directory, "document.FCStd")
+            doc.saveCopy(job["document"])
+        with open(os.path.join(directory, "job.json"), 'w') as f:
+            json.dump(job, f)
+        return job
+
+    async def _run(self, key: str, job: Dict) -> Dict:
+        """Run a prepared job in FreeCADCmd and collect its result."""
+        timeout = settings.get("macros", "timeout")
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                job["command"], RUNNER_PATH,
+                cwd=job["directory"],
+                env=dict(os.environ, AICHAT_MACRO_JOB=os.path.join(job["directory"], "job.json")),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
+            )
+            try:
+                console, _ = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                return {"ok": False, "error": f"The macro did not finish within {timeout} seconds"}
+
+            try:
+                with open(job["result"], 'r') as f:
+                    result = json.load(f)
+            except (OSError, ValueError):
+                # The process died before reporting, e.g. out of memory
+                tail = console.decode("utf-8", "replace")[-self.MAX_OUTPUT:]
+                return {"ok": False, "error": f"FreeCADCmd exited with code {process.returncode}\n{tail}".rstrip()}
+            # The same macro on the same document fails the same way, so
+            # errors are cached as well as successes
+            self._store(key, result)
+            return result
+        finally:
+            if process is not None and process.returncode is None:
+                process.kill()
+                await process.wait()
+            shutil.rmtree(job["directory"], ignore_errors=True)
+
+def describe_result(result: Dict) -> str:
+    """Render a macro result as a chat message."""
+    if not result.get("ok"):
+        return f"The macro failed:\n```\n{result.get('error', '').rstrip()}\n```"
+
+    lines = ["The macro ran in {:.1f} s{}.".format(
+        result.get("duration", 0.0),
+        " (same macro and document as before, not run again)" if result.get("cached") else ""
+    )]
+    for title, digests in (("Created", result.get("created")), ("Changed", result.get("changed"))):
+        if digests:
+            lines.append(f"{title}:")
+            lines.extend(f"- {document_context.describe(digest)}" for digest in digests.values())
+    if result.get("removed"):
+        lines.append("Removed: " + ", ".join(result["removed"]))
+    if len(lines) == 1:
+        lines.append("The document is unchanged.")
+    if result.get("output"):
+        lines.append(f"Output:\n```\n{result['output'].rstrip()}\n```")
+    return "\n".join(lines)
+
+def _deadline_tracer(deadline: float, timeout: float):
+    """Return a trace function that raises ``TimeoutError`` past ``deadline``.
+
+    Python checks it on every call and line, so loops in the macro are
+    interrupted; a single long call into FreeCAD's C++ finishes first.
+    Python drops the trace function once it raises, so a macro that
+    catches the error is not stopped again.
+    """
+    def trace(frame, event, arg):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"The macro did not finish within {timeout} seconds")
+        return trace
+    return trace
+
+def apply_macro(code: str, timeout: Optional[float] = None) -> Optional[str]:
+    """Run ``code`` in the active document as one undoable step.
+
+    This runs on the GUI thread on purpose: FreeCAD documents and their
+    view providers may only be changed from the GUI thread, and the undo
+    transaction must be opened and committed there too. Callers should only
+    apply macros for which ``MacroRunner.verified`` holds, and the run is
+    stopped after ``timeout`` seconds. Returns the traceback if the macro
+    failed or timed out, in which case its changes are rolled back.
+    """
+    import FreeCAD
+    doc = FreeCAD.ActiveDocument or FreeCAD.newDocument()
+    doc.openTransaction("AI macro")
+    previous_trace = sys.gettrace()
+    if timeout:
+        sys.settrace(_deadline_tracer(time.monotonic() + timeout, timeout))
+    try:
+        try:
+            exec(compile(code, "<macro>", "exec"), {"__name__": "__main__", "FreeCAD": FreeCAD, "App": FreeCAD})
+            doc.recompute()
+        finally:
+            # Before the observers run again for the rollback or commit
+            sys.settrace(previous_trace)
+    except Exception as e:
+        doc.abortTransaction()
+        return "".join(traceback.format_exception(type(e), e, e.__traceback__.tb_next))
+    doc.commitTransaction()
+    return None
+
+# Global runner whose result cache is shared by all chat tabs
+macro_runner = MacroRunner()
@@ -0,0 +1,279 @@
+from abc import ABC, abstractmethod
+import json
+import time
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# The request being measured on the current task; set by the service manager
+# so the aiohttp trace hooks can attribute connection and byte events to it
+# without the backends having to pass anything along
+current_request: ContextVar[Optional["RequestMetrics"]] = ContextVar("current_request", default=None)
+
+# Phases reported as seconds since the request started
+PHASES = ("connect", "first_byte", "first_token", "total")
+
+class RequestMetrics:
+    """Timings and counters for one request through the service manager.
+
+    ``connect`` is when a connection was obtained (new or reused from the
+    pool), ``first_byte`` when the response headers arrived, ``first_token``
+    when the first text delta reached the caller and ``total`` when the
+    request finished. Connection marks are reset on every retry attempt so
+    they describe the attempt that produced the answer.
+    """
+
+    def __init__(self, backend: Optional[str] = None, model: Optional[str] = None,
+                 stream: bool = False):
+        self.backend = backend
+        self.model = model
+        self.stream = stream
+        self.started = time.monotonic()
+        self.timestamp = time.time()
+        self.marks: Dict[str, float] = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        # Seconds spent waiting for a scheduler slot, included in the phases
+        self.queued = 0.0
+        self.cached = False
+        self.error: Optional[str] = None
+        self.error_type: Optional[str] = None
+        self.status: Optional[int] = None
+
+    def mark(self, phase: str):
+        """Record the first time ``phase`` is reached."""
+        if phase not in self.marks:
+            self.marks[phase] = time.monotonic() - self.started
+
+    def new_attempt(self):
+        """Forget the connection marks of a failed attempt."""
+        self.marks.pop("connect", None)
+        self.marks.pop("first_byte", None)
+
+    def finish(self, error: Optional[BaseException] = None):
+        """Mark the request as done, keeping the error's type and HTTP status."""
+        if error is not None:
+            self.error = str(error) or type(error).__name__
+            self.error_type = type(error).__name__
+            self.status = getattr(error, "status", None)
+        self.mark("first_token")
+        self.mark("total")
+
+    def as_dict(self) -> Dict:
+        """Return the metrics as a JSON-serializable dict."""
+        entry = {
+            "timestamp": self.timestamp,
+            "backend": self.backend,
+            "model": self.model,
+            "stream": self.stream,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "retries": self.retries,
+            "queued": self.queued,
+            "cached": self.cached,
+            "error": self.error,
+            "error_type": self.error_type,
+            "status": self.status
+        }
+        for phase in PHASES:
+            entry[phase] = self.marks.get(phase)
+        return entry
+
+async def _on_connection(session, context, params):
+    metrics = current_request.get()
+    if metrics is not None:
+        metrics.mark("connect")
+
+async def _on_headers(session, context, params):
+    metrics = current_request.get()
+    if metrics is not None:
+        metrics.mark("first_byte")
+
+async def _on_request_chunk(session, context, params):
+    metrics = current_request.get()
+    if metrics is not None:
+        metrics.request_bytes += len(params.chunk)
+
+async def _on_response_chunk(session, context, params):
+    metrics = current_request.get()
+    if metrics is not None:
+        metrics.response_bytes += len(params.chunk)
+
+def trace_config():
+    """Build the aiohttp hooks that feed ``current_request``."""
+    import aiohttp
+    config = aiohttp.TraceConfig()
+    config.on_connection_create_end.append(_on_connection)
+    config.on_connection_reuseconn.append(_on_connection)
+    config.on_request_end.append(_on_headers)
+    config.on_request_chunk_sent.append(_on_request_chunk)
+    config.on_response_chunk_received.append(_on_response_chunk)
+    return config
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Return a percentile of ``values``, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+class MetricsSink(ABC):
+    """Receives one metrics entry per finished request."""
+
+    @abstractmethod
+    def record(self, entry: Dict):
+        """Store or forward ``entry``."""
+        pass
+
+class RingBufferSink(MetricsSink):
+    """Keeps the most recent entries in memory for summaries and export."""
+
+    def __init__(self, capacity: int = 500):
+        self.entries = deque(maxlen=capacity)
+        # Per-backend counters over every entry ever recorded; unlike the
+        # window they never go down, so they can be exported as counters
+        self._totals: Dict[str, Dict[str, float]] = {}
+        # Entries arrive on the service loop thread and are read from the GUI
+        self._lock = threading.Lock()
+
+    def record(self, entry: Dict):
+        with self._lock:
+            self.entries.append(entry)
+            accumulate(self._totals, entry)
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Return the cumulative counters per backend, see ``accumulate``."""
+        with self._lock:
+            return {backend: dict(counters) for backend, counters in self._totals.items()}
+
+    def recent(self, count: Optional[int] = None) -> List[Dict]:
+        """Return up to ``count`` of the newest entries, oldest first."""
+        with self._lock:
+            entries = list(self.entries)
+        return entries[-count:] if count else entries
+
+    def summary(self, count: Optional[int] = None) -> Dict:
+        """Return rolling p50/p95 per phase and rates over recent entries."""
+        entries = self.recent(count)
+        # Cache hits never touch the network, so they would flatter the latencies
+        live = [entry for entry in entries if not entry["cached"] and not entry["error"]]
+        summary = {
+            "requests": len(entries),
+            "errors": sum(1 for entry in entries if entry["error"]),
+            "cache_hits": sum(1 for entry in entries if entry["cached"]),
+            "retries": sum(entry["retries"] for entry in entries),
+            "queued": _mean([entry["queued"] for entry in live]),
+            "prompt_tokens": _mean([entry["prompt_tokens"] for entry in live]),
+            "completion_tokens": _mean([entry["completion_tokens"] for entry in live])
+        }
+        for phase in PHASES:
+            values = [entry[phase] for entry in live if entry[phase] is not None]
+            summary[phase] = {"p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+        return summary
+
+    def clear(self):
+        """Drop all entries; the cumulative totals are kept."""
+        with self._lock:
+            self.entries.clear()
+
+class JsonlSink(MetricsSink):
+    """Appends every entry to a JSONL file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def record(self, entry: Dict):
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Failed to write metrics: {str(e)}")
+
+def _mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+def _labels(**labels) -> str:
+    pairs = [f'{key}="{value}"' for key, value in labels.items() if value is not None]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+# Cumulative counters: (metric name suffix, help text, value of one entry)
+COUNTERS = (
+    ("requests_total", "Requests finished.", lambda entry: 1),
+    ("errors_total", "Requests that failed.", lambda entry: 1 if entry["error"] else 0),
+    ("cache_hits_total", "Requests answered from the response cache.",
+     lambda entry: 1 if entry["cached"] else 0),
+    ("retries_total", "Retried attempts.", lambda entry: entry["retries"]),
+    ("queued_seconds_total", "Seconds spent waiting for a request slot.",
+     lambda entry: entry["queued"]),
+    ("prompt_tokens_total", "Estimated prompt tokens sent.", lambda entry: entry["prompt_tokens"]),
+    ("completion_tokens_total", "Estimated completion tokens received.",
+     lambda entry: entry["completion_tokens"]),
+    ("request_bytes_total", "Request body bytes sent.", lambda entry: entry["request_bytes"]),
+    ("response_bytes_total", "Response body bytes received.", lambda entry: entry["response_bytes"])
+)
+
+def accumulate(totals: Dict[str, Dict[str, float]], entry: Dict):
+    """Add one entry to per-backend totals.
+
+    Besides the ``COUNTERS`` these hold ``<phase>_sum`` and ``<phase>_count``
+    over the requests that went to the network.
+    """
+    counters = totals.setdefault(entry["backend"] or "unknown", {})
+    for suffix, _, value in COUNTERS:
+        counters[suffix] = counters.get(suffix, 0) + value(entry)
+    if entry["cached"]:
+        return
+    for phase in PHASES:
+        if entry[phase] is not None:
+            counters[f"{phase}_sum"] = counters.get(f"{phase}_sum", 0) + entry[phase]
+            counters[f"{phase}_count"] = counters.get(f"{phase}_count", 0) + 1
+
+def prometheus_text(entries: List[Dict], totals: Optional[Dict[str, Dict[str, float]]] = None,
+                    prefix: str = "aichat") -> str:
+    """Render metrics in the Prometheus text exposition format.
+
+    Latency quantiles are taken over ``entries`` (typically the ring buffer
+    window). Counters and the summaries' ``_sum``/``_count`` come from
+    ``totals``, the cumulative values of ``RingBufferSink.totals``; without
+    them they are computed from ``entries``, which is only right when the
+    entries are every request since the process started.
+    """
+    if totals is None:
+        totals = {}
+        for entry in entries:
+            accumulate(totals, entry)
+    lines = []
+    backends = sorted(set(totals) | {entry["backend"] or "unknown" for entry in entries})
+
+    for phase in PHASES:
+        name = f"{prefix}_{phase}_seconds"
+        lines.append(f"# HELP {name} Seconds from request start to {phase.replace('_', ' ')}.")
+        lines.append(f"# TYPE {name} summary")
+        for backend in backends:
+            values = [
+                entry[phase] for entry in entries
+                if (entry["backend"] or "unknown") == backend
+                and entry[phase] is not None and not entry["cached"]
+            ]
+            for quantile in (0.5, 0.95, 0.99):
+                value = percentile(values, quantile)
+                if value is not None:
+                    lines.append(f"{name}{_labels(backend=backend, quantile=quantile)} {value}")
+            counters = totals.get(backend, {})
+            lines.append(f"{name}_sum{_labels(backend=backend)} {counters.get(f'{phase}_sum', 0)}")
+            lines.append(f"{name}_count{_labels(backend=backend)} {counters.get(f'{phase}_count', 0)}")
+
+    for suffix, help_text, _ in COUNTERS:
+        name = f"{prefix}_{suffix}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for backend in backends:
+            lines.append(f"{name}{_labels(backend=backend)} {totals.get(backend, {}).get(suffix, 0)}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from utils.settings import settings
+
+class ResponseCache:
+    """Bounded in-memory LRU cache of AI responses with TTL eviction.
+
+    Entries are keyed on a hash of the backend, model, normalized context,
+    message and sampling parameters. An optional on-disk tier keeps one JSON
+    file per entry so answers survive restarts.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 86400,
+                 disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+        if self.disk_path:
+            os.makedirs(self.disk_path, exist_ok=True)
+
+    @classmethod
+    def from_settings(cls):
+        """Create a cache from the ``cache`` settings section."""
+        config = settings.get("cache")
+        disk_path = None
+        if config["disk"]:
+            disk_path = os.path.join(
+                os.path.dirname(settings.addon_path),
+                config["disk_path"]
+            )
+        return cls(
+            max_entries=config["max_entries"],
+            ttl_seconds=config["ttl_seconds"],
+            disk_path=disk_path
+        )
+
+    @staticmethod
+    def make_key(backend: str, model: str, message: str,
+                 context: List[Dict] = None, parameters: Dict = None) -> str:
+        """Hash everything that determines a response into a cache key."""
+        normalized_context = [
+            {
+                "role": msg["role"],
+                "content": " ".join(msg["content"].split())
+            }
+            for msg in context or []
+        ]
+        material = json.dumps({
+            "backend": backend,
+            "model": model,
+            "message": " ".join(message.split()),
+            "context": normalized_context,
+            "parameters": parameters or {}
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached entry for ``key``, or None on a miss."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry["expires"] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            del self._entries[key]
+
+        entry = self._load_from_disk(key, now)
+        if entry is not None:
+            self._store(key, entry)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, text: str, metadata: Optional[Dict] = None):
+        """Store a response in the cache."""
+        entry = {
+            "text": text,
+            "metadata": metadata or {},
+            "expires": time.time() + self.ttl_seconds
+        }
+        self._store(key, entry)
+        self._save_to_disk(key, entry)
+
+    def _store(self, key: str, entry: Dict):
+        """Insert an entry into the in-memory tier, evicting the oldest."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _entry_path(self, key: str) -> str:
+        """Return the disk tier file for ``key``."""
+        return os.path.join(self.disk_path, f"{key}.json")
+
+    def _load_from_disk(self, key: str, now: float) -> Optional[Dict]:
+        """Load an unexpired entry from the disk tier."""
+        if not self.disk_path:
+            return None
+
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("expires", 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
+
+    def _save_to_disk(self, key: str, entry: Dict):
+        """Write an entry to the disk tier."""
+        if not self.disk_path:
+            return
+
+        path = self._entry_path(key)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Failed to write response cache entry: {str(e)}")
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        if self.disk_path and os.path.isdir(self.disk_path):
+            for name in os.listdir(self.disk_path):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.disk_path, name))
+                    except OSError:
+                        pass
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries
+        }
@@ -0,0 +1,396 @@
+import os
+import json
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from utils.settings import settings
+from .embeddings import Embedder, create_embedder
+
+# NumPy is optional; retrieval is unavailable without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class VectorIndex:
+    """Normalized float32 vectors on disk, searched by brute-force cosine.
+
+    Vectors are appended to ``vectors.f32`` and read through a memory map,
+    so the index costs page cache rather than Python memory. Each vector's
+    metadata is one line of ``entries.jsonl``; only the byte offsets of
+    those lines are kept in memory, and the lines of the top hits are read
+    on demand. Removing rows writes both files anew under the next
+    ``generation``, which takes over once ``meta.json`` names it.
+    """
+
+    # Rows scored per step, bounding the temporary score arrays
+    CHUNK_ROWS = 65536
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.meta = {"signature": None, "dimensions": 0, "sources": {}, "generation": 0}
+        self.count = 0
+        self._offsets: List[int] = []
+        self._matrix = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _paths(self, generation: int) -> Tuple[str, str]:
+        """Return the vector and entry file paths of a generation."""
+        suffix = f".{generation}" if generation else ""
+        return (
+            os.path.join(self.directory, f"vectors{suffix}.f32"),
+            os.path.join(self.directory, f"entries{suffix}.jsonl")
+        )
+
+    @property
+    def vectors_path(self) -> str:
+        return self._paths(self.meta["generation"])[0]
+
+    @property
+    def entries_path(self) -> str:
+        return self._paths(self.meta["generation"])[1]
+
+    def _load(self):
+        """Load the metadata and line offsets, dropping a torn tail."""
+        if os.path.exists(self.meta_path):
+            try:
+                with open(self.meta_path, 'r') as f:
+                    self.meta.update(json.load(f))
+            except Exception as e:
+                print(f"Failed to load vector index: {str(e)}")
+        # Conversations deleted while their rows were only hidden
+        legacy_removed = self.meta.pop("removed", None) or {}
+        if not self.meta["dimensions"] or not os.path.exists(self.entries_path):
+            return
+
+        offset = 0
+        with open(self.entries_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._offsets.append(offset)
+                offset += len(line)
+        row_bytes = 4 * self.meta["dimensions"]
+        rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        # A crash between the two appends leaves one file ahead of the other
+        self.count = min(rows, len(self._offsets))
+        entries_end = self._offsets[self.count] if self.count < len(self._offsets) else offset
+        del self._offsets[self.count:]
+        for path, size in ((self.vectors_path, self.count * row_bytes), (self.entries_path, entries_end)):
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+        for conversation_id in legacy_removed:
+            self.remove(conversation_id)
+
+    def _line(self, row: int) -> bytes:
+        """Read the raw metadata line of a row."""
+        with open(self.entries_path, 'rb') as f:
+            f.seek(self._offsets[row])
+            return f.readline()
+
+    def save_meta(self):
+        """Atomically store the metadata."""
+        temp_path = self.meta_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(temp_path, self.meta_path)
+
+    def reset(self, signature: str, dimensions: int):
+        """Drop every vector and start an index for a new vector space."""
+        self._matrix = None
+        for path in (self.vectors_path, self.entries_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.meta = {"signature": signature, "dimensions": dimensions, "sources": {}, "generation": 0}
+        self.count = 0
+        self._offsets = []
+        self.save_meta()
+
+    def add(self, vectors: List[List[float]], entries: List[Dict]):
+        """Append vectors with their metadata."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)
+
+        with open(self.vectors_path, 'ab') as f:
+            f.write(matrix.tobytes())
+        offset = os.path.getsize(self.entries_path) if os.path.exists(self.entries_path) else 0
+        with open(self.entries_path, 'ab') as f:
+            for entry in entries:
+                line = json.dumps(entry).encode("utf-8") + b"\n"
+                f.write(line)
+                self._offsets.append(offset)
+                offset += len(line)
+        self.count += len(entries)
+        # Remap on the next search to include the new rows
+        self._matrix = None
+
+    def write_without(self, conversation_id: str) -> Optional[Tuple[int, List[int]]]:
+        """Write the next generation without a conversation's rows.
+
+        Returns the generation and its line offsets for ``switch_to``, or
+        None if the conversation has no rows. Only reads the current files,
+        so it may run on a worker thread while searches continue.
+        """
+        keep = []
+        with open(self.entries_path, 'rb') as f:
+            for row in range(self.count):
+                line = f.readline()
+                if json.loads(line).get("conversation") != conversation_id:
+                    keep.append((row, line))
+        if len(keep) == self.count:
+            return None
+
+        generation = self.meta["generation"] + 1
+        vectors_path, entries_path = self._paths(generation)
+        matrix = self.matrix()
+        offsets = []
+        offset = 0
+        with open(vectors_path, 'wb') as vectors, open(entries_path, 'wb') as entries:
+            for start in range(0, len(keep), self.CHUNK_ROWS):
+                chunk = keep[start:start + self.CHUNK_ROWS]
+                vectors.write(np.ascontiguousarray(matrix[[row for row, _ in chunk]]).tobytes())
+                for _, line in chunk:
+                    entries.write(line)
+                    offsets.append(offset)
+                    offset += len(line)
+        return generation, offsets
+
+    def switch_to(self, generation: int, offsets: List[int]):
+        """Make a generation from ``write_without`` current and delete the old files."""
+        old_paths = (self.vectors_path, self.entries_path)
+        self._matrix = None
+        self.meta["generation"] = generation
+        self.count = len(offsets)
+        self._offsets = offsets
+        self.save_meta()
+        for path in old_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                # Still mapped by a search on Windows; the stale file
+                # is no longer named by the metadata, so it is harmless
+                pass
+
+    def remove(self, conversation_id: str) -> int:
+        """Drop every row of a conversation and return how many there were."""
+        self.meta["sources"].pop(conversation_id, None)
+        count = self.count
+        if count:
+            replacement = self.write_without(conversation_id)
+            if replacement is not None:
+                self.switch_to(*replacement)
+        self.save_meta()
+        return count - self.count
+
+    def matrix(self):
+        """Return the memory-mapped vectors."""
+        if self._matrix is None and self.count:
+            self._matrix = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode='r',
+                shape=(self.count, self.meta["dimensions"])
+            )
+        return self._matrix
+
+    def entry(self, row: int) -> Dict:
+        """Read the metadata of a row."""
+        return json.loads(self._line(row))
+
+    def search(self, vector: List[float], k: int) -> List[Tuple[float, int]]:
+        """Return the ``k`` best (cosine similarity, row) pairs, best first."""
+        matrix = self.matrix()
+        if matrix is None:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        query /= norm
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, self.count, self.CHUNK_ROWS):
+            scores = matrix[start:start + self.CHUNK_ROWS] @ query
+            if len(scores) > k:
+                top = np.argpartition(scores, -k)[-k:]
+            else:
+                top = np.arange(len(scores))
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_rows = np.concatenate([best_rows, top + start])
+        order = np.argsort(-best_scores)[:k]
+        return [(float(best_scores[i]), int(best_rows[i])) for i in order]
+
+class AnswerRetriever:
+    """Finds earlier assistant answers similar to a new prompt.
+
+    Answers are embedded as they are saved (from the history logs, picking
+    up where the last update stopped) and kept in a ``VectorIndex``. For a
+    new prompt the closest answers above ``min_score`` are offered to the
+    user as suggestions and added to the context as a system message, so
+    the model can build on them instead of working the answer out again.
+    """
+
+    REFERENCE_HEADER = "Answers given earlier to similar questions:"
+
+    def __init__(self, directory: str, embedder: Embedder, top_k: int = 3,
+                 min_score: float = 0.75, max_chars: int = 1200, batch_size: int = 32):
+        self.embedder = embedder
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_chars = max_chars
+        self.batch_size = batch_size
+        self.index = VectorIndex(directory)
+        self._lock = None
+        if self.index.meta["signature"] not in (None, embedder.signature):
+            # Vectors from another embedder cannot be compared; reindex
+            self.index.reset(embedder.signature, 0)
+
+    @classmethod
+    def from_settings(cls, directory: str):
+        """Create a retriever from the ``retrieval`` settings section."""
+        config = settings.get("retrieval")
+        return cls(
+            directory,
+            create_embedder(config["embedder"]),
+            top_k=config["top_k"],
+            min_score=config["min_score"],
+            max_chars=config["max_chars"]
+        )
+
+    @staticmethod
+    def available() -> bool:
+        """Whether NumPy, which the index needs, is installed."""
+        return np is not None
+
+    def reserve_tokens(self, chars_per_token: float) -> int:
+        """Estimate the context tokens the retrieved answers may take."""
+        return int((self.top_k * self.max_chars + len(self.REFERENCE_HEADER)) / chars_per_token)
+
+    async def _embed(self, texts: List[str], background: bool = False) -> List[List[float]]:
+        """Embed texts, queueing for the backend's slots like any other request."""
+        if not self.embedder.remote:
+            return await self.embedder.embed(texts)
+        from .scheduler import PRIORITY_BACKGROUND, get_scheduler, request_origin, timed_slot
+        if background:
+            request_origin.set((None, PRIORITY_BACKGROUND))
+        async with timed_slot(get_scheduler(self.embedder.name)):
+            return await self.embedder.embed(texts)
+
+    def _locked(self) -> asyncio.Lock:
+        """Return the lock serializing index changes on the service loop."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def update(self, conversation_id: str, history):
+        """Embed the answers appended to a conversation's history since the last update."""
+        async with self._locked():
+            sources = self.index.meta["sources"]
+            offset = sources.get(conversation_id, 0)
+            if history.size() <= offset:
+                return
+            messages, end = history.read_from(offset)
+            answers = [
+                msg for msg in messages
+                if msg.get("role") == "assistant" and msg.get("content", "").strip()
+            ]
+            for start in range(0, len(answers), self.batch_size):
+                batch = answers[start:start + self.batch_size]
+                vectors = await self._embed([msg["content"] for msg in batch], background=True)
+                if (self.index.meta["signature"] != self.embedder.signature or
+                        self.index.meta["dimensions"] != len(vectors[0])):
+                    self.index.reset(self.embedder.signature, len(vectors[0]))
+                    sources = self.index.meta["sources"]
+                self.index.add(vectors, [
+                    {
+                        "conversation": conversation_id,
+                        "timestamp": msg.get("timestamp"),
+                        "content": msg["content"]
+                    }
+                    for msg in batch
+                ])
+            sources[conversation_id] = end
+            self.index.save_meta()
+
+    def schedule_update(self, conversation_id: str, history):
+        """Run ``update`` on the service loop without waiting for it."""
+        from .ai_service import get_service_manager
+
+        async def run():
+            try:
+                await self.update(conversation_id, history)
+            except Exception as e:
+                print(f"Failed to update answer index: {str(e)}")
+
+        get_service_manager().submit(run())
+
+    async def remove(self, conversation_id: str):
+        """Drop a conversation's answers from the index."""
+        async with self._locked():
+            self.index.meta["sources"].pop(conversation_id, None)
+            replacement = None
+            if self.index.count:
+                # Rewriting a large index takes a while; searches go on
+                # meanwhile and see the new rows once they are switched in
+                replacement = await asyncio.get_running_loop().run_in_executor(
+                    None, self.index.write_without, conversation_id
+                )
+            if replacement is not None:
+                self.index.switch_to(*replacement)
+            self.index.save_meta()
+
+    def remove_conversation(self, conversation_id: str):
+        """Run ``remove`` on the service loop without waiting for it."""
+        from .ai_service import get_service_manager
+
+        async def run():
+            try:
+                await self.remove(conversation_id)
+            except Exception as e:
+                print(f"Failed to remove answers from the index: {str(e)}")
+
+        get_service_manager().submit(run())
+
+    async def retrieve(self, message: str, context: Optional[List[Dict]] = None) -> List[Dict]:
+        """Return up to ``top_k`` earlier answers similar to ``message``, best first.
+
+        Answers already part of ``context`` are skipped. Failures are logged
+        and yield no results, so retrieval never blocks a request.
+        """
+        if not self.index.count or self.index.meta["signature"] != self.embedder.signature:
+            return []
+        try:
+            vector = (await self._embed([message]))[0]
+        except Exception as e:
+            print(f"Failed to embed prompt: {str(e)}")
+            return []
+
+        in_context = {msg["content"] for msg in context or []}
+        results = []
+        # Ask for extra hits to make up for answers already in the context
+        for score, row in self.index.search(vector, self.top_k + len(in_context)):
+            if score < self.min_score or len(results) >= self.top_k:
+                break
+            entry = self.index.entry(row)
+            if entry["content"] in in_context:
+                continue
+            entry["score"] = score
+            results.append(entry)
+        return results
+
+    def augment(self, context: List[Dict], results: List[Dict]) -> List[Dict]:
+        """Return ``context`` with the retrieved answers prepended as a system message."""
+        if not results:
+            return context
+        answers = []
+        for result in results:
+            text = result["content"]
+            if len(text) > self.max_chars:
+                text = text[:self.max_chars].rsplit(" ", 1)[0] + "…"
+            answers.append(text)
+        note = self.REFERENCE_HEADER + "\n\n" + "\n\n---\n\n".join(answers)
+        return [{"role": "system", "content": note}] + list(context or [])
@@ -0,0 +1,135 @@
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+from utils.settings import settings
+
+# Statuses that usually clear up on their own: rate limits, cold starts and
+# overloaded or restarting servers
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class RetryableError(RuntimeError):
+    """A backend failure that may succeed if the request is repeated."""
+
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+async def error_from_response(response) -> RuntimeError:
+    """Build the exception for a non-200 response.
+
+    Retryable statuses become a ``RetryableError`` carrying the server's wait
+    hint: the ``Retry-After`` header, or the ``estimated_time`` the
+    HuggingFace inference API sends while a model is loading.
+    """
+    error_text = await response.text()
+    if response.status not in RETRYABLE_STATUSES:
+        return RuntimeError(f"API request failed: {error_text}")
+
+    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+    if retry_after is None:
+        try:
+            body = await response.json(content_type=None)
+            if isinstance(body, dict) and body.get("estimated_time") is not None:
+                retry_after = float(body["estimated_time"])
+        except (ValueError, TypeError):
+            pass
+
+    return RetryableError(
+        f"API request failed ({response.status}): {error_text}",
+        status=response.status,
+        retry_after=retry_after
+    )
+
+class RetryPolicy:
+    """Jittered exponential backoff bounded by an attempt count and a deadline."""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 20.0, deadline: float = 60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    @classmethod
+    def from_settings(cls):
+        """Create a policy from the ``retry`` settings section."""
+        config = settings.get("retry")
+        return cls(
+            max_attempts=config["max_attempts"],
+            base_delay=config["base_delay"],
+            max_delay=config["max_delay"],
+            deadline=config["deadline"]
+        )
+
+    def delay_for(self, attempt: int, error: Exception) -> float:
+        """Return how long to wait before the next attempt."""
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            # The server told us when it will be ready; add a little jitter
+            # so concurrent requests do not all return at the same instant
+            return min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+        # Full jitter: uniform over the exponential backoff window
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def next_delay(self, attempt: int, error: Exception, started: float) -> Optional[float]:
+        """Return the delay before retrying, or None if the error is final."""
+        if not isinstance(error, RetryableError) or attempt >= self.max_attempts:
+            return None
+        delay = self.delay_for(attempt, error)
+        if time.monotonic() + delay - started > self.deadline:
+            return None
+        return delay
+
+    async def run(self, operation: Callable[[], Awaitable],
+                  attempts: Optional[List[Dict]] = None):
+        """Await ``operation()`` until it succeeds or the policy gives up.
+
+        Every attempt is recorded in ``attempts`` with its duration, error,
+        status and the delay that followed it.
+        """
+        attempts = attempts if attempts is not None else []
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_started = time.monotonic()
+            try:
+                result = await operation()
+            except Exception as e:
+                delay = self.next_delay(attempt, e, started)
+                attempts.append(self.record(attempt, attempt_started, e, delay))
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            attempts.append(self.record(attempt, attempt_started))
+            return result
+
+    @staticmethod
+    def record(attempt: int, attempt_started: float, error: Exception = None,
+               delay: Optional[float] = None) -> Dict:
+        """Build the metrics entry for one attempt."""
+        return {
+            "attempt": attempt,
+            "duration": time.monotonic() - attempt_started,
+            "error": str(error) if error else None,
+            "status": getattr(error, "status", None),
+            "delay": delay
+        }
@@ -0,0 +1,292 @@
+import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional
+from .ai_service import AIService, AIResponse
+from .metrics import current_request
+from .scheduler import get_scheduler, timed_slot
+from utils.settings import settings
+
+class BackendStats:
+    """Rolling latency/error window and circuit breaker state for one backend."""
+
+    def __init__(self, window: int = 50, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Return a latency percentile over the window, or None without samples."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.percentile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self.percentile(0.95)
+
+    @property
+    def error_rate(self) -> float:
+        """Fraction of failed requests in the window."""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    @property
+    def circuit_open(self) -> bool:
+        """Whether requests are currently being kept away from the backend.
+
+        Once the cooldown passes the circuit is half-open: the next request
+        is let through and its outcome closes or reopens the circuit.
+        """
+        return time.monotonic() < self.open_until
+
+    def record_success(self, latency: float):
+        """Record a successful request."""
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self):
+        """Record a failed request, opening the circuit past the threshold."""
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.cooldown
+
+    def snapshot(self) -> Dict:
+        """Return the current health figures."""
+        return {
+            "p50": self.p50,
+            "p95": self.p95,
+            "error_rate": self.error_rate,
+            "samples": len(self.latencies),
+            "circuit_open": self.circuit_open
+        }
+
+class RoutingService(AIService):
+    """Routes each request to the healthiest of several backends.
+
+    Backends are ranked by rolling p50 latency weighted by their configured
+    priority, with backends over the error-rate limit or with an open circuit
+    ranked last. A failed request falls over to the next backend. For
+    non-streaming requests an optional hedge sends the same request to the
+    runner-up once the first choice exceeds its own p95, and the first
+    answer wins.
+    """
+
+    name = "router"
+    # Each backend call takes a slot from that backend's scheduler
+    self_scheduled = True
+
+    def __init__(self):
+        self.backends: Dict[str, AIService] = {}
+        self.stats: Dict[str, BackendStats] = {}
+        self.weights: Dict[str, float] = {}
+        self.max_error_rate = 0.5
+        self.hedge = False
+        self.hedge_min_samples = 10
+        self.model = None
+        self.parameters = {}
+
+    def initialize(self) -> bool:
+        """Initialize every configured backend."""
+        from .ai_service import AIServiceFactory
+
+        config = settings.get("routing")
+        self.weights = dict(config["priorities"])
+        self.max_error_rate = config["max_error_rate"]
+        self.hedge = config["hedge"]
+        self.hedge_min_samples = config["hedge_min_samples"]
+        self.parameters = dict(settings.get("ai_backend", "generation"))
+
+        self.backends = {}
+        for name in self.weights:
+            service = AIServiceFactory.create_backend(name)
+            try:
+                ready = service.initialize()
+            except Exception as e:
+                print(f"Failed to initialize {name} backend: {str(e)}")
+                ready = False
+            if ready:
+                self.backends[name] = service
+                if name not in self.stats:
+                    self.stats[name] = BackendStats(
+                        window=config["window"],
+                        failure_threshold=config["failure_threshold"],
+                        cooldown=config["cooldown"]
+                    )
+
+        self.model = "+".join(
+            f"{name}:{service.model}" for name, service in sorted(self.backends.items())
+        )
+        return bool(self.backends)
+
+    def reconfigure(self, delta: Dict) -> bool:
+        """Pass backend changes on to every routed backend."""
+        if any(key.startswith("ai_backend.generation.") for key in delta):
+            self.parameters = dict(settings.get("ai_backend", "generation"))
+        for service in self.backends.values():
+            if not service.reconfigure(delta):
+                return False
+        self.model = "+".join(
+            f"{name}:{service.model}" for name, service in sorted(self.backends.items())
+        )
+        return bool(self.backends)
+    
+    def reconfigure_routing(self, delta: Dict) -> bool:
+        """Apply changed ``routing`` settings; a new set of backends needs a rebuild."""
+        config = settings.get("routing")
+        if any(key.startswith("routing.priorities.") for key in delta):
+            if set(config["priorities"]) != set(self.weights):
+                return False
+            self.weights = dict(config["priorities"])
+        self.max_error_rate = config["max_error_rate"]
+        self.hedge = config["hedge"]
+        self.hedge_min_samples = config["hedge_min_samples"]
+        for stats in self.stats.values():
+            stats.failure_threshold = config["failure_threshold"]
+            stats.cooldown = config["cooldown"]
+        return True
+    
+    def is_available(self) -> bool:
+        """Check if at least one backend is available."""
+        return any(service.is_available() for service in self.backends.values())
+
+    def ranked(self) -> List[str]:
+        """Return backend names from healthiest to least healthy."""
+        def score(name):
+            stats = self.stats[name]
+            # Untried backends score zero latency so they get sampled
+            latency = stats.p50 or 0.0
+            return (
+                stats.circuit_open,
+                stats.error_rate > self.max_error_rate,
+                latency * self.weights.get(name, 1.0),
+                self.weights.get(name, 1.0)
+            )
+        available = [name for name, service in self.backends.items() if service.is_available()]
+        return sorted(available, key=score)
+
+    async def _call(self, name: str, message: str, context: List[Dict] = None) -> AIResponse:
+        """Call one backend and record the outcome."""
+        try:
+            async with timed_slot(get_scheduler(name), current_request.get()):
+                started = time.monotonic()
+                response = await self.backends[name].generate_response(message, context)
+        except Exception:
+            self.stats[name].record_failure()
+            raise
+        self.stats[name].record_success(time.monotonic() - started)
+        return response
+
+    async def _hedged(self, primary: str, secondary: str, message: str,
+                      context: List[Dict] = None, tried: Optional[set] = None) -> AIResponse:
+        """Race the secondary backend once the primary exceeds its p95.
+
+        The backends actually called are added to ``tried``.
+        """
+        tried = set() if tried is None else tried
+        tried.add(primary)
+        first = asyncio.ensure_future(self._call(primary, message, context))
+        done, _ = await asyncio.wait({first}, timeout=self.stats[primary].p95)
+        if done:
+            return first.result()
+
+        tried.add(secondary)
+        second = asyncio.ensure_future(self._call(secondary, message, context))
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        response = task.result()
+                        response.metadata["hedged"] = True
+                        return response
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def generate_response(self, message: str, context: List[Dict] = None) -> AIResponse:
+        """Generate a response from the healthiest backend, failing over on errors."""
+        order = self.ranked()
+        if not order:
+            raise RuntimeError("No AI backend is available")
+
+        error = None
+        # A failed hedge has already called its runner-up as well
+        tried = set()
+        for position, name in enumerate(order):
+            if name in tried:
+                continue
+            try:
+                runner_up = next((
+                    other for other in order[position + 1:]
+                    if other not in tried and not self.stats[other].circuit_open
+                ), None)
+                stats = self.stats[name]
+                if (self.hedge and runner_up is not None and
+                        len(stats.latencies) >= self.hedge_min_samples):
+                    return await self._hedged(name, runner_up, message, context, tried)
+                tried.add(name)
+                return await self._call(name, message, context)
+            except Exception as e:
+                error = e
+        raise error
+
+    def _attribute(self, name: str):
+        """Credit the measured request to the backend that is streaming it."""
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.backend = name
+            metrics.model = self.backends[name].model
+
+    async def stream_response(self, message: str, context: List[Dict] = None) -> AsyncIterator[str]:
+        """Stream from the healthiest backend, failing over before the first delta."""
+        order = self.ranked()
+        if not order:
+            raise RuntimeError("No AI backend is available")
+
+        error = None
+        for name in order:
+            stats = self.stats[name]
+            received = False
+            try:
+                async with timed_slot(get_scheduler(name), current_request.get()):
+                    started = time.monotonic()
+                    async for delta in self.backends[name].stream_response(message, context):
+                        if not received:
+                            received = True
+                            self._attribute(name)
+                        yield delta
+            except Exception as e:
+                stats.record_failure()
+                if received:
+                    raise
+                error = e
+                continue
+            stats.record_success(time.monotonic() - started)
+            return
+        raise error
+
+    def health(self) -> Dict[str, Dict]:
+        """Return rolling health figures per backend."""
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+    async def close(self):
+        """Close all backends."""
+        for service in self.backends.values():
+            await service.close()
@@ -0,0 +1,147 @@
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Hashable, Optional, Tuple
+from utils.settings import settings
+
+# Lower numbers are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# (queue key, priority) of the request running on the current task; set by
+# the service manager when a conversation starts a request, so retries,
+# fan-out targets and the backends themselves need not pass it along
+request_origin: ContextVar[Tuple[Optional[Hashable], int]] = ContextVar(
+    "request_origin", default=(None, PRIORITY_INTERACTIVE)
+)
+
+class RequestScheduler:
+    """Limits concurrent requests to one backend and queues the rest fairly.
+
+    Waiting requests are served by priority (lower first). Within a priority
+    every queue key (a conversation) gets its own FIFO and the keys take
+    turns, so one conversation sending many prompts cannot starve another.
+    A request cancelled while waiting simply leaves its queue.
+    """
+
+    def __init__(self, max_concurrent: int = 4):
+        self.max_concurrent = max_concurrent
+        self.active = 0
+        self._waiting: Dict[int, "OrderedDict[Hashable, deque]"] = {}
+
+    @classmethod
+    def from_settings(cls, backend: Optional[str] = None):
+        """Create a scheduler with the configured limit for ``backend``."""
+        return cls(cls.limit_for(backend))
+
+    @staticmethod
+    def limit_for(backend: Optional[str]) -> int:
+        """Return the configured concurrency limit for ``backend``."""
+        config = settings.get("scheduler")
+        return config["backend_limits"].get(backend, config["max_concurrent"])
+
+    @property
+    def queued(self) -> int:
+        """Return how many requests are waiting for a slot."""
+        return sum(
+            len(waiters)
+            for queues in self._waiting.values()
+            for waiters in queues.values()
+        )
+
+    def set_limit(self, max_concurrent: int):
+        """Change the limit, admitting waiting requests if it was raised."""
+        self.max_concurrent = max_concurrent
+        self._wake()
+
+    def _next(self) -> Optional[asyncio.Future]:
+        """Pop the next waiter: best priority, then round-robin over keys."""
+        for priority in sorted(self._waiting):
+            queues = self._waiting[priority]
+            while queues:
+                key, waiters = next(iter(queues.items()))
+                future = waiters.popleft()
+                cancelled = future.cancelled()
+                if not waiters:
+                    del queues[key]
+                elif not cancelled:
+                    # Served keys go to the back; a cancelled waiter costs no turn
+                    queues.move_to_end(key)
+                if not queues:
+                    del self._waiting[priority]
+                if not cancelled:
+                    return future
+        return None
+
+    def _wake(self):
+        """Hand free slots to waiting requests."""
+        while self.active < self.max_concurrent:
+            future = self._next()
+            if future is None:
+                return
+            self.active += 1
+            future.set_result(None)
+
+    def _release(self):
+        """Give a slot back."""
+        self.active -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, key: Optional[Hashable] = None, priority: int = PRIORITY_INTERACTIVE):
+        """Hold one of the backend's request slots for the duration of the block."""
+        if self.active < self.max_concurrent and not self._waiting:
+            self.active += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(priority, OrderedDict()).setdefault(key, deque()).append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Granted a slot just as the request was cancelled
+                    self._release()
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self) -> Dict:
+        """Return the number of running and waiting requests."""
+        return {
+            "limit": self.max_concurrent,
+            "active": self.active,
+            "queued": self.queued
+        }
+
+@asynccontextmanager
+async def timed_slot(scheduler: RequestScheduler, metrics=None):
+    """Acquire a slot for the current request, adding the wait to ``metrics.queued``."""
+    waited = time.monotonic()
+    async with scheduler.slot(*request_origin.get()):
+        if metrics is not None:
+            metrics.queued += time.monotonic() - waited
+        yield
+
+# One scheduler per backend, shared by the active service, the router's
+# backends and fan-out targets so the limit holds however a request arrives
+_schedulers: Dict[str, RequestScheduler] = {}
+
+def get_scheduler(backend: str) -> RequestScheduler:
+    """Return the scheduler for ``backend``, creating it on first use."""
+    scheduler = _schedulers.get(backend)
+    if scheduler is None:
+        scheduler = _schedulers[backend] = RequestScheduler.from_settings(backend)
+    return scheduler
+
+def update_limits():
+    """Apply the configured limits to the existing schedulers."""
+    for backend, scheduler in _schedulers.items():
+        scheduler.set_limit(RequestScheduler.limit_for(backend))
+
+def scheduler_stats() -> Dict[str, Dict]:
+    """Return running and waiting request counts per backend."""
+    return {backend: scheduler.stats() for backend, scheduler in _schedulers.items()}
@@ -0,0 +1,265 @@
+import os
+import re
+import sqlite3
+import threading
+import concurrent.futures
+from typing import Dict, List, Optional
+
+# Words and numbers; everything else in a query is treated as a separator
+QUERY_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+class SearchIndex:
+    """Full-text index over the history of every conversation.
+
+    Messages are copied from the history logs into an SQLite database with
+    an FTS5 inverted index, so a ranked search reads a few index pages
+    instead of the history. The index remembers how far into each log it
+    has read and only ever reads what was appended since; a log that shrank
+    (compaction) is reindexed. Relevance ranking covers the most recent
+    ``RANKED_CANDIDATES`` matches, which keeps queries for common words as
+    fast as rare ones on large histories. Without FTS5 in the bundled SQLite, searches
+    fall back to an unranked substring scan.
+
+    Changes go through ``schedule_update``/``schedule_delete``, which run
+    them in order on one worker thread, so indexing a long history the
+    first time it is opened never holds up the GUI. Each thread has its
+    own connection; with WAL, searches read while the worker writes.
+    """
+
+    SNIPPET_TOKENS = 16
+    # Matches ranked by relevance; older matches of very common words are not
+    RANKED_CANDIDATES = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._executor = None
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.fts = self._create_schema()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, reopening it after ``close``."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Opened per thread, but closed from whichever thread calls close()
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                self._connections.append(connection)
+            self._local.connection = connection
+        return connection
+
+    def _submit(self, func, *args) -> concurrent.futures.Future:
+        """Run ``func`` on the index worker thread, logging failures."""
+        def run():
+            try:
+                return func(*args)
+            except Exception as e:
+                print(f"Failed to update search index: {str(e)}")
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=1,
+                    thread_name_prefix="search-index"
+                )
+            try:
+                return self._executor.submit(run)
+            except RuntimeError:
+                # Executors take no work once the interpreter is shutting
+                # down, when the last messages are saved; index them here
+                pass
+        future = concurrent.futures.Future()
+        future.set_result(run())
+        return future
+
+    def schedule_update(self, conversation_id: str, history) -> concurrent.futures.Future:
+        """Run ``update`` on the worker thread."""
+        return self._submit(self.update, conversation_id, history)
+
+    def schedule_delete(self, conversation_id: str) -> concurrent.futures.Future:
+        """Run ``delete_conversation`` on the worker thread."""
+        return self._submit(self.delete_conversation, conversation_id)
+
+    def _create_schema(self) -> bool:
+        """Create the tables, returning whether FTS5 is available."""
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY,
+                    conversation TEXT NOT NULL,
+                    role TEXT,
+                    timestamp TEXT,
+                    content TEXT
+                );
+                CREATE INDEX IF NOT EXISTS messages_by_time ON messages (conversation, timestamp);
+                CREATE TABLE IF NOT EXISTS sources (
+                    conversation TEXT PRIMARY KEY,
+                    offset INTEGER NOT NULL
+                );
+            """)
+        try:
+            with self.connection:
+                self.connection.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                        content, content='messages', content_rowid='id',
+                        tokenize='porter unicode61', prefix='2 3 4'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS messages_insert AFTER INSERT ON messages BEGIN
+                        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS messages_delete AFTER DELETE ON messages BEGIN
+                        INSERT INTO messages_fts (messages_fts, rowid, content)
+                        VALUES ('delete', old.id, old.content);
+                    END;
+                """)
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable, using a plain scan: {str(e)}")
+            return False
+        return True
+
+    def update(self, conversation_id: str, history) -> int:
+        """Index the messages appended to ``history`` since the last update.
+
+        Returns the number of messages added.
+        """
+        row = self.connection.execute(
+            "SELECT offset FROM sources WHERE conversation = ?", (conversation_id,)
+        ).fetchone()
+        offset = row[0] if row else 0
+        size = history.size()
+        if size == offset:
+            return 0
+
+        with self.connection:
+            if size < offset:
+                # The log was compacted or cleared; start over
+                self.connection.execute("DELETE FROM messages WHERE conversation = ?", (conversation_id,))
+                offset = 0
+            messages, offset = history.read_from(offset)
+            self.connection.executemany(
+                "INSERT INTO messages (conversation, role, timestamp, content) VALUES (?, ?, ?, ?)",
+                [
+                    (conversation_id, msg.get("role"), msg.get("timestamp"), msg.get("content", ""))
+                    for msg in messages
+                ]
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO sources (conversation, offset) VALUES (?, ?)",
+                (conversation_id, offset)
+            )
+        return len(messages)
+
+    def delete_conversation(self, conversation_id: str):
+        """Drop a conversation from the index."""
+        with self.connection:
+            self.connection.execute("DELETE FROM messages WHERE conversation = ?", (conversation_id,))
+            self.connection.execute("DELETE FROM sources WHERE conversation = ?", (conversation_id,))
+
+    @staticmethod
+    def match_expression(query: str) -> Optional[str]:
+        """Turn free text into an FTS5 query: all words, the last one as a prefix."""
+        tokens = QUERY_TOKEN.findall(query)
+        if not tokens:
+            return None
+        terms = [f'"{token}"' for token in tokens]
+        terms[-1] += "*"
+        return " ".join(terms)
+
+    def search(self, query: str, role: Optional[str] = None, since: Optional[str] = None,
+               until: Optional[str] = None, conversation: Optional[str] = None,
+               limit: int = 50, highlight=("[", "]")) -> List[Dict]:
+        """Return the best matches for ``query``, most relevant first.
+
+        ``since``/``until`` are ISO timestamps (or dates) bounding the
+        message time; ``highlight`` is the pair of markers placed around
+        matched words in each result's ``snippet``.
+        """
+        filters = []
+        parameters = []
+        for clause, value in (
+            ("m.role = ?", role),
+            ("m.timestamp >= ?", since),
+            ("m.timestamp < ?", until),
+            ("m.conversation = ?", conversation)
+        ):
+            if value is not None:
+                filters.append(clause)
+                parameters.append(value)
+
+        if self.fts:
+            expression = self.match_expression(query)
+            if expression is None:
+                return []
+            where = "WHERE messages_fts MATCH ?" + "".join(f" AND {clause}" for clause in filters)
+            try:
+                # Scoring every match of a common word costs far more than
+                # walking the matches newest first, so only the most recent
+                # candidates are ranked
+                oldest = self.connection.execute(
+                    "SELECT messages_fts.rowid FROM messages_fts "
+                    "JOIN messages m ON m.id = messages_fts.rowid "
+                    f"{where} ORDER BY messages_fts.rowid DESC LIMIT 1 OFFSET ?",
+                    [expression] + parameters + [self.RANKED_CANDIDATES - 1]
+                ).fetchone()
+            except sqlite3.OperationalError as e:
+                print(f"Search failed: {str(e)}")
+                return []
+            if oldest is not None:
+                where += " AND messages_fts.rowid >= ?"
+                parameters.append(oldest[0])
+            sql = (
+                "SELECT m.conversation, m.role, m.timestamp, m.content, "
+                "snippet(messages_fts, 0, ?, ?, '…', ?) "
+                "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                f"{where} ORDER BY rank LIMIT ?"
+            )
+            parameters = [highlight[0], highlight[1], self.SNIPPET_TOKENS, expression] + parameters + [limit]
+        else:
+            text = query.strip()
+            if not text:
+                return []
+            sql = (
+                "SELECT m.conversation, m.role, m.timestamp, m.content, NULL FROM messages m "
+                "WHERE m.content LIKE ? ESCAPE '\\'"
+                + "".join(f" AND {clause}" for clause in filters)
+                + " ORDER BY m.timestamp DESC LIMIT ?"
+            )
+            escaped = re.sub(r"([%_\\])", r"\\\1", text)
+            parameters = [f"%{escaped}%"] + parameters + [limit]
+
+        try:
+            rows = self.connection.execute(sql, parameters).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Search failed: {str(e)}")
+            return []
+        return [
+            {
+                "conversation": conversation_id,
+                "role": role,
+                "timestamp": timestamp,
+                "content": content,
+                "snippet": snippet if snippet is not None else content[:200]
+            }
+            for conversation_id, role, timestamp, content, snippet in rows
+        ]
+
+    def close(self):
+        """Finish pending updates and close the database.
+
+        The index stays usable; connections are reopened when needed.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        # Drop the stale connections of other threads as they come back
+        self._local = threading.local()
@@ -0,0 +1,80 @@
+import asyncio
+import aiohttp
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+from .metrics import trace_config
+from utils.settings import settings
+
+class SessionPool:
+    """Shared, long-lived aiohttp sessions keyed by endpoint origin.
+    
+    Services borrow a session from the pool instead of owning one, so
+    rebuilding a service (on ``switch_backend`` or a failed availability
+    check) keeps the warm keep-alive connections to the endpoint.
+    """
+    
+    def __init__(self):
+        self._sessions: Dict[Tuple[str, int], aiohttp.ClientSession] = {}
+    
+    @staticmethod
+    def origin(url: str) -> str:
+        """Return the scheme://host:port part of a URL."""
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create a session with the configured connector limits."""
+        config = settings.get("ai_backend", "connection_pool")
+        connector = aiohttp.TCPConnector(
+            limit=config["limit"],
+            limit_per_host=config["limit_per_host"],
+            keepalive_timeout=config["keepalive_timeout"],
+            ttl_dns_cache=config["dns_cache_ttl"],
+            use_dns_cache=config["dns_cache_ttl"] > 0,
+            enable_cleanup_closed=True
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers={"Content-Type": "application/json"},
+            trace_configs=[trace_config()]
+        )
+    
+    @staticmethod
+    def request_timeout() -> aiohttp.ClientTimeout:
+        """Build the per-request timeout from ``ai_backend.timeouts``."""
+        config = settings.get("ai_backend", "timeouts")
+        return aiohttp.ClientTimeout(
+            total=config["total"] or None,
+            connect=config["connect"] or None,
+            sock_read=config["read"] or None
+        )
+    
+    def get_session(self, url: str) -> aiohttp.ClientSession:
+        """Return the pooled session for the origin of ``url``.
+        
+        Must be called from the event loop the session will be used on.
+        """
+        loop = asyncio.get_event_loop()
+        key = (self.origin(url), id(loop))
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = self._create_session()
+            self._sessions[key] = session
+        return session
+    
+    async def close_endpoint(self, url: str):
+        """Close the pooled session for the origin of ``url``."""
+        origin = self.origin(url)
+        for key in [key for key in self._sessions if key[0] == origin]:
+            await self._sessions.pop(key).close()
+    
+    async def close(self):
+        """Close all pooled sessions."""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+# Create global session pool instance
+session_pool = SessionPool()
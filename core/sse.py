@@ -0,0 +1,29 @@
+import json
+from typing import AsyncIterator, Dict
+from .metrics import current_request
+
+
+async def iter_sse_events(response) -> AsyncIterator[Dict]:
+    """Yield decoded JSON payloads from a server-sent events response.
+
+    Both the OpenAI-compatible ``chat/completions`` stream served by LM Studio
+    and the HuggingFace text-generation stream use ``data: <json>`` lines,
+    with OpenAI terminating the stream with ``data: [DONE]``.
+    """
+    # aiohttp only traces body chunks for buffered reads, so count them here
+    metrics = current_request.get()
+    async for raw_line in response.content:
+        if metrics is not None:
+            metrics.response_bytes += len(raw_line)
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if not line or line.startswith(":") or not line.startswith("data:"):
+            continue
+
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+
+        try:
+            yield json.loads(data)
+        except json.JSONDecodeError:
+            continue
@@ -0,0 +1,121 @@
+import os
+import json
+from typing import Dict, List, Optional
+from utils.settings import settings
+
+SUMMARY_PROMPT = (
+    "Condense the following design conversation into a short summary that "
+    "keeps the facts, decisions, dimensions and open questions needed to "
+    "continue it. Reply with the summary only.\n\n"
+    "{previous}{turns}"
+)
+
+class ConversationSummarizer:
+    """Rolling summary of the turns that no longer fit the context budget.
+
+    Once the turns dropped by the ``ContextBuilder`` exceed a token threshold,
+    the active backend condenses them, together with the previous summary,
+    into a new summary. The summary and the timestamp of the last turn it
+    covers are stored next to the chat history, so later prompts are sent as
+    summary + recent turns and their size stays flat over a long session.
+    """
+
+    def __init__(self, path: str, threshold_tokens: int = 1500, max_summary_chars: int = 2000):
+        self.path = path
+        self.threshold_tokens = threshold_tokens
+        self.max_summary_chars = max_summary_chars
+        self.summary = ""
+        self.covered_until = ""
+        self.updating = False
+        self._load()
+
+    @classmethod
+    def from_settings(cls, filename: str = "summary.json"):
+        """Create a summarizer stored alongside the chat history."""
+        config = settings.get("summary")
+        history_dir = os.path.join(
+            os.path.dirname(settings.addon_path),
+            settings.get("history", "save_path")
+        )
+        return cls(
+            os.path.join(history_dir, filename),
+            threshold_tokens=config["threshold_tokens"],
+            max_summary_chars=config["max_summary_chars"]
+        )
+
+    def _load(self):
+        """Load the stored summary."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                state = json.load(f)
+            self.summary = state.get("summary", "")
+            self.covered_until = state.get("covered_until", "")
+        except Exception as e:
+            print(f"Failed to load conversation summary: {str(e)}")
+
+    def _save(self):
+        """Atomically store the summary."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({
+                "summary": self.summary,
+                "covered_until": self.covered_until
+            }, f)
+        os.replace(temp_path, self.path)
+
+    def uncovered(self, history: List[Dict]) -> List[Dict]:
+        """Return the turns of ``history`` not yet folded into the summary."""
+        if not self.covered_until:
+            return history
+        # Scan from the end; covered turns are always a prefix
+        index = len(history)
+        while index > 0 and history[index - 1].get("timestamp", "") > self.covered_until:
+            index -= 1
+        return history[index:]
+
+    def should_update(self, dropped: List[Dict], count_tokens) -> bool:
+        """Return True once the dropped turns are worth summarizing."""
+        if self.updating or not dropped:
+            return False
+        tokens = sum(count_tokens(msg["content"]) for msg in dropped)
+        return tokens >= self.threshold_tokens
+
+    def build_prompt(self, turns: List[Dict]) -> str:
+        """Build the summarization request for ``turns``."""
+        previous = f"Summary so far:\n{self.summary}\n\n" if self.summary else ""
+        lines = [f"{msg['role'].title()}: {msg['content']}" for msg in turns]
+        return SUMMARY_PROMPT.format(previous=previous, turns="\n".join(lines))
+
+    async def update(self, turns: List[Dict], generate) -> Optional[str]:
+        """Fold ``turns`` into the summary using ``generate(prompt)``.
+
+        ``generate`` is a coroutine function returning an ``AIResponse``.
+        The stored summary is left unchanged if generation fails.
+        """
+        if not turns:
+            return None
+
+        self.updating = True
+        try:
+            response = await generate(self.build_prompt(turns))
+            if response.metadata.get("error") or not response.text.strip():
+                return None
+            self.summary = response.text.strip()[:self.max_summary_chars]
+            self.covered_until = turns[-1].get("timestamp", "")
+            self._save()
+            return self.summary
+        except Exception as e:
+            print(f"Failed to update conversation summary: {str(e)}")
+            return None
+        finally:
+            self.updating = False
+
+    def clear(self):
+        """Forget the summary."""
+        self.summary = ""
+        self.covered_until = ""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,63 +1,549 @@
 import os
+import html
 import json
-import asyncio
-from datetime import datetime
+from functools import partial
 from PySide import QtGui, QtCore
 import FreeCADGui
 from utils.settings import settings
-from core.ai_service import service_manager
+from core.ai_service import CancellationToken, get_service_manager
+from core.conversations import ConversationManager
+from core.document_context import document_context
+from core.macros import apply_macro, describe_result, extract_macro, macro_runner
+from .message_view import MessageListView
+from .search_panel import SearchPanel
 from .settings_dialog import SettingsDialog
+from .stats_panel import StatsPanel
 
-class ChatBubble(QtGui.QWidget):
-    """Custom widget for chat message bubbles."""
+class ResponseSignals(QtCore.QObject):
+    """Carries AI responses from the service loop thread to the GUI thread."""
     
-    def __init__(self, text, is_user=True, parent=None):
+    delta = QtCore.Signal(int, str)
+    finished = QtCore.Signal(int, str)
+    failed = QtCore.Signal(int, str)
+    cancelled = QtCore.Signal(int)
+    column_delta = QtCore.Signal(int, int, str)
+    column_finished = QtCore.Signal(int, int, str, bool)
+    group_finished = QtCore.Signal(int)
+    retrieved = QtCore.Signal(int, list)
+    macro_finished = QtCore.Signal(int, dict)
+
+class ConversationView(QtGui.QWidget):
+    """Messages, input and in-flight requests of one conversation tab."""
+    
+    # Number of responses still in flight, for the tab title
+    pending_changed = QtCore.Signal(int)
+    
+    def __init__(self, conversation, compare_action, parent=None):
         super().__init__(parent)
-        self.text = text
-        self.is_user = is_user
+        self.conversation = conversation
+        self.compare_action = compare_action
+        self.pending = {}
+        self.requests = {}
+        self.group_rows = {}
+        self.answered = set()
+        self.suggestions = {}
+        self.replacements = {}
+        self.macro = None
+        self.macro_id = 0
+        self.macro_run = None
+        self._next_request_id = 0
+        # Not a child of the view: the service loop may still emit after the
+        # tab is deleted, so the signals live as long as its callbacks do
+        self.signals = ResponseSignals()
+        self.signals.delta.connect(self.on_response_delta)
+        self.signals.finished.connect(self.on_response_finished)
+        self.signals.failed.connect(self.on_response_failed)
+        self.signals.cancelled.connect(self.on_response_cancelled)
+        self.signals.column_delta.connect(self.on_column_delta)
+        self.signals.column_finished.connect(self.on_column_finished)
+        self.signals.group_finished.connect(self.on_group_finished)
+        self.signals.retrieved.connect(self.on_retrieved)
+        self.signals.macro_finished.connect(self.on_macro_finished)
         self.init_ui()
-        
+        self.load_history()
+    
     def init_ui(self):
-        layout = QtGui.QHBoxLayout()
+        """Initialize the conversation UI."""
+        layout = QtGui.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
         
-        # Create message bubble
-        bubble = QtGui.QLabel(self.text)
-        bubble.setWordWrap(True)
-        bubble.setTextInteractionFlags(QtCore.Qt.TextSelectableByMouse)
+        # Create virtualized message list
+        self.message_view = MessageListView()
+        self.message_model = self.message_view.message_model
+        self.message_view.top_reached.connect(self.load_older_history)
+        layout.addWidget(self.message_view)
         
-        # Get colors from settings
-        colors = settings.get("ui", "chat_colors")
-        bubble_color = colors["user_bubble"] if self.is_user else colors["ai_bubble"]
-        
-        # Style the bubble
-        bubble.setStyleSheet(f"""
-            QLabel {{
-                background-color: {bubble_color};
-                border-radius: 10px;
-                padding: 8px;
-                color: white;
-            }}
-        """)
-        
-        # Add spacing and bubble to layout
-        if self.is_user:
-            layout.addStretch()
-            layout.addWidget(bubble)
+        # Offer a matching earlier answer while a new one is generated
+        self.suggestion_label = QtGui.QLabel()
+        self.suggestion_label.setWordWrap(True)
+        self.suggestion_label.setStyleSheet("color: gray;")
+        self.suggestion_label.linkActivated.connect(self.use_suggestion)
+        self.suggestion_label.hide()
+        layout.addWidget(self.suggestion_label)
+        
+        # Offer to run the macro of the latest answer and show its progress
+        self.macro_label = QtGui.QLabel()
+        self.macro_label.setWordWrap(True)
+        self.macro_label.setStyleSheet("color: gray;")
+        self.macro_label.linkActivated.connect(self.on_macro_link)
+        self.macro_label.hide()
+        layout.addWidget(self.macro_label)
+        
+        # Create input area
+        input_layout = QtGui.QHBoxLayout()
+        layout.addLayout(input_layout)
+        
+        # Create message input
+        self.message_input = QtGui.QTextEdit()
+        self.message_input.setMaximumHeight(100)
+        self.message_input.textChanged.connect(self.adjust_input_height)
+        input_layout.addWidget(self.message_input)
+        
+        # Create send button
+        send_button = QtGui.QPushButton("Send")
+        send_button.clicked.connect(self.send_message)
+        input_layout.addWidget(send_button)
+        
+        # Create stop button for in-flight responses
+        self.stop_button = QtGui.QPushButton("Stop")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_responses)
+        input_layout.addWidget(self.stop_button)
+        
+        # Show how many responses are still in flight
+        self.pending_label = QtGui.QLabel()
+        self.pending_label.setStyleSheet("color: gray;")
+        self.pending_label.hide()
+        layout.addWidget(self.pending_label)
+    
+    def adjust_input_height(self):
+        """Adjust the height of the input field based on content."""
+        document_height = self.message_input.document().size().height()
+        self.message_input.setMinimumHeight(min(document_height + 10, 100))
+    
+    def insert_newline(self):
+        """Insert a new line in the input field."""
+        cursor = self.message_input.textCursor()
+        cursor.insertText("\\n")
+    
+    def add_message(self, text, is_user=True):
+        """Add a message bubble to the chat."""
+        seq = self.add_bubble(text, is_user)
+        self.record_message(text, is_user)
+        return seq
+    
+    def add_bubble(self, text, is_user=True, pending=False):
+        """Add a message bubble to the chat without recording it."""
+        return self.message_model.append_message(text, is_user, pending)
+    
+    def record_message(self, text, is_user=True, **extra):
+        """Save a message to the conversation history."""
+        self.conversation.record("user" if is_user else "assistant", text, **extra)
+    
+    def get_ai_response(self, request_id, message, context):
+        """Start an AI request and return its cancellation token."""
+        streaming = settings.get("ai_backend", "streaming")
+        retriever = self.conversation.retriever
+        token = get_service_manager().request(
+            message,
+            context=context,
+            stream=streaming,
+            on_delta=partial(self.signals.delta.emit, request_id) if streaming else None,
+            conversation=self.conversation.id,
+            retriever=retriever,
+            on_retrieved=partial(self.signals.retrieved.emit, request_id) if retriever else None
+        )
+        token.add_done_callback(partial(self._on_response_done, request_id))
+        return token
+    
+    def send_message(self):
+        """Send the current message."""
+        message = self.message_input.toPlainText().strip()
+        if not message:
+            return
+        
+        # Clear input
+        self.message_input.clear()
+        
+        # Build the context from the open document and the history before
+        # this message; FreeCAD objects may only be read on this thread
+        context = self.conversation.build_context(message, document_context.digest())
+        
+        # Add user message
+        self.add_message(message, is_user=True)
+        
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        
+        if self.compare_action.isChecked():
+            # Show side-by-side pending bubbles, one per fan-out target
+            targets = settings.get("fanout", "targets")
+            seq = self.message_model.append_group([self.target_label(t) for t in targets])
+            self.pending[request_id] = seq
+            self.group_rows[request_id] = seq
+            self.requests[request_id] = self.compare_responses(request_id, message, context, targets)
+        else:
+            # Show a pending bubble for the response
+            self.pending[request_id] = self.add_bubble("", is_user=False, pending=True)
+            
+            # Get AI response on the service loop thread
+            self.requests[request_id] = self.get_ai_response(request_id, message, context)
+        self.update_pending_state()
+    
+    @staticmethod
+    def target_label(target):
+        """Return the display label of a fan-out target."""
+        if target.get("model"):
+            return f"{target['backend']}: {target['model']}"
+        return target["backend"]
+    
+    def compare_responses(self, request_id, message, context, targets):
+        """Ask every fan-out target at once and return the cancellation token."""
+        streaming = settings.get("ai_backend", "streaming")
+        token = get_service_manager().request_many(
+            message,
+            context=context,
+            targets=targets,
+            mode=settings.get("fanout", "mode"),
+            on_delta=partial(self.signals.column_delta.emit, request_id) if streaming else None,
+            on_result=partial(self._on_column_result, request_id),
+            conversation=self.conversation.id
+        )
+        token.add_done_callback(partial(self._on_group_done, request_id))
+        return token
+    
+    def _on_column_result(self, request_id, column, response):
+        """Relay one finished fan-out target to the GUI thread."""
+        error = response.metadata.get("error")
+        self.signals.column_finished.emit(request_id, column, error or response.text, bool(error))
+    
+    def _on_group_done(self, request_id, token):
+        """Relay the end of a fan-out request to the GUI thread."""
+        if token.cancelled:
+            self.signals.cancelled.emit(request_id)
+            return
+        try:
+            token.result()
+        except Exception as e:
+            self.signals.failed.emit(request_id, str(e))
+            return
+        self.signals.group_finished.emit(request_id)
+    
+    def stop_responses(self):
+        """Cancel all in-flight requests and macro runs."""
+        for token in list(self.requests.values()):
+            token.cancel()
+        if self.macro_run is not None:
+            self.macro_run.cancel()
+    
+    def detach(self):
+        """Cancel in-flight work and drop its results before the tab is deleted."""
+        self.signals.blockSignals(True)
+        self.stop_responses()
+    
+    def _on_response_done(self, request_id, token):
+        """Relay a completed request to the GUI thread."""
+        if token.cancelled:
+            self.signals.cancelled.emit(request_id)
+            return
+        try:
+            response = token.result()
+        except Exception as e:
+            self.signals.failed.emit(request_id, str(e))
+            return
+        self.signals.finished.emit(request_id, response.text or "")
+    
+    def on_response_delta(self, request_id, delta):
+        """Append a streamed delta to the pending bubble."""
+        seq = self.pending.get(request_id)
+        if seq is not None:
+            self.message_model.append_delta(seq, delta)
+    
+    def on_retrieved(self, request_id, results):
+        """Offer a close enough earlier answer while the response is pending."""
+        if request_id not in self.pending or not results:
+            return
+        best = results[0]
+        if best["score"] < settings.get("retrieval", "suggest_score"):
+            return
+        self.suggestions[request_id] = best["content"]
+        preview = best["content"][:200] + ("\u2026" if len(best["content"]) > 200 else "")
+        self.suggestion_label.setText(
+            f"Answered before ({best['score']:.0%} similar): {html.escape(preview)} "
+            f'<a href="{request_id}">Use this answer</a>'
+        )
+        self.suggestion_label.show()
+    
+    def use_suggestion(self, link):
+        """Stop generating and answer with the suggested earlier answer."""
+        request_id = int(link)
+        text = self.suggestions.get(request_id)
+        token = self.requests.get(request_id)
+        if text is None or token is None:
+            return
+        self.replacements[request_id] = text
+        token.cancel()
+    
+    def _clear_suggestion(self, request_id):
+        """Forget the suggestion of a finished request."""
+        self.suggestions.pop(request_id, None)
+        if not self.suggestions:
+            self.suggestion_label.hide()
+    
+    def on_response_finished(self, request_id, text):
+        """Finalize a pending bubble with the complete response."""
+        self._clear_suggestion(request_id)
+        self.requests.pop(request_id, None)
+        seq = self.pending.pop(request_id, None)
+        if seq is not None:
+            self.message_model.set_pending(seq, False)
+            self.message_model.set_text(seq, text)
+        if text:
+            self.record_message(text, is_user=False)
+            self.offer_macro(text)
+        self.update_pending_state()
+    
+    def offer_macro(self, text):
+        """Offer to run the Python code of an answer, or run it right away."""
+        config = settings.get("macros")
+        code = extract_macro(text) if config["enabled"] else None
+        if code is None:
+            return
+        self.macro = code
+        self.macro_id += 1
+        if config["auto_run"]:
+            self.run_macro()
+        else:
+            self.show_macro_state("The answer contains a Python macro.", run=True)
+    
+    def show_macro_state(self, text, run=False, stop=False, apply=False):
+        """Show the macro status with the applicable actions."""
+        links = []
+        if run:
+            links.append(f'<a href="run:{self.macro_id}">Run it in the background</a>')
+        if stop:
+            links.append(f'<a href="stop:{self.macro_id}">Stop</a>')
+        if apply:
+            links.append(f'<a href="apply:{self.macro_id}">Apply to model</a>')
+        self.macro_label.setText(" ".join([html.escape(text)] + links))
+        self.macro_label.show()
+    
+    def on_macro_link(self, link):
+        """Handle the run/stop/apply links of the macro status."""
+        action, macro_id = link.split(":")
+        if int(macro_id) != self.macro_id:
+            return
+        if action == "run":
+            self.run_macro()
+        elif action == "stop" and self.macro_run is not None:
+            self.macro_run.cancel()
+        elif action == "apply":
+            self.apply_macro_to_model()
+    
+    def run_macro(self):
+        """Run the current macro on a copy of the document off the GUI thread."""
+        if self.macro_run is not None:
+            self.macro_run.cancel()
+        self.show_macro_state("Running the macro\u2026", stop=True)
+        self.macro_run = CancellationToken(macro_runner.start(self.macro))
+        self.macro_run.add_done_callback(partial(self._on_macro_done, self.macro_id))
+    
+    def _on_macro_done(self, macro_id, token):
+        """Relay a finished macro run to the GUI thread."""
+        if token.cancelled:
+            result = {"ok": False, "error": "Stopped", "cancelled": True}
         else:
-            layout.addWidget(bubble)
-            layout.addStretch()
+            try:
+                result = token.result()
+            except Exception as e:
+                result = {"ok": False, "error": str(e)}
+        self.signals.macro_finished.emit(macro_id, result)
+    
+    def on_macro_finished(self, macro_id, result):
+        """Report a macro run in the chat, so the next prompt can refer to it."""
+        if macro_id != self.macro_id:
+            return
+        self.macro_run = None
+        if result.get("cancelled"):
+            self.show_macro_state("The macro was stopped.", run=True)
+            return
+        self.add_macro_report(describe_result(result))
+        if result["ok"] and macro_runner.verified(self.macro):
+            self.show_macro_state("The macro ran on a copy of the document.", apply=True)
+        elif result["ok"]:
+            self.show_macro_state("The document changed while the macro ran.", run=True)
+        else:
+            self.show_macro_state("The macro failed.", run=True)
+    
+    def apply_macro_to_model(self):
+        """Run the checked macro in the open document as one undoable step."""
+        # The check only holds for the document it ran on a copy of
+        if not macro_runner.verified(self.macro):
+            self.show_macro_state("The document changed since the macro was checked.", run=True)
+            return
+        self.show_macro_state("Applying the macro\u2026")
+        QtGui.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        # Paint the status before the GUI thread is taken
+        QtGui.QApplication.processEvents(QtCore.QEventLoop.ExcludeUserInputEvents)
+        try:
+            error = apply_macro(self.macro, settings.get("macros", "timeout"))
+        finally:
+            QtGui.QApplication.restoreOverrideCursor()
+        if error is None:
+            self.show_macro_state("The macro was applied to the model; Undo reverts it.")
+        else:
+            self.add_macro_report(describe_result({"ok": False, "error": error}))
+            self.macro_label.hide()
+    
+    def add_macro_report(self, text):
+        """Add a macro report on the user's side, since it describes their model."""
+        self.add_bubble(text, is_user=True)
+        self.record_message(text, is_user=True, source="macro")
+    
+    def on_column_delta(self, request_id, column, delta):
+        """Append a streamed delta to one side-by-side bubble."""
+        seq = self.group_rows.get(request_id)
+        if seq is not None:
+            self.message_model.update_column(seq, column, delta=delta)
+    
+    def on_column_finished(self, request_id, column, text, failed):
+        """Finalize one side-by-side bubble and record its answer."""
+        seq = self.group_rows.get(request_id)
+        if seq is None:
+            return
+        self.message_model.update_column(seq, column, text=text, pending=False)
+        if not failed and text:
+            # The first answer continues the conversation; the rest are kept
+            # as alternates that are shown but not sent back as context
+            targets = settings.get("fanout", "targets")
+            self.record_message(
+                text,
+                is_user=False,
+                source=self.target_label(targets[column]) if column < len(targets) else None,
+                alternate=request_id in self.answered
+            )
+            self.answered.add(request_id)
+        if not self.message_model.pending_columns(seq):
+            self.group_rows.pop(request_id, None)
+            self.answered.discard(request_id)
+    
+    def on_group_finished(self, request_id):
+        """Finish a fan-out request once every target has answered or stopped."""
+        self.requests.pop(request_id, None)
+        self.pending.pop(request_id, None)
+        self._finish_group(request_id)
+        self.update_pending_state()
+    
+    def _finish_group(self, request_id):
+        """Stop waiting for any remaining side-by-side bubbles."""
+        seq = self.group_rows.pop(request_id, None)
+        self.answered.discard(request_id)
+        if seq is not None:
+            self.message_model.finish_columns(seq)
+    
+    def on_response_cancelled(self, request_id):
+        """Keep whatever was streamed before a request was stopped."""
+        self._clear_suggestion(request_id)
+        self.requests.pop(request_id, None)
+        replacement = self.replacements.pop(request_id, None)
+        if replacement is not None:
+            # Stopped in favour of an earlier answer
+            seq = self.pending.pop(request_id, None)
+            if seq is not None:
+                self.message_model.set_pending(seq, False)
+                self.message_model.set_text(seq, replacement)
+            self.record_message(replacement, is_user=False, source="earlier answer")
+            self.update_pending_state()
+            return
+        if request_id in self.group_rows:
+            self.pending.pop(request_id, None)
+            self._finish_group(request_id)
+            self.update_pending_state()
+            return
+        seq = self.pending.pop(request_id, None)
+        if seq is not None:
+            text = self.message_model.text(seq)
+            if text:
+                self.message_model.set_pending(seq, False)
+                self.record_message(text, is_user=False)
+            else:
+                self.message_model.remove(seq)
+        self.update_pending_state()
+    
+    def on_response_failed(self, request_id, error):
+        """Remove a pending bubble and report the failure."""
+        self._clear_suggestion(request_id)
+        self.requests.pop(request_id, None)
+        self.group_rows.pop(request_id, None)
+        self.answered.discard(request_id)
+        seq = self.pending.pop(request_id, None)
+        if seq is not None:
+            self.message_model.remove(seq)
+        self.update_pending_state()
+        QtGui.QMessageBox.critical(
+            self,
+            "Error",
+            f"Failed to get AI response: {error}"
+        )
+    
+    def update_pending_state(self):
+        """Update the in-flight request indicator."""
+        count = len(self.pending)
+        if count:
+            self.pending_label.setText(
+                f"Waiting for {count} response{'s' if count > 1 else ''}\u2026"
+            )
+        self.pending_label.setVisible(bool(count))
+        self.stop_button.setEnabled(bool(count))
+        self.pending_changed.emit(count)
+    
+    def load_history(self):
+        """Load the most recent messages of the conversation history."""
+        try:
+            messages = self.conversation.load_recent(settings.get("history", "max_messages"))
+        except Exception as e:
+            print(f"Failed to load chat history: {str(e)}")
+            return
+        
+        # Recreate message bubbles
+        self.message_model.append_messages([
+            (msg["content"], msg["role"] == "user")
+            for msg in messages
+        ])
+    
+    def load_older_history(self):
+        """Load the previous page of history when scrolled to the top."""
+        if not self.conversation.has_older:
+            return
+        
+        try:
+            messages = self.conversation.load_older(settings.get("history", "page_size"))
+        except Exception as e:
+            print(f"Failed to load chat history: {str(e)}")
+            return
+        
+        self.message_view.prepend_messages([
+            (msg["content"], msg["role"] == "user")
+            for msg in messages
+        ])
 
 class ChatWidget(QtGui.QDialog):
-    """Main chat widget for the FreeCAD AI Chat addon."""
+    """Main chat widget for the FreeCAD AI Chat addon.
+    
+    Each conversation is a tab; requests from all tabs share the service
+    manager's per-backend schedulers.
+    """
     
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("AI Design Assistant")
-        self.conversation = []
+        self.conversations = ConversationManager.from_settings()
         self.init_ui()
-        self.load_history()
-        
+        self.load_conversations()
+        # Start the service loop and backend warm-up while the user types
+        get_service_manager()
+    
     def init_ui(self):
         """Initialize the chat widget UI."""
         # Set window properties
@@ -72,6 +558,11 @@ class ChatWidget(QtGui.QDialog):
         toolbar = QtGui.QToolBar()
         layout.addWidget(toolbar)
         
+        # Add new conversation button
+        new_action = QtGui.QAction(QtGui.QIcon(), "New Chat", self)
+        new_action.triggered.connect(self.new_conversation)
+        toolbar.addAction(new_action)
+        
         # Add settings button
         settings_action = QtGui.QAction(QtGui.QIcon(), "Settings", self)
         settings_action.triggered.connect(self.show_settings)
@@ -82,35 +573,44 @@ class ChatWidget(QtGui.QDialog):
         export_action.triggered.connect(self.export_chat)
         toolbar.addAction(export_action)
         
-        # Create scroll area for messages
-        scroll = QtGui.QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
-        layout.addWidget(scroll)
+        # Add compare toggle to ask all fan-out targets at once
+        self.compare_action = QtGui.QAction(QtGui.QIcon(), "Compare Models", self)
+        self.compare_action.setCheckable(True)
+        toolbar.addAction(self.compare_action)
         
-        # Create widget for messages
-        self.message_widget = QtGui.QWidget()
-        self.message_layout = QtGui.QVBoxLayout()
-        self.message_widget.setLayout(self.message_layout)
-        scroll.setWidget(self.message_widget)
+        # Add toggle for the request timing panel
+        stats_action = QtGui.QAction(QtGui.QIcon(), "Stats", self)
+        stats_action.setCheckable(True)
+        toolbar.addAction(stats_action)
         
-        # Add stretch to push messages up
-        self.message_layout.addStretch()
+        # Add toggle for searching all conversations
+        search_action = QtGui.QAction(QtGui.QIcon(), "Search", self)
+        search_action.setCheckable(True)
+        search_action.setEnabled(self.conversations.search_index is not None)
+        toolbar.addAction(search_action)
         
-        # Create input area
-        input_layout = QtGui.QHBoxLayout()
-        layout.addLayout(input_layout)
+        # Create history search panel, hidden until toggled
+        self.search_panel = SearchPanel(self.conversations)
+        self.search_panel.hide()
+        self.search_panel.conversation_selected.connect(self.show_conversation)
+        search_action.toggled.connect(self.search_panel.setVisible)
+        layout.addWidget(self.search_panel)
         
-        # Create message input
-        self.message_input = QtGui.QTextEdit()
-        self.message_input.setMaximumHeight(100)
-        self.message_input.textChanged.connect(self.adjust_input_height)
-        input_layout.addWidget(self.message_input)
+        # Create one tab per conversation; double-click a tab to rename it
+        self.tabs = QtGui.QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.tabCloseRequested.connect(self.delete_conversation)
+        self.tabs.tabBarDoubleClicked.connect(self.rename_conversation)
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        self.tabs.tabBar().tabMoved.connect(self.on_tab_moved)
+        layout.addWidget(self.tabs)
         
-        # Create send button
-        send_button = QtGui.QPushButton("Send")
-        send_button.clicked.connect(self.send_message)
-        input_layout.addWidget(send_button)
+        # Create rolling latency panel, hidden until toggled
+        self.stats_panel = StatsPanel()
+        self.stats_panel.hide()
+        stats_action.toggled.connect(self.stats_panel.setVisible)
+        layout.addWidget(self.stats_panel)
         
         # Set background color
         bg_color = settings.get("ui", "chat_colors")["background"]
@@ -124,66 +624,111 @@ class ChatWidget(QtGui.QDialog):
         self.newline_shortcut = QtGui.QShortcut(QtGui.QKeySequence("Shift+Return"), self)
         self.newline_shortcut.activated.connect(self.insert_newline)
     
-    def adjust_input_height(self):
-        """Adjust the height of the input field based on content."""
-        document_height = self.message_input.document().size().height()
-        self.message_input.setMinimumHeight(min(document_height + 10, 100))
+    def load_conversations(self):
+        """Open a tab for every stored conversation."""
+        active = self.conversations.active
+        for entry in self.conversations.list():
+            self.add_tab(self.conversations.get(entry["id"]))
+        for index in range(self.tabs.count()):
+            if self.tabs.widget(index).conversation.id == active:
+                self.tabs.setCurrentIndex(index)
     
-    def insert_newline(self):
-        """Insert a new line in the input field."""
-        cursor = self.message_input.textCursor()
-        cursor.insertText("\\n")
+    def add_tab(self, conversation):
+        """Add a tab showing ``conversation`` and return its view."""
+        view = ConversationView(conversation, self.compare_action)
+        view.pending_changed.connect(partial(self.on_pending_changed, view))
+        self.tabs.addTab(view, conversation.title)
+        return view
     
-    def add_message(self, text, is_user=True):
-        """Add a message bubble to the chat."""
-        bubble = ChatBubble(text, is_user)
-        self.message_layout.insertWidget(self.message_layout.count() - 1, bubble)
-        
-        # Save message to conversation history
-        self.conversation.append({
-            "role": "user" if is_user else "assistant",
-            "content": text,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Auto-save if enabled
-        if settings.get("history", "auto_save"):
-            self.save_history()
-    
-    async def get_ai_response(self, message):
-        """Get response from the AI service."""
-        try:
-            response = await service_manager.generate_response(
-                message,
-                context=self.conversation[-10:]  # Send last 10 messages as context
-            )
-            return response.text
-        except Exception as e:
-            QtGui.QMessageBox.critical(
-                self,
-                "Error",
-                f"Failed to get AI response: {str(e)}"
-            )
-            return None
+    def current_view(self):
+        """Return the view of the selected tab."""
+        return self.tabs.currentWidget()
+    
+    def views(self):
+        """Return the views of all tabs."""
+        return [self.tabs.widget(index) for index in range(self.tabs.count())]
     
     def send_message(self):
-        """Send the current message."""
-        message = self.message_input.toPlainText().strip()
-        if not message:
+        """Send the current tab's message."""
+        if self.search_panel.isAncestorOf(QtGui.QApplication.focusWidget()):
+            # Return in the search field searches right away instead
+            self.search_panel.search()
             return
-        
-        # Clear input
-        self.message_input.clear()
-        
-        # Add user message
-        self.add_message(message, is_user=True)
-        
-        # Get AI response
-        loop = asyncio.get_event_loop()
-        response = loop.run_until_complete(self.get_ai_response(message))
-        
-        if response:
-            self.add_message(response, is_user=False)
+        view = self.current_view()
+        if view is not None:
+            view.send_message()
+    
+    def insert_newline(self):
+        """Insert a new line in the current tab's input field."""
+        view = self.current_view()
+        if view is not None:
+            view.insert_newline()
+    
+    def new_conversation(self):
+        """Start a new conversation in a new tab."""
+        view = self.add_tab(self.conversations.create())
+        self.tabs.setCurrentWidget(view)
+        view.message_input.setFocus()
+    
+    def rename_conversation(self, index):
+        """Ask for a new title for the conversation in tab ``index``."""
+        view = self.tabs.widget(index)
+        if view is None:
+            return
+        title, ok = QtGui.QInputDialog.getText(
+            self,
+            "Rename Chat",
+            "Title:",
+            text=view.conversation.title
+        )
+        title = title.strip()
+        if ok and title:
+            self.conversations.rename(view.conversation.id, title)
+            self.on_pending_changed(view, len(view.pending))
+    
+    def delete_conversation(self, index):
+        """Delete the conversation in tab ``index`` after confirmation."""
+        view = self.tabs.widget(index)
+        reply = QtGui.QMessageBox.question(
+            self,
+            "Delete Chat",
+            f"Delete \"{view.conversation.title}\" and its history?",
+            QtGui.QMessageBox.Yes | QtGui.QMessageBox.No
+        )
+        if reply != QtGui.QMessageBox.Yes:
+            return
+        view.detach()
+        self.tabs.removeTab(index)
+        self.conversations.delete(view.conversation.id)
+        view.deleteLater()
+        if not self.tabs.count():
+            self.new_conversation()
+    
+    def on_tab_changed(self, index):
+        """Remember the selected conversation."""
+        view = self.tabs.widget(index)
+        if view is not None:
+            self.conversations.set_active(view.conversation.id)
+            self.search_panel.set_current_conversation(view.conversation.id)
+    
+    def show_conversation(self, conversation_id):
+        """Switch to the tab of a conversation."""
+        for view in self.views():
+            if view.conversation.id == conversation_id:
+                self.tabs.setCurrentWidget(view)
+                return
+    
+    def on_tab_moved(self, from_index, to_index):
+        """Keep the stored conversation order in step with the tabs."""
+        self.conversations.reorder([view.conversation.id for view in self.views()])
+    
+    def on_pending_changed(self, view, count):
+        """Show the number of in-flight responses in a conversation's tab."""
+        index = self.tabs.indexOf(view)
+        if index < 0:
+            return
+        title = view.conversation.title
+        self.tabs.setTabText(index, f"{title} ({count})" if count else title)
     
     def show_settings(self):
         """Show the settings dialog."""
@@ -198,13 +743,15 @@ class ChatWidget(QtGui.QDialog):
         self.setStyleSheet(f"background-color: {colors['background']};")
         
         # Refresh all chat bubbles
-        for i in range(self.message_layout.count() - 1):  # -1 to skip the stretch
-            widget = self.message_layout.itemAt(i).widget()
-            if isinstance(widget, ChatBubble):
-                widget.refresh_style()
+        for view in self.views():
+            view.message_view.refresh_style()
     
     def export_chat(self):
-        """Export the conversation history."""
+        """Export the current conversation's history."""
+        view = self.current_view()
+        if view is None:
+            return
+        
         file_path, _ = QtGui.QFileDialog.getSaveFileName(
             self,
             "Export Chat History",
@@ -216,12 +763,14 @@ class ChatWidget(QtGui.QDialog):
             return
         
         try:
+            # Only the tail of the history is loaded, so export from the store
+            conversation = view.conversation.export()
             if file_path.endswith('.json'):
                 with open(file_path, 'w') as f:
-                    json.dump(self.conversation, f, indent=2)
+                    json.dump(conversation, f, indent=2)
             else:
                 with open(file_path, 'w') as f:
-                    for msg in self.conversation:
+                    for msg in conversation:
                         f.write(f"{msg['role'].title()}: {msg['content']}\n\n")
                         
             QtGui.QMessageBox.information(
@@ -236,43 +785,10 @@ class ChatWidget(QtGui.QDialog):
                 f"Failed to export chat history: {str(e)}"
             )
     
-    def save_history(self):
-        """Save conversation history."""
-        history_dir = os.path.join(os.path.dirname(settings.addon_path), "chat_history")
-        os.makedirs(history_dir, exist_ok=True)
-        
-        history_file = os.path.join(history_dir, "chat_history.json")
-        try:
-            with open(history_file, 'w') as f:
-                json.dump(self.conversation, f, indent=2)
-        except Exception as e:
-            print(f"Failed to save chat history: {str(e)}")
-    
-    def load_history(self):
-        """Load conversation history."""
-        history_file = os.path.join(
-            os.path.dirname(settings.addon_path),
-            "chat_history",
-            "chat_history.json"
-        )
-        
-        if not os.path.exists(history_file):
-            return
-        
-        try:
-            with open(history_file, 'r') as f:
-                self.conversation = json.load(f)
-                
-            # Recreate message bubbles
-            for msg in self.conversation:
-                self.add_message(
-                    msg["content"],
-                    is_user=(msg["role"] == "user")
-                )
-        except Exception as e:
-            print(f"Failed to load chat history: {str(e)}")
-    
     def closeEvent(self, event):
-        """Handle widget close event."""
-        self.save_history()
+        """Save the conversations; the window is only hidden and may be reopened.
+        
+        Responses still in flight keep streaming into their tabs.
+        """
+        self.conversations.flush()
         event.accept()
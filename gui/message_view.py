@@ -0,0 +1,441 @@
+from bisect import bisect_left
+from PySide import QtGui, QtCore
+from utils.settings import settings
+
+# Custom item data roles
+IsUserRole = QtCore.Qt.UserRole + 1
+PendingRole = QtCore.Qt.UserRole + 2
+SeqRole = QtCore.Qt.UserRole + 3
+ColumnsRole = QtCore.Qt.UserRole + 4
+
+class MessageListModel(QtCore.QAbstractListModel):
+    """List model holding the chat messages shown in the view.
+
+    Every message gets a sequence number that stays valid while rows are
+    inserted or removed, so in-flight responses can be addressed by seq.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._items = []
+        self._seqs = []
+        self._next_seq = 0
+        self._first_seq = 0
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """Return the number of messages."""
+        if parent.isValid():
+            return 0
+        return len(self._items)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """Return message data for the given role."""
+        if not index.isValid() or index.row() >= len(self._items):
+            return None
+
+        item = self._items[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            if item.get("columns"):
+                return "\n\n".join(
+                    f"[{column['label']}]\n{column['text']}" for column in item["columns"]
+                )
+            return item["text"]
+        if role == IsUserRole:
+            return item["is_user"]
+        if role == PendingRole:
+            return item["pending"]
+        if role == SeqRole:
+            return item["seq"]
+        if role == ColumnsRole:
+            return item.get("columns")
+        return None
+
+    def row_for_seq(self, seq):
+        """Return the row of the message with sequence number ``seq``, or -1."""
+        row = bisect_left(self._seqs, seq)
+        if row < len(self._seqs) and self._seqs[row] == seq:
+            return row
+        return -1
+
+    def text(self, seq):
+        """Return the text of a message."""
+        row = self.row_for_seq(seq)
+        return self._items[row]["text"] if row >= 0 else ""
+
+    def append_message(self, text, is_user=True, pending=False):
+        """Append a message and return its sequence number."""
+        seq = self._next_seq
+        self._next_seq += 1
+        row = len(self._items)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self._items.append({
+            "seq": seq,
+            "text": text,
+            "is_user": is_user,
+            "pending": pending
+        })
+        self._seqs.append(seq)
+        self.endInsertRows()
+        return seq
+
+    def append_messages(self, messages):
+        """Append many ``(text, is_user)`` messages with a single insert."""
+        if not messages:
+            return
+        row = len(self._items)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row + len(messages) - 1)
+        for text, is_user in messages:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._items.append({
+                "seq": seq,
+                "text": text,
+                "is_user": is_user,
+                "pending": False
+            })
+            self._seqs.append(seq)
+        self.endInsertRows()
+
+    def append_group(self, labels):
+        """Append a row of side-by-side pending responses and return its seq."""
+        seq = self.append_message("", is_user=False, pending=True)
+        self._items[-1]["columns"] = [
+            {"label": label, "text": "", "pending": True}
+            for label in labels
+        ]
+        return seq
+
+    def update_column(self, seq, column, delta=None, text=None, pending=None):
+        """Append to or replace the text of one column of a group row."""
+        row = self.row_for_seq(seq)
+        if row < 0:
+            return
+        entry = self._items[row]["columns"][column]
+        if delta is not None:
+            entry["text"] += delta
+        if text is not None:
+            entry["text"] = text
+        if pending is not None:
+            entry["pending"] = pending
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def finish_columns(self, seq):
+        """Clear the pending state of every column of a group row."""
+        row = self.row_for_seq(seq)
+        if row < 0:
+            return
+        for entry in self._items[row]["columns"]:
+            entry["pending"] = False
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def pending_columns(self, seq):
+        """Return how many columns of a group row are still waiting."""
+        row = self.row_for_seq(seq)
+        if row < 0:
+            return 0
+        return sum(1 for entry in self._items[row]["columns"] if entry["pending"])
+
+    def prepend_messages(self, messages):
+        """Insert older ``(text, is_user)`` messages above the existing ones."""
+        if not messages:
+            return
+        first_seq = self._first_seq - len(messages)
+        self.beginInsertRows(QtCore.QModelIndex(), 0, len(messages) - 1)
+        items = [
+            {
+                "seq": first_seq + offset,
+                "text": text,
+                "is_user": is_user,
+                "pending": False
+            }
+            for offset, (text, is_user) in enumerate(messages)
+        ]
+        self._items[:0] = items
+        self._seqs[:0] = [item["seq"] for item in items]
+        self._first_seq = first_seq
+        self.endInsertRows()
+
+    def _update(self, seq, **changes):
+        """Apply changes to a message and notify the view."""
+        row = self.row_for_seq(seq)
+        if row < 0:
+            return
+        self._items[row].update(changes)
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def append_delta(self, seq, delta):
+        """Append streamed text to a message."""
+        self._update(seq, text=self.text(seq) + delta)
+
+    def set_text(self, seq, text):
+        """Replace the text of a message."""
+        self._update(seq, text=text)
+
+    def set_pending(self, seq, pending):
+        """Show or clear the waiting-for-response indicator of a message."""
+        self._update(seq, pending=pending)
+
+    def remove(self, seq):
+        """Remove a message."""
+        row = self.row_for_seq(seq)
+        if row < 0:
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self._items[row]
+        del self._seqs[row]
+        self.endRemoveRows()
+
+    def clear(self):
+        """Remove all messages."""
+        self.beginResetModel()
+        self._items = []
+        self._seqs = []
+        self.endResetModel()
+
+class ChatBubbleDelegate(QtGui.QStyledItemDelegate):
+    """Paints messages as chat bubbles without creating a widget per message.
+
+    Text layout is the expensive part, so bubble sizes are cached per message
+    and only recomputed when the viewport width or the message text changes.
+    """
+
+    MARGIN = 4
+    PADDING = 8
+    RADIUS = 10
+    MAX_WIDTH_RATIO = 0.75
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self._sizes = {}
+        self._width = None
+        self.refresh_style()
+
+    def refresh_style(self):
+        """Reload bubble colors from settings."""
+        colors = settings.get("ui", "chat_colors")
+        self.user_color = QtGui.QColor(colors["user_bubble"])
+        self.ai_color = QtGui.QColor(colors["ai_bubble"])
+        self.text_color = QtGui.QColor("white")
+        self._sizes.clear()
+
+    def _display_text(self, index):
+        """Return the text to draw, with a placeholder for pending messages."""
+        text = index.data(QtCore.Qt.DisplayRole) or ""
+        if not text and index.data(PendingRole):
+            return "\u2026"
+        return text
+
+    def _measure(self, text, width, font):
+        """Return the wrapped size of ``text`` in a bubble column ``width`` wide."""
+        max_text_width = max(int(width * self.MAX_WIDTH_RATIO) - 2 * self.PADDING, 1)
+        return QtGui.QFontMetrics(font).boundingRect(
+            0, 0, max_text_width, 1 << 24,
+            QtCore.Qt.TextWordWrap,
+            text
+        ).size()
+
+    @staticmethod
+    def _column_text(column):
+        """Return the text drawn in a side-by-side column."""
+        text = column["text"] or ("\u2026" if column["pending"] else "")
+        return f"{column['label']}\n{text}"
+
+    def _text_sizes(self, index, font):
+        """Return the cached wrapped text sizes of a message (one per column)."""
+        width = self.view.viewport().width()
+        if width != self._width:
+            # Row heights only depend on width and text, so a width change
+            # is the only event that invalidates every cached entry
+            self._sizes.clear()
+            self._width = width
+
+        columns = index.data(ColumnsRole)
+        if columns:
+            texts = tuple(self._column_text(column) for column in columns)
+            # Columns share the row; measure each at the width paint() gives
+            # it (undoing the single-bubble width ratio applied in _measure)
+            column_width = ((width - self.MARGIN) / len(columns) - self.MARGIN) / self.MAX_WIDTH_RATIO
+        else:
+            texts = (self._display_text(index),)
+            column_width = width
+
+        seq = index.data(SeqRole)
+        cached = self._sizes.get(seq)
+        if cached is not None and cached[0] == texts:
+            return cached[1]
+
+        sizes = [self._measure(text, column_width, font) for text in texts]
+        self._sizes[seq] = (texts, sizes)
+        return sizes
+
+    def _text_size(self, index, font):
+        """Return the cached wrapped text size of a single message."""
+        return self._text_sizes(index, font)[0]
+
+    def sizeHint(self, option, index):
+        """Return the row size of a message bubble."""
+        text_height = max(size.height() for size in self._text_sizes(index, option.font))
+        return QtCore.QSize(
+            self.view.viewport().width(),
+            text_height + 2 * (self.PADDING + self.MARGIN)
+        )
+
+    def _paint_bubble(self, painter, option, bubble, color, text):
+        """Paint one rounded bubble with its text."""
+        if option.state & QtGui.QStyle.State_Selected:
+            color = color.lighter(125)
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(color)
+        painter.drawRoundedRect(bubble, self.RADIUS, self.RADIUS)
+
+        painter.setPen(self.text_color)
+        painter.drawText(
+            bubble.adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING),
+            QtCore.Qt.TextWordWrap,
+            text
+        )
+
+    def paint(self, painter, option, index):
+        """Paint a message bubble, or side-by-side bubbles for a group row."""
+        rect = option.rect
+        painter.save()
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setFont(option.font)
+
+        columns = index.data(ColumnsRole)
+        if columns:
+            sizes = self._text_sizes(index, option.font)
+            column_width = (rect.width() - self.MARGIN) / len(columns)
+            for number, (column, size) in enumerate(zip(columns, sizes)):
+                bubble = QtCore.QRect(
+                    int(rect.left() + self.MARGIN + number * column_width),
+                    rect.top() + self.MARGIN,
+                    min(size.width() + 2 * self.PADDING, int(column_width) - self.MARGIN),
+                    size.height() + 2 * self.PADDING
+                )
+                self._paint_bubble(painter, option, bubble, self.ai_color, self._column_text(column))
+            painter.restore()
+            return
+
+        text_size = self._text_size(index, option.font)
+        is_user = index.data(IsUserRole)
+        bubble_width = text_size.width() + 2 * self.PADDING
+        bubble_height = text_size.height() + 2 * self.PADDING
+        if is_user:
+            x = rect.right() - self.MARGIN - bubble_width
+        else:
+            x = rect.left() + self.MARGIN
+        bubble = QtCore.QRect(x, rect.top() + self.MARGIN, bubble_width, bubble_height)
+
+        color = self.user_color if is_user else self.ai_color
+        self._paint_bubble(painter, option, bubble, color, self._display_text(index))
+        painter.restore()
+
+class MessageListView(QtGui.QListView):
+    """Virtualized chat message list; only visible rows are painted.
+
+    Emits ``top_reached`` when the user scrolls to the oldest loaded message
+    so older history can be fetched lazily. While the loaded messages do not
+    fill the view there is nothing to scroll, so it is emitted again after
+    each layout until they do or no older messages are left.
+    """
+
+    top_reached = QtCore.Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.message_model = MessageListModel(self)
+        self.delegate = ChatBubbleDelegate(self)
+        self.setModel(self.message_model)
+        self.setItemDelegate(self.delegate)
+
+        self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollMode(QtGui.QAbstractItemView.ScrollPerPixel)
+        self.setResizeMode(QtGui.QListView.Adjust)
+        self.setLayoutMode(QtGui.QListView.Batched)
+        self.setBatchSize(50)
+        self.setUniformItemSizes(False)
+        self.setSelectionMode(QtGui.QAbstractItemView.SingleSelection)
+        self.setFrameShape(QtGui.QFrame.NoFrame)
+
+        # Streaming changes the height of the row being written
+        self.message_model.dataChanged.connect(self._on_data_changed)
+        self.message_model.rowsInserted.connect(self._on_rows_inserted)
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.verticalScrollBar().rangeChanged.connect(self._schedule_fill)
+
+        # Bubbles are painted, so copying replaces text selection
+        copy_action = QtGui.QAction("Copy", self)
+        copy_action.setShortcut(QtGui.QKeySequence.Copy)
+        copy_action.setShortcutContext(QtCore.Qt.WidgetShortcut)
+        copy_action.triggered.connect(self.copy_selected)
+        self.addAction(copy_action)
+        self.setContextMenuPolicy(QtCore.Qt.ActionsContextMenu)
+        self.apply_font()
+
+    def _is_at_bottom(self):
+        """Return True if the view is scrolled to the latest message."""
+        scrollbar = self.verticalScrollBar()
+        return scrollbar.value() >= scrollbar.maximum() - 4
+
+    def _on_data_changed(self, top_left, bottom_right):
+        """Re-layout a row whose text changed and keep following the stream."""
+        follow = self._is_at_bottom()
+        self.delegate.sizeHintChanged.emit(top_left)
+        if follow:
+            QtCore.QTimer.singleShot(0, self.scrollToBottom)
+
+    def _on_rows_inserted(self, parent, first, last):
+        """Scroll to new messages appended at the bottom."""
+        if last == self.message_model.rowCount() - 1:
+            QtCore.QTimer.singleShot(0, self.scrollToBottom)
+        # The range may stay at zero, which rangeChanged does not report
+        self._schedule_fill()
+
+    def _on_scrolled(self, value):
+        """Request older messages when scrolled to the top."""
+        if value == self.verticalScrollBar().minimum() and self.message_model.rowCount():
+            self.top_reached.emit()
+
+    def _schedule_fill(self, *args):
+        """Check after the layout settles whether the view needs more messages."""
+        QtCore.QTimer.singleShot(0, self._fill_viewport)
+
+    def _fill_viewport(self):
+        """Request older messages while the loaded ones fit without scrolling."""
+        if self.verticalScrollBar().maximum() == 0 and self.message_model.rowCount():
+            self.top_reached.emit()
+
+    def prepend_messages(self, messages):
+        """Insert older messages while keeping the visible ones in place."""
+        if not messages:
+            return
+        anchor = self.indexAt(QtCore.QPoint(0, 0))
+        self.message_model.prepend_messages(messages)
+        if anchor.isValid():
+            self.scrollTo(
+                self.message_model.index(anchor.row() + len(messages)),
+                QtGui.QAbstractItemView.PositionAtTop
+            )
+
+    def copy_selected(self):
+        """Copy the selected message text to the clipboard."""
+        indexes = self.selectedIndexes()
+        if indexes:
+            QtGui.QApplication.clipboard().setText(indexes[0].data(QtCore.Qt.DisplayRole))
+
+    def apply_font(self):
+        """Apply the configured message font."""
+        font = settings.get("ui", "font")
+        self.setFont(QtGui.QFont(font["family"], font["size"]))
+
+    def refresh_style(self):
+        """Reload colors and font and repaint."""
+        self.delegate.refresh_style()
+        self.apply_font()
+        self.message_model.layoutChanged.emit()
+        self.viewport().update()
@@ -0,0 +1,120 @@
+import html
+from datetime import datetime, timedelta
+from PySide import QtGui, QtCore
+
+# Markers the index puts around matched words; replaced by <b> after escaping
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+class SearchPanel(QtGui.QFrame):
+    """Search bar over the history of every conversation.
+
+    Typing searches as soon as the user pauses. Results list the
+    conversation, role and time with the matched words highlighted;
+    clicking one switches to its conversation.
+    """
+
+    conversation_selected = QtCore.Signal(str)
+
+    ROLES = (("Anyone", None), ("You", "user"), ("Assistant", "assistant"))
+    PERIODS = (
+        ("Any time", None),
+        ("Today", 1),
+        ("Past week", 7),
+        ("Past month", 31),
+        ("Past year", 365)
+    )
+
+    def __init__(self, conversations, parent=None):
+        super().__init__(parent)
+        self.conversations = conversations
+        self.current_conversation = None
+        self.setFrameShape(QtGui.QFrame.StyledPanel)
+
+        layout = QtGui.QVBoxLayout()
+        self.setLayout(layout)
+
+        filters = QtGui.QHBoxLayout()
+        layout.addLayout(filters)
+
+        self.query_input = QtGui.QLineEdit()
+        self.query_input.setPlaceholderText("Search chats")
+        filters.addWidget(self.query_input)
+
+        self.role_combo = QtGui.QComboBox()
+        for title, _ in self.ROLES:
+            self.role_combo.addItem(title)
+        filters.addWidget(self.role_combo)
+
+        self.period_combo = QtGui.QComboBox()
+        for title, _ in self.PERIODS:
+            self.period_combo.addItem(title)
+        filters.addWidget(self.period_combo)
+
+        self.current_only = QtGui.QCheckBox("This chat")
+        filters.addWidget(self.current_only)
+
+        self.results_view = QtGui.QTextBrowser()
+        self.results_view.setOpenLinks(False)
+        self.results_view.anchorClicked.connect(self.open_result)
+        layout.addWidget(self.results_view)
+
+        # Search once typing pauses rather than on every keystroke
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(200)
+        self.timer.timeout.connect(self.search)
+        self.query_input.textChanged.connect(self.timer.start)
+        self.role_combo.currentIndexChanged.connect(self.search)
+        self.period_combo.currentIndexChanged.connect(self.search)
+        self.current_only.toggled.connect(self.search)
+
+    def set_current_conversation(self, conversation_id):
+        """Set the conversation "This chat" restricts results to."""
+        self.current_conversation = conversation_id
+        if self.current_only.isChecked():
+            self.search()
+
+    def search(self):
+        """Run the query with the selected filters and show the results."""
+        query = self.query_input.text().strip()
+        if not query:
+            self.results_view.clear()
+            return
+
+        days = self.PERIODS[self.period_combo.currentIndex()][1]
+        results = self.conversations.search(
+            query,
+            role=self.ROLES[self.role_combo.currentIndex()][1],
+            since=(datetime.now() - timedelta(days=days)).isoformat() if days else None,
+            conversation=self.current_conversation if self.current_only.isChecked() else None,
+            highlight=(MATCH_START, MATCH_END)
+        )
+        if not results:
+            self.results_view.setHtml("<i>No matches</i>")
+            return
+
+        items = []
+        for result in results:
+            snippet = html.escape(result["snippet"]).replace(
+                MATCH_START, "<b>"
+            ).replace(MATCH_END, "</b>")
+            role = "You" if result["role"] == "user" else "Assistant"
+            when = (result["timestamp"] or "")[:16].replace("T", " ")
+            items.append(
+                f'<p><a href="conversation:{html.escape(result["conversation"])}">'
+                f'{html.escape(result["title"])}</a> '
+                f'<span style="color: gray;">{role}, {when}</span><br>{snippet}</p>'
+            )
+        self.results_view.setHtml("".join(items))
+
+    def open_result(self, url):
+        """Switch to the conversation of a clicked result."""
+        target = url.toString()
+        if target.startswith("conversation:"):
+            self.conversation_selected.emit(target[len("conversation:"):])
+
+    def showEvent(self, event):
+        """Focus the search field when the panel is shown."""
+        self.query_input.setFocus()
+        super().showEvent(event)
@@ -2,6 +2,7 @@ import os
 import FreeCADGui
 from PySide import QtGui, QtCore
 from utils.settings import settings
+from utils.settings_schema import SettingsError
 
 class SettingsDialog(QtGui.QDialog):
     """Settings dialog for the FreeCAD AI Chat addon."""
@@ -29,9 +30,13 @@ class SettingsDialog(QtGui.QDialog):
         backend_group = QtGui.QGroupBox("AI Backend Selection")
         backend_group_layout = QtGui.QVBoxLayout()
         self.backend_combo = QtGui.QComboBox()
-        self.backend_combo.addItems(["HuggingFace", "LM Studio"])
+        self.backend_combo.addItem("HuggingFace", "huggingface")
+        self.backend_combo.addItem("LM Studio", "lmstudio")
+        self.backend_combo.addItem("Auto (route to the healthiest)", "auto")
         self.backend_combo.currentIndexChanged.connect(self.on_backend_changed)
         backend_group_layout.addWidget(self.backend_combo)
+        self.streaming = QtGui.QCheckBox("Stream responses")
+        backend_group_layout.addWidget(self.streaming)
         backend_group.setLayout(backend_group_layout)
         backend_layout.addWidget(backend_group)
         
@@ -63,6 +68,18 @@ class SettingsDialog(QtGui.QDialog):
         self.lm_group.setLayout(lm_layout)
         backend_layout.addWidget(self.lm_group)
         
+        # Response cache settings
+        cache_group = QtGui.QGroupBox("Response Cache")
+        cache_layout = QtGui.QFormLayout()
+        self.cache_enabled = QtGui.QCheckBox()
+        self.cache_sampled = QtGui.QCheckBox()
+        self.cache_disk = QtGui.QCheckBox()
+        cache_layout.addRow("Enabled:", self.cache_enabled)
+        cache_layout.addRow("Cache sampled responses:", self.cache_sampled)
+        cache_layout.addRow("Keep on disk:", self.cache_disk)
+        cache_group.setLayout(cache_layout)
+        backend_layout.addWidget(cache_group)
+        
         # UI Settings tab
         ui_tab = QtGui.QWidget()
         ui_layout = QtGui.QVBoxLayout()
@@ -138,7 +155,9 @@ class SettingsDialog(QtGui.QDialog):
         """Load current settings into UI."""
         # Backend settings
         backend = settings.get("ai_backend", "active_backend")
-        self.backend_combo.setCurrentText(backend.title())
+        self.backend_combo.setCurrentIndex(max(self.backend_combo.findData(backend), 0))
+        self.on_backend_changed(self.backend_combo.currentIndex())
+        self.streaming.setChecked(settings.get("ai_backend", "streaming"))
         
         # HuggingFace settings
         hf_config = settings.get("ai_backend", "huggingface")
@@ -152,6 +171,12 @@ class SettingsDialog(QtGui.QDialog):
         self.lm_port.setValue(lm_config["port"])
         self.lm_model_path.setText(lm_config["model_path"])
         
+        # Cache settings
+        cache_config = settings.get("cache")
+        self.cache_enabled.setChecked(cache_config["enabled"])
+        self.cache_sampled.setChecked(cache_config["cache_sampled"])
+        self.cache_disk.setChecked(cache_config["disk"])
+        
         # UI settings
         ui_config = settings.get("ui")
         self.theme_combo.setCurrentText(ui_config["theme"].title())
@@ -171,9 +196,9 @@ class SettingsDialog(QtGui.QDialog):
         
     def on_backend_changed(self, index):
         """Handle backend selection change."""
-        backend = self.backend_combo.currentText().lower()
-        self.hf_group.setVisible(backend == "huggingface")
-        self.lm_group.setVisible(backend == "lm studio")
+        backend = self.backend_combo.itemData(index)
+        self.hf_group.setVisible(backend in ("huggingface", "auto"))
+        self.lm_group.setVisible(backend in ("lmstudio", "auto"))
         
     def pick_color(self, color_type):
         """Open color picker dialog."""
@@ -194,32 +219,41 @@ class SettingsDialog(QtGui.QDialog):
             
     def apply_settings(self):
         """Apply current settings."""
-        # Backend settings
-        backend = self.backend_combo.currentText().lower()
-        settings.set(backend, "ai_backend", "active_backend")
-        
-        # HuggingFace settings
-        settings.set(self.hf_api_key.text(), "ai_backend", "huggingface", "api_key")
-        settings.set(self.hf_model.text(), "ai_backend", "huggingface", "model")
-        settings.set(self.hf_endpoint.text(), "ai_backend", "huggingface", "endpoint")
-        
-        # LM Studio settings
-        settings.set(self.lm_host.text(), "ai_backend", "lmstudio", "host")
-        settings.set(self.lm_port.value(), "ai_backend", "lmstudio", "port")
-        settings.set(self.lm_model_path.text(), "ai_backend", "lmstudio", "model_path")
-        
-        # UI settings
-        settings.set(self.theme_combo.currentText().lower(), "ui", "theme")
-        settings.set({
-            "user_bubble": self.user_bubble_color.palette().button().color().name(),
-            "ai_bubble": self.ai_bubble_color.palette().button().color().name(),
-            "background": self.bg_color.palette().button().color().name()
-        }, "ui", "chat_colors")
-        settings.set(self.font_size.value(), "ui", "font", "size")
-        
-        # History settings
-        settings.set(self.max_messages.value(), "history", "max_messages")
-        settings.set(self.auto_save.isChecked(), "history", "auto_save")
+        # Written to disk once, when the batch ends; an invalid value
+        # rolls back the whole batch
+        with settings.batch():
+            # Backend settings
+            backend = self.backend_combo.itemData(self.backend_combo.currentIndex())
+            settings.set(backend, "ai_backend", "active_backend")
+            settings.set(self.streaming.isChecked(), "ai_backend", "streaming")
+            
+            # HuggingFace settings
+            settings.set(self.hf_api_key.text(), "ai_backend", "huggingface", "api_key")
+            settings.set(self.hf_model.text(), "ai_backend", "huggingface", "model")
+            settings.set(self.hf_endpoint.text(), "ai_backend", "huggingface", "endpoint")
+            
+            # LM Studio settings
+            settings.set(self.lm_host.text(), "ai_backend", "lmstudio", "host")
+            settings.set(self.lm_port.value(), "ai_backend", "lmstudio", "port")
+            settings.set(self.lm_model_path.text(), "ai_backend", "lmstudio", "model_path")
+            
+            # Cache settings
+            settings.set(self.cache_enabled.isChecked(), "cache", "enabled")
+            settings.set(self.cache_sampled.isChecked(), "cache", "cache_sampled")
+            settings.set(self.cache_disk.isChecked(), "cache", "disk")
+            
+            # UI settings
+            settings.set(self.theme_combo.currentText().lower(), "ui", "theme")
+            settings.set({
+                "user_bubble": self.user_bubble_color.palette().button().color().name(),
+                "ai_bubble": self.ai_bubble_color.palette().button().color().name(),
+                "background": self.bg_color.palette().button().color().name()
+            }, "ui", "chat_colors")
+            settings.set(self.font_size.value(), "ui", "font", "size")
+            
+            # History settings
+            settings.set(self.max_messages.value(), "history", "max_messages")
+            settings.set(self.auto_save.isChecked(), "history", "auto_save")
         
     def reset_settings(self):
         """Reset settings to default."""
@@ -228,5 +262,9 @@ class SettingsDialog(QtGui.QDialog):
         
     def accept(self):
         """Handle dialog acceptance."""
-        self.apply_settings()
+        try:
+            self.apply_settings()
+        except SettingsError as e:
+            QtGui.QMessageBox.warning(self, "Invalid Setting", str(e))
+            return
         super().accept()
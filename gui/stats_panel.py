@@ -0,0 +1,111 @@
+import json
+from PySide import QtGui, QtCore
+from core.ai_service import get_service_manager
+
+class StatsPanel(QtGui.QFrame):
+    """Rolling request timings, to tell network, model and prompt size apart.
+
+    Connect and first-byte times point at the network or server queueing,
+    first token minus first byte at the model's prompt processing, and the
+    prompt token average at our own context size.
+    """
+
+    ROWS = (
+        ("connect", "Connect"),
+        ("first_byte", "First byte"),
+        ("first_token", "First token"),
+        ("total", "Total")
+    )
+
+    def __init__(self, parent=None, window: int = 50):
+        super().__init__(parent)
+        self.window = window
+        self.setFrameShape(QtGui.QFrame.StyledPanel)
+
+        layout = QtGui.QGridLayout()
+        self.setLayout(layout)
+        layout.addWidget(QtGui.QLabel("p50"), 0, 1)
+        layout.addWidget(QtGui.QLabel("p95"), 0, 2)
+
+        self.labels = {}
+        for row, (phase, title) in enumerate(self.ROWS, 1):
+            layout.addWidget(QtGui.QLabel(title), row, 0)
+            p50 = QtGui.QLabel()
+            p95 = QtGui.QLabel()
+            layout.addWidget(p50, row, 1)
+            layout.addWidget(p95, row, 2)
+            self.labels[phase] = (p50, p95)
+
+        self.totals_label = QtGui.QLabel()
+        self.totals_label.setWordWrap(True)
+        layout.addWidget(self.totals_label, len(self.ROWS) + 1, 0, 1, 3)
+
+        export_button = QtGui.QPushButton("Export Metrics")
+        export_button.clicked.connect(self.export_metrics)
+        layout.addWidget(export_button, len(self.ROWS) + 2, 0, 1, 3)
+
+        # Only poll while the panel is shown
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(2000)
+        self.timer.timeout.connect(self.refresh)
+
+    @staticmethod
+    def format_seconds(value) -> str:
+        """Format a duration for display."""
+        if value is None:
+            return "-"
+        return f"{value * 1000:.0f} ms" if value < 1 else f"{value:.2f} s"
+
+    def refresh(self):
+        """Update the figures from the service manager's metrics buffer."""
+        summary = get_service_manager().metrics_summary(self.window)
+        for phase, (p50, p95) in self.labels.items():
+            p50.setText(self.format_seconds(summary[phase]["p50"]))
+            p95.setText(self.format_seconds(summary[phase]["p95"]))
+
+        prompt_tokens = summary["prompt_tokens"]
+        completion_tokens = summary["completion_tokens"]
+        self.totals_label.setText(
+            f"Last {summary['requests']} requests: {summary['errors']} errors, "
+            f"{summary['cache_hits']} cache hits, {summary['retries']} retries. "
+            f"Avg tokens: {prompt_tokens or 0:.0f} prompt / {completion_tokens or 0:.0f} completion. "
+            f"Avg queue wait: {self.format_seconds(summary['queued'])}."
+        )
+
+    def showEvent(self, event):
+        """Start polling when the panel becomes visible."""
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        """Stop polling when the panel is hidden."""
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def export_metrics(self):
+        """Save the buffered metrics as Prometheus text or JSONL."""
+        file_path, _ = QtGui.QFileDialog.getSaveFileName(
+            self,
+            "Export Metrics",
+            "",
+            "Prometheus Text (*.prom);;JSON Lines (*.jsonl)"
+        )
+
+        if not file_path:
+            return
+
+        try:
+            if file_path.endswith('.jsonl'):
+                with open(file_path, 'w') as f:
+                    for entry in get_service_manager().recent_metrics():
+                        f.write(json.dumps(entry) + "\n")
+            else:
+                with open(file_path, 'w') as f:
+                    f.write(get_service_manager().metrics_prometheus())
+        except Exception as e:
+            QtGui.QMessageBox.critical(
+                self,
+                "Error",
+                f"Failed to export metrics: {str(e)}"
+            )
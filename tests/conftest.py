@@ -0,0 +1,39 @@
+import os
+import sys
+import copy
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Importing the settings writes config/user_settings.json if it is missing
+USER_SETTINGS = os.path.join(ROOT, "config", "user_settings.json")
+HAD_USER_SETTINGS = os.path.exists(USER_SETTINGS)
+
+from utils.settings import settings
+
+@pytest.fixture(autouse=True)
+def isolated_settings(tmp_path):
+    """Keep settings changes made by a test out of the user settings file."""
+    saved = copy.deepcopy(settings.settings)
+    user_settings_path = settings.user_settings_path
+    settings.user_settings_path = str(tmp_path / "user_settings.json")
+    yield settings
+    settings.flush()
+    settings.settings = saved
+    settings.user_settings_path = user_settings_path
+
+def pytest_sessionfinish(session, exitstatus):
+    if not HAD_USER_SETTINGS and os.path.exists(USER_SETTINGS):
+        os.remove(USER_SETTINGS)
+
+@pytest.fixture
+def manager():
+    """A service manager whose active service is a ``FakeService``."""
+    from core.ai_service import AIServiceManager
+    from fakes import FakeService
+    service_manager = AIServiceManager()
+    # Runs after the warm-up already queued on the loop
+    service_manager.run_sync(setattr, service_manager, "_service", FakeService())
+    yield service_manager
+    service_manager.shutdown()
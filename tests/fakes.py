@@ -0,0 +1,101 @@
+"""Stand-ins for backends and HTTP responses shared by the tests."""
+
+import asyncio
+from typing import Dict, List
+from core.ai_service import AIResponse, AIService
+
+class FakeService(AIService):
+    """Answers from a script: a text, or an exception to raise, per call."""
+
+    def __init__(self, name: str = "fake", replies: List = None, delay: float = 0.0,
+                 model: str = "fake-model"):
+        self.name = name
+        self.model = model
+        self.parameters = {}
+        self.replies = list(replies or [])
+        self.delay = delay
+        self.calls = 0
+        self.available = True
+
+    def initialize(self) -> bool:
+        return True
+
+    def is_available(self) -> bool:
+        return self.available
+
+    def _next_reply(self):
+        self.calls += 1
+        reply = self.replies.pop(0) if self.replies else f"{self.name} answer"
+        if isinstance(reply, BaseException):
+            raise reply
+        return reply
+
+    async def generate_response(self, message: str, context: List[Dict] = None) -> AIResponse:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return AIResponse(self._next_reply(), {"model": self.model, "backend": self.name})
+
+    async def stream_response(self, message: str, context: List[Dict] = None):
+        text = self._next_reply()
+        for word in text.split(" "):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word + " "
+
+class FakeContent:
+    """The ``content`` stream of an aiohttp response, yielding given lines."""
+
+    def __init__(self, lines: List[bytes]):
+        self.lines = lines
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for line in self.lines:
+            yield line
+
+class FakeResponse:
+    """Enough of an aiohttp response for the SSE parser and error mapping."""
+
+    def __init__(self, lines: List[bytes] = (), status: int = 200, text: str = "",
+                 headers: Dict = None, body=None):
+        self.content = FakeContent(list(lines))
+        self.status = status
+        self.headers = headers or {}
+        self._text = text
+        self._body = body
+        self.closed = False
+
+    async def text(self):
+        return self._text
+
+    async def json(self, content_type=None):
+        if self._body is None:
+            raise ValueError("no JSON body")
+        return self._body
+
+    def close(self):
+        self.closed = True
+
+class FakeSession:
+    """An aiohttp session whose POSTs return queued ``FakeResponse`` objects."""
+
+    def __init__(self, responses: List[FakeResponse] = ()):
+        self.responses = list(responses)
+        self.requests = []
+        self.closed = False
+
+    def post(self, url, json=None, timeout=None, headers=None):
+        self.requests.append({"url": url, "json": json})
+        return _Posted(self.responses.pop(0))
+
+class _Posted:
+    def __init__(self, response):
+        self.response = response
+
+    async def __aenter__(self):
+        return self.response
+
+    async def __aexit__(self, *exc_info):
+        return False
@@ -0,0 +1,37 @@
+import threading
+from core.ai_service import get_service_manager
+from fakes import FakeService
+
+def test_submit_runs_on_the_loop_thread(manager):
+    async def thread_name():
+        return threading.current_thread().name
+
+    assert manager.submit(thread_name()).result(timeout=5) == "AIServiceLoop"
+
+def test_run_sync_returns_the_result(manager):
+    assert manager.run_sync(lambda a, b: a + b, 2, 3) == 5
+
+def test_request_resolves_to_the_response(manager):
+    manager.run_sync(setattr, manager, "_service", FakeService(replies=["hello there"]))
+    token = manager.request("hi")
+    response = token.result(timeout=5)
+    assert response.text == "hello there"
+    assert response.metadata["backend"] == "fake"
+    assert token.done() and not token.cancelled
+
+def test_streamed_request_reports_deltas(manager):
+    manager.run_sync(setattr, manager, "_service", FakeService(replies=["one two three"]))
+    deltas = []
+    response = manager.request("hi", stream=True, on_delta=deltas.append).result(timeout=5)
+    assert "".join(deltas) == response.text == "one two three "
+
+def test_shutdown_stops_the_loop(manager):
+    thread = manager._loop_thread
+    manager.shutdown()
+    assert not thread.is_alive()
+
+def test_service_manager_is_created_lazily():
+    import core.ai_service as ai_service
+    assert get_service_manager() is get_service_manager()
+    ai_service._service_manager.shutdown()
+    ai_service._service_manager = None
@@ -0,0 +1,86 @@
+import json
+import asyncio
+from core.ai_service import AIResponse
+from core.batch import completed_ids, dedupe_results, load_prompts, run_batch
+
+class ScriptedManager:
+    """Answers prompts, failing the ones listed in ``failing``."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.prompts = []
+
+    async def generate_response(self, prompt, context, service=None):
+        self.prompts.append(prompt)
+        if prompt in self.failing:
+            raise RuntimeError("backend down")
+        return AIResponse(f"answer to {prompt}", {
+            "backend": "fake",
+            "model": "m",
+            "metrics": {"prompt_tokens": 11, "completion_tokens": 5}
+        })
+
+def read(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def resume(manager, prompts, path):
+    done = completed_ids(path)
+    remaining = [record for record in prompts if str(record["id"]) not in done]
+    return asyncio.run(run_batch(manager, remaining, path))
+
+def test_load_prompts_assigns_line_numbers(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    path.write_text('{"prompt": "a"}\n\n"b"\n{"id": "x", "prompt": "c"}\n')
+    assert load_prompts(str(path)) == [
+        {"prompt": "a", "id": 1}, {"prompt": "b", "id": 3}, {"id": "x", "prompt": "c"}
+    ]
+
+def test_results_carry_metric_token_counts(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    summary = asyncio.run(run_batch(ScriptedManager(), [{"id": 1, "prompt": "a"}], path))
+    assert summary["prompts"] == 1 and summary["errors"] == 0
+    result, = read(path)
+    assert result["response"] == "answer to a"
+    assert (result["prompt_tokens"], result["completion_tokens"]) == (11, 5)
+
+def test_resume_retries_errors_without_duplicating_ids(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    prompts = [{"id": 1, "prompt": "a"}, {"id": 2, "prompt": "b"}, {"id": 3, "prompt": "c"}]
+    first = resume(ScriptedManager(failing={"b"}), prompts, path)
+    assert first["errors"] == 1
+
+    manager = ScriptedManager()
+    resume(manager, prompts, path)
+    assert manager.prompts == ["b"]
+    results = read(path)
+    assert [result["id"] for result in results] == [1, 2, 3]
+    assert all(result["error"] is None for result in results)
+
+def test_resume_skips_finished_prompts(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    prompts = [{"id": 1, "prompt": "a"}]
+    resume(ScriptedManager(), prompts, path)
+    manager = ScriptedManager()
+    assert resume(manager, prompts, path)["prompts"] == 0
+    assert manager.prompts == []
+
+def test_completed_ids_ignores_torn_lines(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text('{"id": 1, "error": null}\n{"id": 2, "error": "x"}\n{"id": 3, "err')
+    assert completed_ids(str(path)) == {"1"}
+    assert completed_ids(str(path), retry_errors=False) == {"1", "2"}
+
+def test_dedupe_keeps_successes(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text(
+        '{"id": 1, "error": null, "response": "ok"}\n'
+        '{"id": 1, "error": "late failure"}\n'
+        '{"id": 2, "error": "x"}\n'
+        '{"id": 2, "error": null, "response": "retried"}\n'
+    )
+    dedupe_results(str(path))
+    assert read(str(path)) == [
+        {"id": 1, "error": None, "response": "ok"},
+        {"id": 2, "error": None, "response": "retried"}
+    ]
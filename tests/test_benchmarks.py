@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from benchmarks.bench_backends import compare, make_backend, run_requests
+from benchmarks.mock_server import MockServer
+from core.session_pool import session_pool
+
+def against_mock_server(backend, mode, requests=3, concurrency=2):
+    async def run():
+        server = MockServer(latency=0.0, token_rate=0, tokens=4)
+        base_url = await server.start()
+        try:
+            service = make_backend(backend, base_url)
+            results = await run_requests(service, mode, [], requests, concurrency)
+            if mode == "stream":
+                text = "".join([delta async for delta in service.stream_response("hi")])
+            else:
+                text = (await service.generate_response("hi")).text
+            return server.requests, results, text
+        finally:
+            await session_pool.close()
+            await server.stop()
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("backend", ["lmstudio", "huggingface"])
+@pytest.mark.parametrize("mode", ["generate", "stream"])
+def test_backends_talk_to_the_mock_server(backend, mode):
+    requests, results, text = against_mock_server(backend, mode)
+    assert requests == 4
+    assert all("error" not in result for result in results)
+    assert all(result["ttft"] <= result["latency"] for result in results)
+    assert text.split() == ["tok0", "tok1", "tok2", "tok3"]
+
+def test_compare_reports_relative_changes():
+    result = {"backend": "lmstudio", "mode": "stream", "concurrency": 1, "context_tokens": 0,
+              "requests_per_sec": 110.0, "ttft_p50": 0.01, "latency_p99": 0.2,
+              "memory_per_request": None}
+    baseline = {"results": [dict(result, requests_per_sec=100.0)]}
+    new = dict(result, concurrency=8)
+    lines = compare({"results": [result, new]}, baseline)
+    assert lines[0] == ("lmstudio/stream/c1/ctx0: requests_per_sec +10.0%, "
+                        "ttft_p50 +0.0%, latency_p99 +0.0%")
+    assert lines[1] == "lmstudio/stream/c8/ctx0: new scenario"
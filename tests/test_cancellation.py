@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import pytest
+from core.ai_service import AIService, AIResponse
+from core.lmstudio_backend import LMStudioService
+from fakes import FakeResponse, FakeSession
+
+class SlowService(AIService):
+    """Blocks until cancelled and records that it was."""
+
+    name = "slow"
+    model = "slow-model"
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+
+    def initialize(self):
+        return True
+
+    def is_available(self):
+        return True
+
+    async def generate_response(self, message, context=None):
+        self.started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return AIResponse("too late")
+
+def test_cancel_stops_the_backend_call(manager):
+    service = SlowService()
+    manager.run_sync(setattr, manager, "_service", service)
+    token = manager.request("hi")
+    assert service.started.wait(5)
+
+    done = []
+    token.add_done_callback(done.append)
+    assert token.cancel()
+    assert service.cancelled.wait(5)
+    assert token.cancelled and token.done()
+    assert done == [token]
+
+def test_cancel_after_finishing_is_refused(manager):
+    token = manager.request("hi")
+    token.result(timeout=5)
+    assert not token.cancel()
+    assert not token.cancelled
+
+def lmstudio(responses):
+    service = LMStudioService()
+    service.host, service.port = "localhost", 1234
+    service.api_base = "http://localhost:1234/v1"
+    service.parameters = {"temperature": 0.0, "max_tokens": 10, "top_p": 1.0}
+    service.model = "local"
+    service.session = FakeSession(responses)
+    return service
+
+def test_lmstudio_reports_the_active_model():
+    service = lmstudio([FakeResponse(body={"choices": [{"message": {"content": "hi"}}]})])
+    service.use_model("qwen2.5-coder")
+    response = asyncio.run(service.generate_response("hello"))
+    assert response.text == "hi"
+    assert response.metadata == {"model": "qwen2.5-coder", "backend": "lmstudio"}
+    assert service.session.requests[0]["json"]["model"] == "qwen2.5-coder"
+
+def test_lmstudio_stream_yields_deltas():
+    service = lmstudio([FakeResponse([
+        b'data: {"choices": [{"delta": {"content": "a"}}]}\n',
+        b'data: {"choices": [{"delta": {"content": "b"}}]}\n',
+        b'data: [DONE]\n'
+    ])])
+
+    async def run():
+        return [delta async for delta in service.stream_response("hello")]
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert service.session.requests[0]["json"]["stream"] is True
+
+def test_lmstudio_rejects_failed_requests():
+    service = lmstudio([FakeResponse(status=400, text="bad request")])
+    with pytest.raises(RuntimeError, match="bad request"):
+        asyncio.run(service.generate_response("hello"))
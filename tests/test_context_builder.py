@@ -0,0 +1,56 @@
+from core.context_builder import ContextBuilder
+
+def turns(count, words=20):
+    return [
+        {"role": "user" if index % 2 == 0 else "assistant",
+         "content": f"Turn {index}. " + " ".join(["word"] * words)}
+        for index in range(count)
+    ]
+
+def test_budget_prefers_model_then_backend_then_default():
+    builder = ContextBuilder(budgets={"default": 100, "lmstudio": 200, "big-model": 300})
+    assert builder.budget_for("lmstudio", "big-model") == 300
+    assert builder.budget_for("lmstudio", "other") == 200
+    assert builder.budget_for("huggingface", None) == 100
+
+def test_token_estimate_uses_words_or_characters():
+    builder = ContextBuilder(chars_per_token=4.0)
+    assert builder.count_tokens("one two, three") == 4
+    assert builder.count_tokens("x" * 40) == 10
+
+def test_newest_turns_fill_the_budget():
+    builder = ContextBuilder()
+    history = turns(10)
+    dropped, context = builder.pack(history, "next question", budget=80)
+    assert context == [{"role": msg["role"], "content": msg["content"]} for msg in history[-len(context):]]
+    assert dropped == history[:len(history) - len(context)]
+    used = sum(builder.message_tokens(msg) for msg in context)
+    assert used + builder.count_tokens("next question") + builder.MESSAGE_OVERHEAD <= 80
+
+def test_everything_fits_a_large_budget():
+    dropped, context = ContextBuilder().pack(turns(4), "hi", budget=10000)
+    assert dropped == [] and len(context) == 4
+
+def test_summary_comes_first_and_costs_budget():
+    builder = ContextBuilder()
+    history = turns(10)
+    # Exactly three turns fit without the summary
+    budget = builder.count_tokens("hi") + builder.MESSAGE_OVERHEAD + sum(
+        builder.message_tokens(msg) for msg in history[-3:]
+    )
+    _, without = builder.pack(history, "hi", budget=budget)
+    _, with_summary = builder.pack(history, "hi", budget=budget, summary="Earlier: a cube was made.")
+    assert len(without) == 3
+    assert with_summary[0] == {"role": "system", "content": "Earlier: a cube was made."}
+    assert len(with_summary) == 3
+
+def test_summarize_overflow_adds_a_note_of_dropped_turns():
+    builder = ContextBuilder(overflow="summarize", summary_ratio=0.5)
+    history = turns(10, words=5)
+    dropped, context = builder.pack(history, "hi", budget=80)
+    assert context[0]["role"] == "system"
+    assert context[0]["content"].startswith("Earlier in the conversation:")
+    assert "- user: Turn 0." in context[0]["content"]
+    assert dropped == history[:len(history) - len(context) + 1]
+    total = sum(builder.message_tokens(msg) for msg in context)
+    assert total + builder.count_tokens("hi") + builder.MESSAGE_OVERHEAD <= 80
@@ -0,0 +1,95 @@
+import os
+import json
+import pytest
+from core.conversations import DEFAULT_CONVERSATION, ConversationManager
+
+@pytest.fixture
+def conversations(tmp_path, isolated_settings):
+    isolated_settings.set(True, "search", "enabled")
+    isolated_settings.set(False, "retrieval", "enabled")
+    isolated_settings.set(False, "summary", "enabled")
+    conversation_manager = ConversationManager(str(tmp_path))
+    yield conversation_manager
+    conversation_manager.close()
+
+def indexed(conversation_manager, conversation):
+    """Wait until the updates queued for ``conversation`` are indexed."""
+    conversation_manager.search_index.schedule_update(conversation.id, conversation.history).result()
+
+def stored_index(tmp_path):
+    with open(tmp_path / ConversationManager.INDEX_FILE, 'r') as f:
+        return json.load(f)
+
+def test_starts_with_the_default_conversation(conversations):
+    assert [entry["id"] for entry in conversations.list()] == [DEFAULT_CONVERSATION]
+    assert conversations.active == DEFAULT_CONVERSATION
+
+def test_list_changes_are_stored(tmp_path, conversations):
+    first = conversations.create("Brackets")
+    second = conversations.create()
+    conversations.rename(first.id, "Shelf brackets")
+    conversations.reorder([second.id, DEFAULT_CONVERSATION, first.id])
+    conversations.set_active(first.id)
+
+    assert first.title == "Shelf brackets"
+    index = stored_index(tmp_path)
+    assert [entry["id"] for entry in index["conversations"]] == [second.id, DEFAULT_CONVERSATION, first.id]
+    assert index["conversations"][2]["title"] == "Shelf brackets"
+    assert index["active"] == first.id
+
+    reopened = ConversationManager(str(tmp_path))
+    assert [entry["id"] for entry in reopened.list()] == [second.id, DEFAULT_CONVERSATION, first.id]
+    assert reopened.active == first.id
+    reopened.close()
+
+def test_unknown_conversation_raises(conversations):
+    with pytest.raises(KeyError):
+        conversations.get("missing")
+    with pytest.raises(KeyError):
+        conversations.rename("missing", "Title")
+
+def test_delete_removes_files_and_search_results(tmp_path, conversations):
+    conversation = conversations.create("Gears")
+    conversation.record("user", "How do I make an involute gear?")
+    indexed(conversations, conversation)
+    conversations.set_active(conversation.id)
+    assert conversations.search("involute")
+
+    history_path = conversation.history.path
+    conversations.delete(conversation.id)
+    conversations.search_index.schedule_delete(conversation.id).result()
+
+    assert not os.path.exists(history_path)
+    assert conversations.entry(conversation.id) is None
+    assert conversations.active == DEFAULT_CONVERSATION
+    assert conversations.search("involute") == []
+    assert [entry["id"] for entry in stored_index(tmp_path)["conversations"]] == [DEFAULT_CONVERSATION]
+
+def test_search_results_carry_the_title(conversations):
+    conversation = conversations.create("Fillets")
+    conversation.record("assistant", "Use Part Fillet on the selected edges.")
+    indexed(conversations, conversation)
+    results = conversations.search("fillet")
+    assert [(result["conversation"], result["title"]) for result in results] == [(conversation.id, "Fillets")]
+
+def test_flush_keeps_conversations_open(conversations):
+    conversation = conversations.get(DEFAULT_CONVERSATION)
+    conversation.record("user", "first")
+    conversations.flush()
+    conversation.record("user", "second")
+    assert conversations.get(DEFAULT_CONVERSATION) is conversation
+    assert [msg["content"] for msg in conversation.export()] == ["first", "second"]
+
+def test_close_then_reopen(conversations):
+    conversation = conversations.get(DEFAULT_CONVERSATION)
+    conversation.record("user", "Pad the sketch by ten millimetres")
+    conversations.close()
+
+    # Everything reopens on demand after close
+    reopened = conversations.get(DEFAULT_CONVERSATION)
+    assert reopened is not conversation
+    assert [msg["content"] for msg in reopened.load_recent(10)] == ["Pad the sketch by ten millimetres"]
+    reopened.record("user", "Now pocket it")
+    indexed(conversations, reopened)
+    assert [result["content"] for result in conversations.search("pocket")] == ["Now pocket it"]
+    assert len(conversations.search("sketch")) == 1
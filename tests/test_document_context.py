@@ -0,0 +1,126 @@
+import sys
+import json
+import types
+import pytest
+from core.document_context import DocumentContext
+
+class FakeDocument:
+    def __init__(self, name="Part", label="Bracket"):
+        self.Name = name
+        self.Label = label
+        self.Objects = []
+
+    def add(self, name, type_id="Part::Feature", label=None, group=None, uses=()):
+        obj = types.SimpleNamespace(
+            Name=name,
+            Label=label or name,
+            TypeId=type_id,
+            State=[],
+            Visibility=True,
+            Document=self,
+            OutList=list(uses)
+        )
+        if group is not None:
+            obj.Group = group
+        self.Objects.append(obj)
+        return obj
+
+@pytest.fixture
+def document(monkeypatch):
+    """Make a fake FreeCAD with an active document importable."""
+    doc = FakeDocument()
+    freecad = types.ModuleType("FreeCAD")
+    freecad.ActiveDocument = doc
+    freecad.observers = []
+    freecad.addDocumentObserver = freecad.observers.append
+    monkeypatch.setitem(sys.modules, "FreeCAD", freecad)
+    # No GUI, so there is no selection
+    monkeypatch.setitem(sys.modules, "FreeCADGui", None)
+    return doc
+
+def test_without_freecad_there_is_no_digest(monkeypatch):
+    monkeypatch.setitem(sys.modules, "FreeCAD", None)
+    context = DocumentContext()
+    assert context.digest() == ""
+    assert context.fingerprint() == ""
+
+def test_disabled_digest_is_empty(document, isolated_settings):
+    isolated_settings.set(False, "document_context", "enabled")
+    document.add("Box")
+    assert DocumentContext().digest() == ""
+
+def test_outline_nests_group_children(document, isolated_settings):
+    isolated_settings.set("text", "document_context", "format")
+    box = document.add("Box", label="Base plate")
+    cylinder = document.add("Cylinder", uses=[box])
+    document.add("Group", "App::DocumentObjectGroup", group=[box, cylinder])
+    lines = DocumentContext().digest().splitlines()
+    assert lines[0].startswith('Active FreeCAD document "Bracket" (3 objects')
+    assert lines[1:] == [
+        "- Group [App::DocumentObjectGroup]",
+        '  - Box "Base plate" [Part::Feature]',
+        "  - Cylinder [Part::Feature]; uses Box"
+    ]
+
+def test_digest_is_reused_until_the_document_changes(document, isolated_settings):
+    isolated_settings.set("text", "document_context", "format")
+    box = document.add("Box")
+    context = DocumentContext()
+    first = context.digest()
+    assert sys.modules["FreeCAD"].observers == [context]
+
+    box.Label = "Renamed"
+    # Without a change notification the rendered digest is returned as is
+    assert context.digest() == first
+    context.slotChangedObject(box, "Label")
+    assert '"Renamed"' in context.digest()
+
+def test_recomputed_objects_are_serialized_again(document):
+    box = document.add("Box")
+    context = DocumentContext()
+    before = context.snapshot(document)
+    box.State = ["Invalid"]
+    assert context.snapshot(document)["Box"]["error"] == "recompute failed"
+    assert "error" not in before["Box"]
+
+def test_fingerprint_follows_changes(document):
+    box = document.add("Box")
+    context = DocumentContext()
+    fingerprint = context.fingerprint()
+    assert context.fingerprint() == fingerprint
+    box.Label = "Renamed"
+    context.slotChangedObject(box, "Label")
+    assert context.fingerprint() != fingerprint
+    assert DocumentContext().fingerprint() == context.fingerprint()
+
+def test_long_outline_is_truncated(document, isolated_settings):
+    isolated_settings.set("text", "document_context", "format")
+    isolated_settings.set(200, "document_context", "max_chars")
+    for index in range(20):
+        document.add(f"Box{index:03d}")
+    text = DocumentContext().digest()
+    assert len(text) <= 200 + len("... 20 more objects")
+    assert text.splitlines()[-1].endswith("more objects")
+
+def test_json_format(document, isolated_settings):
+    isolated_settings.set("json", "document_context", "format")
+    document.add("Box", label="Base plate")
+    digest = json.loads(DocumentContext().digest())
+    assert digest["document"] == "Bracket"
+    assert digest["objects"] == [{"name": "Box", "type": "Part::Feature", "label": "Base plate"}]
+
+def test_sketch_description():
+    text = DocumentContext.describe({
+        "name": "Sketch",
+        "type": "Sketcher::SketchObject",
+        "sketch": {
+            "geometry": 4,
+            "constraints": {"Coincident": 4, "Distance": 1},
+            "dimensions": {"Width": 25.0},
+            "fully_constrained": True
+        }
+    })
+    assert text == (
+        "Sketch [Sketcher::SketchObject]; 4 geometries, 5 constraints "
+        "(Coincident 4, Distance 1); Width=25; fully constrained"
+    )
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import pytest
+from fakes import FakeService
+
+class Blocking(FakeService):
+    """Answers only after ``release`` is set; records a cancellation."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.release = None
+        self.cancelled = threading.Event()
+
+    async def generate_response(self, message, context=None):
+        self.release = asyncio.Event()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return await super().generate_response(message, context)
+
+@pytest.fixture
+def targets(manager):
+    services = {
+        "fast": FakeService("fast", replies=["fast answer"]),
+        "broken": FakeService("broken", replies=[RuntimeError("down")]),
+        "slow": Blocking("slow")
+    }
+    for name, service in services.items():
+        manager.run_sync(manager._target_services.__setitem__, (name, None), service)
+    return services
+
+def test_all_mode_returns_every_answer_in_order(manager, targets):
+    finished = []
+    results = manager.request_many(
+        "hi",
+        targets=[{"backend": "fast"}, {"backend": "broken"}],
+        on_result=lambda index, response: finished.append(index)
+    ).result(timeout=5)
+    assert results[0].text == "fast answer"
+    assert results[1].metadata["error"].endswith("down")
+    assert sorted(finished) == [0, 1]
+
+def test_streaming_targets_report_deltas_per_column(manager, targets):
+    deltas = []
+    results = manager.request_many(
+        "hi",
+        targets=[{"backend": "fast"}],
+        on_delta=lambda index, delta: deltas.append((index, delta))
+    ).result(timeout=5)
+    assert results[0].text == "fast answer "
+    assert deltas == [(0, "fast "), (0, "answer ")]
+
+def test_first_mode_returns_the_first_success(manager, targets):
+    async def run():
+        rest = []
+        results = await manager.generate_many(
+            "hi", targets=[{"backend": "slow"}, {"backend": "fast"}], mode="first", rest=rest
+        )
+        for task in rest:
+            task.cancel()
+        return results, rest
+
+    results, rest = manager.submit(run()).result(timeout=5)
+    assert results[0] is None
+    assert results[1].text == "fast answer"
+    assert len(rest) == 1
+    assert targets["slow"].cancelled.wait(5)
+
+def test_first_mode_token_can_still_stop_the_rest(manager, targets):
+    answered = threading.Event()
+    token = manager.request_many(
+        "hi",
+        targets=[{"backend": "slow"}, {"backend": "fast"}],
+        mode="first",
+        on_result=lambda index, response: answered.set()
+    )
+    assert answered.wait(5)
+    assert not token.done()
+    token.cancel()
+    assert targets["slow"].cancelled.wait(5)
+
+def test_cancel_rest_mode_cancels_the_others(manager, targets):
+    results = manager.request_many(
+        "hi", targets=[{"backend": "slow"}, {"backend": "fast"}], mode="cancel_rest"
+    ).result(timeout=5)
+    assert results[1].text == "fast answer"
+    assert targets["slow"].cancelled.wait(5)
@@ -0,0 +1,39 @@
+from core.conversations import Conversation
+from core.history_store import HistoryStore
+
+def make_conversation(tmp_path, count):
+    store = HistoryStore(str(tmp_path / "chat_history.jsonl"))
+    for index in range(count):
+        store.append({"role": "user", "content": f"message {index}", "timestamp": f"{index:05d}"})
+    return Conversation("default", "Chat", store)
+
+def contents(messages):
+    return [msg["content"] for msg in messages]
+
+def test_load_recent_reads_only_the_tail(tmp_path):
+    conversation = make_conversation(tmp_path, 120)
+    recent = conversation.load_recent(50)
+    assert contents(recent) == [f"message {index}" for index in range(70, 120)]
+    assert conversation.has_older
+
+def test_older_pages_are_prepended_until_exhausted(tmp_path):
+    conversation = make_conversation(tmp_path, 120)
+    conversation.load_recent(50)
+    assert len(conversation.load_older(50)) == 50
+    assert contents(conversation.load_older(50)) == [f"message {index}" for index in range(20)]
+    assert not conversation.has_older
+    assert conversation.load_older(50) == []
+    assert contents(conversation.messages) == [f"message {index}" for index in range(120)]
+
+def test_short_history_has_nothing_older(tmp_path):
+    conversation = make_conversation(tmp_path, 3)
+    assert len(conversation.load_recent(50)) == 3
+    assert not conversation.has_older
+
+def test_unsaved_messages_follow_the_loaded_tail(tmp_path, isolated_settings):
+    isolated_settings.set(False, "history", "auto_save")
+    conversation = make_conversation(tmp_path, 5)
+    conversation.record("user", "not saved yet")
+    conversation.load_recent(2)
+    assert contents(conversation.messages) == ["message 3", "message 4", "not saved yet"]
+    assert len(conversation.export()) == 6
@@ -0,0 +1,134 @@
+import json
+import pytest
+from core.history_store import HistoryStore
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "history" / "chat_history.jsonl")
+
+def message(index):
+    return {"role": "user", "content": f"message {index}", "timestamp": f"{index:05d}"}
+
+def test_append_and_load(log_path):
+    store = HistoryStore(log_path)
+    for index in range(3):
+        store.append(message(index))
+    store.close()
+    assert HistoryStore(log_path).load() == [message(index) for index in range(3)]
+
+def test_read_page_walks_backwards(log_path):
+    store = HistoryStore(log_path)
+    for index in range(250):
+        store.append(message(index))
+
+    page, before = store.read_page(limit=100)
+    assert [msg["content"] for msg in page] == [f"message {index}" for index in range(150, 250)]
+    page, before = store.read_page(before, limit=100)
+    assert page[0] == message(50) and page[-1] == message(149)
+    page, before = store.read_page(before, limit=100)
+    assert page == [message(index) for index in range(50)]
+    assert before == 0
+
+def test_read_page_spans_read_blocks(log_path, monkeypatch):
+    monkeypatch.setattr(HistoryStore, "READ_BLOCK", 64)
+    store = HistoryStore(log_path)
+    for index in range(40):
+        store.append(message(index))
+    page, before = store.read_page(limit=1000)
+    assert page == [message(index) for index in range(40)]
+    assert before == 0
+
+def test_read_from_picks_up_new_messages(log_path):
+    store = HistoryStore(log_path)
+    store.append(message(0))
+    messages, offset = store.read_from(0)
+    assert messages == [message(0)]
+    store.append(message(1))
+    assert store.read_from(offset) == ([message(1)], store.size())
+
+def test_torn_trailing_record_is_truncated(log_path):
+    store = HistoryStore(log_path)
+    store.append(message(0))
+    store.close()
+    with open(log_path, 'ab') as f:
+        f.write(b'{"role": "user", "cont')
+
+    store = HistoryStore(log_path)
+    store.append(message(1))
+    assert store.load() == [message(0), message(1)]
+
+def test_legacy_history_is_migrated(tmp_path):
+    directory = tmp_path / "history"
+    directory.mkdir()
+    (directory / "chat_history.json").write_text(json.dumps([message(0), message(1)]))
+    store = HistoryStore(str(directory / "chat_history.jsonl"))
+    assert store.load() == [message(0), message(1)]
+    assert (directory / "chat_history.json.migrated").exists()
+
+def test_corrupt_record_is_counted_once(log_path):
+    store = HistoryStore(log_path)
+    store.append(message(0))
+    store.close()
+    with open(log_path, 'ab') as f:
+        f.write(b"not json\n")
+
+    store = HistoryStore(log_path)
+    for _ in range(3):
+        store.load()
+        store.read_page()
+        store.read_from(0)
+    assert store.dead_records == 1
+
+def test_compaction_drops_corrupt_records(log_path):
+    store = HistoryStore(log_path, compact_threshold=2)
+    store.append(message(0))
+    store.close()
+    with open(log_path, 'ab') as f:
+        f.write(b"garbage\n[1, 2]\n")
+    store = HistoryStore(log_path, compact_threshold=2)
+    store.append(message(1))
+    store.load()
+    store.close()
+
+    with open(log_path, 'rb') as f:
+        assert f.read().count(b"\n") == 2
+    assert HistoryStore(log_path).load() == [message(0), message(1)]
+
+def test_grown_log_is_scanned_for_corrupt_records(log_path, monkeypatch):
+    monkeypatch.setattr(HistoryStore, "MIN_SCAN_SIZE", 1024)
+    store = HistoryStore(log_path)
+    store.append(message(0))
+    store.close()
+    with open(log_path, 'ab') as f:
+        f.write(b"garbage\n")
+
+    store = HistoryStore(log_path)
+    for index in range(1, 100):
+        store.append(message(index))
+    store.read_page(limit=10)
+    assert store.dead_records == 0
+    store.close()
+
+    assert b"garbage" not in open(log_path, 'rb').read()
+    assert int(open(f"{log_path}.scanned").read()) == HistoryStore(log_path).size()
+
+def test_clean_log_is_not_rescanned_until_it_grows(log_path, monkeypatch):
+    monkeypatch.setattr(HistoryStore, "MIN_SCAN_SIZE", 1024)
+    store = HistoryStore(log_path, compact_growth=2.0)
+    for index in range(100):
+        store.append(message(index))
+    store.close()
+    scanned = int(open(f"{log_path}.scanned").read())
+
+    store = HistoryStore(log_path, compact_growth=2.0)
+    store.append(message(100))
+    monkeypatch.setattr(store, "load", lambda: pytest.fail("scanned a log that barely grew"))
+    store.close()
+    assert int(open(f"{log_path}.scanned").read()) == scanned
+
+def test_clear(log_path):
+    store = HistoryStore(log_path)
+    store.append(message(0))
+    store.clear()
+    assert store.load() == []
+    assert store.read_page() == ([], 0)
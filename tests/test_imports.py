@@ -0,0 +1,24 @@
+import sys
+import subprocess
+import pytest
+from benchmarks.bench_import import ADDON_DIR, STARTUP_ALLOWED, startup_imports
+
+def imported_modules(module):
+    """Import ``module`` in a fresh interpreter and return what got loaded."""
+    process = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(' '.join(sys.modules))"],
+        cwd=ADDON_DIR, capture_output=True, text=True, check=True
+    )
+    return set(process.stdout.split())
+
+def test_addon_startup_imports_only_freecad():
+    assert set(startup_imports()) <= STARTUP_ALLOWED
+
+@pytest.mark.parametrize("module, deferred", [
+    ("utils.settings", {"jsonschema", "asyncio", "aiohttp"}),
+    ("core.ai_service", {"aiohttp", "jsonschema", "numpy"}),
+    ("core.history_store", {"asyncio", "aiohttp", "sqlite3"}),
+    ("core.metrics", {"aiohttp", "asyncio"})
+])
+def test_heavy_dependencies_are_deferred(module, deferred):
+    assert not deferred & imported_modules(module)
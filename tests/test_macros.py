@@ -0,0 +1,140 @@
+import os
+import sys
+import types
+import asyncio
+import importlib
+import pytest
+from core.macros import MacroRunner, apply_macro, describe_result, extract_macro, macro_hash
+
+@pytest.fixture
+def runner(monkeypatch):
+    """A runner outside FreeCAD, where every document fingerprint is ""."""
+    monkeypatch.setitem(sys.modules, "FreeCAD", None)
+    return MacroRunner()
+
+def test_extract_joins_python_blocks():
+    text = (
+        "First:\n```python\nbox = 1\n```\n"
+        "Output:\n```\nnot code\n```\n"
+        "Then:\n```py\nprint(box)\n```"
+    )
+    assert extract_macro(text) == "box = 1\n\nprint(box)"
+
+def test_extract_without_code():
+    assert extract_macro("No code here.") is None
+    assert extract_macro("```python\n\n```") is None
+    assert extract_macro(None) is None
+
+def test_hash_ignores_trailing_whitespace():
+    assert macro_hash("a = 1  \nb = 2\n\n") == macro_hash("a = 1\nb = 2")
+    assert macro_hash("a = 1") != macro_hash("a = 2")
+
+def test_failed_result():
+    assert describe_result({"ok": False, "error": "Traceback\n"}) == "The macro failed:\n```\nTraceback\n```"
+
+def test_successful_result():
+    text = describe_result({
+        "ok": True,
+        "duration": 0.25,
+        "created": {"Box": {"name": "Box", "type": "Part::Box"}},
+        "removed": ["Sphere"],
+        "output": "done\n",
+        "cached": True
+    })
+    assert text == (
+        "The macro ran in 0.2 s (same macro and document as before, not run again).\n"
+        "Created:\n"
+        "- Box [Part::Box]\n"
+        "Removed: Sphere\n"
+        "Output:\n```\ndone\n```"
+    )
+    assert describe_result({"ok": True, "duration": 1}).endswith("The document is unchanged.")
+
+def test_cache_evicts_least_recently_used(runner, isolated_settings):
+    isolated_settings.set(2, "macros", "cache_size")
+    runner._store("a", {"ok": True})
+    runner._store("b", {"ok": True})
+    runner.cached("a")
+    runner._store("c", {"ok": True})
+    assert runner.cached("b") is None
+    assert runner.cached("a") is not None
+    assert runner.cached("c") is not None
+
+def test_cached_result_is_returned_without_running(runner):
+    runner._store(f"{macro_hash('x = 1')}:", {"ok": True, "duration": 1.0})
+    result = runner.start("x = 1\n").result(timeout=0)
+    assert result == {"ok": True, "duration": 1.0, "cached": True}
+
+def test_missing_freecad_cmd_fails_the_run(runner, isolated_settings, monkeypatch):
+    isolated_settings.set("", "macros", "freecad_cmd")
+    monkeypatch.setattr("core.macros.shutil.which", lambda name: None)
+    result = runner.start("x = 1").result(timeout=0)
+    assert not result["ok"]
+    assert "FreeCADCmd was not found" in result["error"]
+
+def test_failures_are_reported_and_cached(runner, isolated_settings):
+    # Plain Python stands in for FreeCADCmd; the macro fails either way
+    isolated_settings.set(sys.executable, "macros", "freecad_cmd")
+    isolated_settings.set(0, "macros", "memory_mb")
+    job = runner._prepare("raise ValueError('boom')")
+    result = asyncio.run(runner._run("key", job))
+    assert not result["ok"]
+    assert "Error" in result["error"]
+    assert runner.cached("key") == result
+    assert not os.path.exists(job["directory"])
+
+def test_importing_the_runner_script_does_nothing(monkeypatch):
+    monkeypatch.delenv("AICHAT_MACRO_JOB", raising=False)
+    module = importlib.import_module("core.macro_runner")
+    assert callable(module.main)
+
+class FakeDocument:
+    def __init__(self):
+        self.events = []
+
+    def openTransaction(self, name):
+        self.events.append("open")
+
+    def recompute(self):
+        self.events.append("recompute")
+
+    def abortTransaction(self):
+        self.events.append("abort")
+
+    def commitTransaction(self):
+        self.events.append("commit")
+
+@pytest.fixture
+def document(monkeypatch):
+    doc = FakeDocument()
+    freecad = types.ModuleType("FreeCAD")
+    freecad.ActiveDocument = doc
+    monkeypatch.setitem(sys.modules, "FreeCAD", freecad)
+    return doc
+
+def test_apply_commits_one_transaction(document):
+    assert apply_macro("x = 1", timeout=5) is None
+    assert document.events == ["open", "recompute", "commit"]
+
+def test_apply_rolls_back_a_failing_macro(document):
+    error = apply_macro("raise ValueError('boom')", timeout=5)
+    assert "ValueError: boom" in error
+    assert document.events == ["open", "abort"]
+
+def test_apply_stops_a_runaway_macro(document):
+    previous_trace = sys.gettrace()
+    error = apply_macro("while True:\n    pass", timeout=0.05)
+    assert "did not finish within 0.05 seconds" in error
+    assert document.events == ["open", "abort"]
+    assert sys.gettrace() is previous_trace
+
+def test_only_checked_macros_on_the_same_document_are_verified(runner, monkeypatch):
+    fingerprint = "before"
+    monkeypatch.setattr("core.macros.document_context.fingerprint", lambda: fingerprint)
+    assert not runner.verified("x = 1")
+    runner._store(runner.key("x = 1"), {"ok": True})
+    runner._store(runner.key("y = 1"), {"ok": False, "error": "boom"})
+    assert runner.verified("x = 1")
+    assert not runner.verified("y = 1")
+    fingerprint = "after"
+    assert not runner.verified("x = 1")
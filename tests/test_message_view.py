@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("PySide")
+
+from PySide import QtCore
+from gui.message_view import IsUserRole, PendingRole, MessageListModel
+
+def test_streamed_text_is_addressed_by_seq():
+    model = MessageListModel()
+    model.append_message("question", is_user=True)
+    seq = model.append_message("", is_user=False, pending=True)
+    model.append_delta(seq, "ans")
+    model.append_delta(seq, "wer")
+    model.set_pending(seq, False)
+
+    index = model.index(model.row_for_seq(seq))
+    assert index.data(QtCore.Qt.DisplayRole) == "answer"
+    assert index.data(IsUserRole) is False
+    assert index.data(PendingRole) is False
+
+def test_prepended_messages_keep_seqs_valid():
+    model = MessageListModel()
+    model.append_messages([("newer", True)])
+    seq = model.append_message("newest", is_user=False)
+    model.prepend_messages([("old", True), ("older reply", False)])
+
+    assert model.rowCount() == 4
+    assert model.text(seq) == "newest"
+    assert model.index(0).data(QtCore.Qt.DisplayRole) == "old"
+
+def test_remove_and_unknown_seq():
+    model = MessageListModel()
+    seq = model.append_message("gone")
+    model.remove(seq)
+    assert model.rowCount() == 0
+    assert model.row_for_seq(seq) == -1
+    assert model.text(seq) == ""
@@ -0,0 +1,86 @@
+import json
+import pytest
+from core.metrics import (PHASES, JsonlSink, MetricsSink, RequestMetrics, RingBufferSink,
+                          percentile, prometheus_text)
+from fakes import FakeService
+
+def entry(**overrides):
+    metrics = RequestMetrics(backend="lmstudio", model="m")
+    metrics.finish()
+    values = metrics.as_dict()
+    values.update(overrides)
+    return values
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert percentile([1, 2, 3, 4], 0.99) == 4
+
+def test_marks_keep_the_first_time_and_reset_per_attempt():
+    metrics = RequestMetrics()
+    metrics.mark("connect")
+    first = metrics.marks["connect"]
+    metrics.mark("connect")
+    assert metrics.marks["connect"] == first
+    metrics.new_attempt()
+    assert "connect" not in metrics.marks
+
+def test_finish_keeps_the_error_and_status():
+    error = RuntimeError("busy")
+    error.status = 503
+    metrics = RequestMetrics()
+    metrics.finish(error)
+    values = metrics.as_dict()
+    assert (values["error"], values["error_type"], values["status"]) == ("busy", "RuntimeError", 503)
+    assert values["total"] is not None and set(PHASES) <= set(values)
+
+def test_ring_buffer_summary_leaves_out_cache_hits_and_errors():
+    sink = RingBufferSink(capacity=3)
+    sink.record(entry(prompt_tokens=1))
+    sink.record(entry(prompt_tokens=10, completion_tokens=4))
+    sink.record(entry(prompt_tokens=99, cached=True))
+    sink.record(entry(prompt_tokens=50, error="down"))
+    summary = sink.summary()
+    assert summary["requests"] == 3
+    assert summary["errors"] == 1 and summary["cache_hits"] == 1
+    assert summary["prompt_tokens"] == 10
+    assert sink.recent(1)[0]["error"] == "down"
+
+def test_jsonl_sink_appends(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    sink = JsonlSink(str(path))
+    sink.record(entry())
+    sink.record(entry(retries=2))
+    lines = path.read_text().splitlines()
+    assert [json.loads(line)["retries"] for line in lines] == [0, 2]
+
+def test_sinks_must_implement_record():
+    with pytest.raises(TypeError):
+        MetricsSink()
+
+def test_prometheus_text_groups_by_backend():
+    text = prometheus_text([entry(), entry(backend=None, retries=3, error="x")])
+    assert '# TYPE aichat_total_seconds summary' in text
+    assert 'aichat_requests_total{backend="lmstudio"} 1' in text
+    assert 'aichat_retries_total{backend="unknown"} 3' in text
+    assert 'aichat_errors_total{backend="unknown"} 1' in text
+
+def test_manager_records_request_metrics(manager):
+    manager.run_sync(setattr, manager, "_service", FakeService(replies=["four words of answer"]))
+    manager.request("a short prompt").result(timeout=5)
+    recorded = manager.recent_metrics(1)[0]
+    assert recorded["backend"] == "fake"
+    assert recorded["prompt_tokens"] > 0
+    assert recorded["completion_tokens"] > 0
+    assert recorded["error"] is None
+
+def test_prometheus_counters_outlive_the_window():
+    sink = RingBufferSink(capacity=2)
+    for _ in range(5):
+        sink.record(entry(retries=1))
+    text = prometheus_text(sink.recent(), sink.totals())
+    assert 'aichat_requests_total{backend="lmstudio"} 5' in text
+    assert 'aichat_retries_total{backend="lmstudio"} 5' in text
+    assert 'aichat_total_seconds_count{backend="lmstudio"} 5' in text
+    sink.clear()
+    assert 'aichat_requests_total{backend="lmstudio"} 5' in prometheus_text(sink.recent(), sink.totals())
@@ -0,0 +1,63 @@
+import asyncio
+from core.lmstudio_backend import LMStudioService
+from core.session_pool import session_pool
+from fakes import FakeService
+
+class Reconfigurable(FakeService):
+    def __init__(self):
+        super().__init__()
+        self.deltas = []
+
+    def reconfigure(self, delta):
+        self.deltas.append(delta)
+        return True
+
+def settle(manager):
+    """Wait until the reconfiguration queued on the loop has run."""
+    manager.run_sync(lambda: None)
+
+def test_generation_change_is_applied_in_place(manager, isolated_settings):
+    service = Reconfigurable()
+    manager.run_sync(setattr, manager, "_service", service)
+    isolated_settings.set(0.3, "ai_backend", "generation", "temperature")
+    settle(manager)
+    assert manager._service is service
+    assert service.deltas == [{"ai_backend.generation.temperature": 0.3}]
+
+def test_service_that_cannot_adapt_is_rebuilt(manager, isolated_settings):
+    service = FakeService()
+    manager.run_sync(setattr, manager, "_service", service)
+    isolated_settings.set("lmstudio", "ai_backend", "active_backend")
+    settle(manager)
+    assert isinstance(manager._service, LMStudioService)
+
+def test_retry_change_drops_the_cached_policy(manager, isolated_settings):
+    policy = manager._retry_policy()
+    isolated_settings.set(7, "retry", "max_attempts")
+    settle(manager)
+    assert manager._retry_policy() is not policy
+    assert manager._retry_policy().max_attempts == 7
+
+def test_unrelated_settings_are_ignored(manager, isolated_settings):
+    service = Reconfigurable()
+    manager.run_sync(setattr, manager, "_service", service)
+    isolated_settings.set(14, "ui", "font", "size")
+    settle(manager)
+    assert service.deltas == []
+
+def test_lmstudio_keeps_its_session_for_parameter_changes(isolated_settings):
+    async def run():
+        service = LMStudioService()
+        service.initialize()
+        session = service.session
+        isolated_settings.set(0.9, "ai_backend", "generation", "top_p")
+        same = service.reconfigure({"ai_backend.generation.top_p": 0.9})
+        kept = service.session is session and service.parameters["top_p"] == 0.9
+        isolated_settings.set(4321, "ai_backend", "lmstudio", "port")
+        moved = service.reconfigure({"ai_backend.lmstudio.port": 4321})
+        await session_pool.close()
+        return same, kept, moved, service.api_base
+
+    same, kept, moved, api_base = asyncio.run(run())
+    assert same and kept and moved
+    assert api_base.endswith(":4321/v1")
@@ -0,0 +1,66 @@
+import time
+from core.response_cache import ResponseCache
+from fakes import FakeService
+
+def test_key_ignores_whitespace_but_not_content():
+    context = [{"role": "user", "content": "make  a\ncube"}]
+    key = ResponseCache.make_key("lmstudio", "m", "hello   world", context, {"temperature": 0})
+    same = ResponseCache.make_key("lmstudio", "m", "hello world",
+                                  [{"role": "user", "content": "make a cube"}], {"temperature": 0})
+    assert key == same
+    assert key != ResponseCache.make_key("lmstudio", "other", "hello world", context, {"temperature": 0})
+    assert key != ResponseCache.make_key("lmstudio", "m", "hello world", context, {"temperature": 0.5})
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a")["text"] == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+def test_expired_entries_miss(monkeypatch):
+    cache = ResponseCache(ttl_seconds=10)
+    cache.put("a", "A")
+    later = time.time() + 11
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    ResponseCache(disk_path=str(tmp_path)).put("a", "A", {"model": "m"})
+    entry = ResponseCache(disk_path=str(tmp_path)).get("a")
+    assert entry["text"] == "A"
+    assert entry["metadata"] == {"model": "m"}
+
+def test_clear_resets_counters_and_disk(tmp_path):
+    cache = ResponseCache(disk_path=str(tmp_path))
+    cache.put("a", "A")
+    cache.get("a")
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 0
+    assert not list(tmp_path.glob("*.json"))
+
+def test_manager_serves_repeats_from_the_cache(manager, isolated_settings):
+    isolated_settings.set(True, "cache", "enabled")
+    isolated_settings.set(False, "cache", "disk")
+    service = FakeService(replies=["first", "second"])
+    manager.run_sync(setattr, manager, "_service", service)
+
+    first = manager.request("same prompt").result(timeout=5)
+    second = manager.request("same  prompt").result(timeout=5)
+    assert first.text == second.text == "first"
+    assert second.metadata["cached"] is True
+    assert service.calls == 1
+
+def test_sampled_responses_are_not_cached(manager, isolated_settings):
+    isolated_settings.set(True, "cache", "enabled")
+    isolated_settings.set(False, "cache", "cache_sampled")
+    service = FakeService(replies=["first", "second"])
+    service.parameters = {"temperature": 0.7}
+    manager.run_sync(setattr, manager, "_service", service)
+
+    manager.request("prompt").result(timeout=5)
+    assert manager.request("prompt").result(timeout=5).text == "second"
@@ -0,0 +1,158 @@
+import os
+import asyncio
+import pytest
+from core.embeddings import (EMBEDDERS, Embedder, HashingEmbedder, HuggingFaceEmbedder, create_embedder,
+                             register_embedder)
+from fakes import FakeResponse, FakeSession
+
+np = pytest.importorskip("numpy")
+
+from core.history_store import HistoryStore
+from core.retrieval import AnswerRetriever, VectorIndex
+
+def make_history(tmp_path, messages):
+    store = HistoryStore(str(tmp_path / "chat_history.jsonl"))
+    for index, (role, content) in enumerate(messages):
+        store.append({"role": role, "content": content, "timestamp": f"2024-01-01T10:00:{index:02d}"})
+    return store
+
+def test_embedder_is_abstract():
+    with pytest.raises(TypeError):
+        Embedder()
+
+def test_hashing_vectors_are_deterministic():
+    embedder = HashingEmbedder(64)
+    vector = embedder.vector("Pad the sketch")
+    assert len(vector) == 64
+    assert vector == embedder.vector("pad the SKETCH")
+    assert vector != embedder.vector("Pocket the sketch")
+    assert embedder.signature == "hashing:64"
+
+def test_embedders_are_registered_by_name(monkeypatch):
+    monkeypatch.setattr("core.embeddings.EMBEDDERS", dict(EMBEDDERS))
+    register_embedder("test-hashing", lambda: HashingEmbedder(8))
+    assert create_embedder("test-hashing").dimensions == 8
+    with pytest.raises(ValueError):
+        create_embedder("missing")
+
+@pytest.mark.parametrize("endpoint", [
+    "https://api-inference.huggingface.co/models",
+    "https://api-inference.huggingface.co/models/"
+])
+def test_huggingface_url_joins_endpoint_and_model(endpoint, monkeypatch):
+    session = FakeSession([FakeResponse(body=[[[1.0, 3.0], [3.0, 5.0]]])])
+    monkeypatch.setattr("core.session_pool.session_pool.get_session", lambda url: session)
+    embedder = HuggingFaceEmbedder(endpoint, "sentence-transformers/all-MiniLM-L6-v2", "key")
+    assert asyncio.run(embedder.embed(["text"])) == [[2.0, 4.0]]
+    assert session.requests[0]["url"] == (
+        "https://api-inference.huggingface.co/models/sentence-transformers/all-MiniLM-L6-v2"
+    )
+
+def test_vector_index_returns_nearest_first(tmp_path):
+    index = VectorIndex(str(tmp_path / "index"))
+    index.reset("test", 3)
+    index.add([[1, 0, 0], [0, 1, 0], [1, 1, 0]], [{"name": "x"}, {"name": "y"}, {"name": "xy"}])
+    hits = index.search([1, 0.1, 0], 2)
+    assert [index.entry(row)["name"] for _, row in hits] == ["x", "xy"]
+    assert hits[0][0] == pytest.approx(0.995, abs=0.001)
+
+def test_vector_index_searches_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(VectorIndex, "CHUNK_ROWS", 2)
+    index = VectorIndex(str(tmp_path / "index"))
+    index.reset("test", 2)
+    index.add([[1, row] for row in range(7)], [{"row": row} for row in range(7)])
+    assert [row for _, row in index.search([1, 0], 3)] == [0, 1, 2]
+
+def test_vector_index_drops_a_torn_tail(tmp_path):
+    directory = str(tmp_path / "index")
+    index = VectorIndex(directory)
+    index.reset("test", 2)
+    index.add([[1, 0], [0, 1]], [{"row": 0}, {"row": 1}])
+    # A crash after writing the vector but before its metadata line
+    with open(index.vectors_path, 'ab') as f:
+        f.write(np.asarray([[1, 1]], dtype=np.float32).tobytes())
+
+    reopened = VectorIndex(directory)
+    assert reopened.count == 2
+    assert [reopened.entry(row)["row"] for _, row in reopened.search([0, 1], 5)] == [1, 0]
+
+def test_similar_answers_are_retrieved(tmp_path):
+    retriever = AnswerRetriever(str(tmp_path / "retrieval"), HashingEmbedder(256), top_k=2, min_score=0.3)
+    history = make_history(tmp_path, [
+        ("user", "How do I make a gear?"),
+        ("assistant", "Use the Gear workbench to create an involute gear with the tooth count you need."),
+        ("user", "And a fillet?"),
+        ("assistant", "Select the edges and apply Part Fillet with a radius.")
+    ])
+    asyncio.run(retriever.update("default", history))
+
+    results = asyncio.run(retriever.retrieve("create an involute gear"))
+    assert results[0]["content"] == (
+        "Use the Gear workbench to create an involute gear with the tooth count you need."
+    )
+    assert all(result["score"] >= 0.3 for result in results)
+    # Answers already in the context are not offered again
+    assert asyncio.run(retriever.retrieve("create an involute gear", context=results[:1])) == results[1:]
+
+def test_updates_embed_only_new_answers(tmp_path):
+    retriever = AnswerRetriever(str(tmp_path / "retrieval"), HashingEmbedder(64))
+    history = make_history(tmp_path, [("user", "question"), ("assistant", "first answer")])
+    asyncio.run(retriever.update("default", history))
+    asyncio.run(retriever.update("default", history))
+    assert retriever.index.count == 1
+    history.append({"role": "assistant", "content": "second answer", "timestamp": "2024-01-02"})
+    asyncio.run(retriever.update("default", history))
+    assert retriever.index.count == 2
+
+def test_another_embedder_starts_over(tmp_path):
+    directory = str(tmp_path / "retrieval")
+    history = make_history(tmp_path, [("assistant", "an answer")])
+    asyncio.run(AnswerRetriever(directory, HashingEmbedder(64)).update("default", history))
+
+    retriever = AnswerRetriever(directory, HashingEmbedder(32))
+    assert retriever.index.count == 0
+    assert asyncio.run(retriever.retrieve("an answer")) == []
+
+def test_augment_prepends_truncated_answers(tmp_path):
+    retriever = AnswerRetriever(str(tmp_path / "retrieval"), HashingEmbedder(8), max_chars=10)
+    context = [{"role": "user", "content": "hi"}]
+    augmented = retriever.augment(context, [{"content": "one two three four"}])
+    assert augmented[1:] == context
+    assert augmented[0]["role"] == "system"
+    assert augmented[0]["content"].endswith("one two…")
+    assert retriever.augment(context, []) is context
+
+def test_removed_conversations_leave_the_index(tmp_path):
+    directory = str(tmp_path / "retrieval")
+    retriever = AnswerRetriever(directory, HashingEmbedder(64), top_k=2, min_score=0.3)
+    gear = "Use the Gear workbench to create an involute gear."
+    for conversation_id, count in (("deleted", 50), ("kept", 1)):
+        history = HistoryStore(str(tmp_path / f"{conversation_id}.jsonl"))
+        for _ in range(count):
+            history.append({"role": "assistant", "content": gear, "timestamp": "2024-01-01"})
+        asyncio.run(retriever.update(conversation_id, history))
+    old_files = (retriever.index.vectors_path, retriever.index.entries_path)
+
+    asyncio.run(retriever.remove("deleted"))
+    assert retriever.index.count == 1
+    assert "deleted" not in retriever.index.meta["sources"]
+    assert not any(os.path.exists(path) for path in old_files)
+    results = asyncio.run(retriever.retrieve("involute gear"))
+    assert [result["conversation"] for result in results] == ["kept"]
+
+    reopened = VectorIndex(directory)
+    assert reopened.count == 1
+    assert reopened.entry(0)["conversation"] == "kept"
+
+def test_rows_hidden_by_older_versions_are_dropped(tmp_path):
+    directory = str(tmp_path / "index")
+    index = VectorIndex(directory)
+    index.reset("test", 2)
+    index.add([[1, 0], [0, 1]], [{"conversation": "a"}, {"conversation": "b"}])
+    index.meta["removed"] = {"a": "2024-01-01"}
+    index.save_meta()
+
+    reopened = VectorIndex(directory)
+    assert reopened.count == 1
+    assert reopened.entry(0)["conversation"] == "b"
+    assert "removed" not in reopened.meta
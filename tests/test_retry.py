@@ -0,0 +1,84 @@
+import asyncio
+import time
+from email.utils import formatdate
+import pytest
+from core.retry import RetryableError, RetryPolicy, error_from_response, parse_retry_after
+from fakes import FakeResponse, FakeService
+
+def test_parse_retry_after_seconds_and_dates():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert 50 < parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+def test_backoff_is_bounded_full_jitter():
+    policy = RetryPolicy(base_delay=0.5, max_delay=4.0)
+    error = RetryableError("busy")
+    for attempt, window in ((1, 0.5), (2, 1.0), (3, 2.0), (6, 4.0)):
+        delays = [policy.delay_for(attempt, error) for _ in range(200)]
+        assert all(0 <= delay <= window for delay in delays)
+
+def test_server_hint_wins_over_backoff():
+    policy = RetryPolicy(base_delay=0.5, max_delay=20.0)
+    delay = policy.delay_for(1, RetryableError("loading", retry_after=8.0))
+    assert 8.0 <= delay <= 8.5
+
+def test_final_errors_are_not_retried():
+    policy = RetryPolicy(max_attempts=3, max_delay=20, deadline=10)
+    started = time.monotonic()
+    assert policy.next_delay(1, RuntimeError("bad request"), started) is None
+    assert policy.next_delay(3, RetryableError("busy"), started) is None
+    assert policy.next_delay(1, RetryableError("busy", retry_after=120), started) is None
+    assert policy.next_delay(1, RetryableError("busy"), started) is not None
+
+def test_run_retries_until_success():
+    policy = RetryPolicy(max_attempts=4, base_delay=0.001, max_delay=0.01)
+    outcomes = [RetryableError("busy", status=503), RetryableError("busy", status=429), "ok"]
+
+    async def operation():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    attempts = []
+    assert asyncio.run(policy.run(operation, attempts)) == "ok"
+    assert [attempt["status"] for attempt in attempts] == [503, 429, None]
+    assert attempts[-1]["error"] is None
+
+def test_run_gives_up_after_max_attempts():
+    policy = RetryPolicy(max_attempts=2, base_delay=0.001)
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        raise RetryableError("busy")
+
+    with pytest.raises(RetryableError):
+        asyncio.run(policy.run(operation))
+    assert len(calls) == 2
+
+def test_error_from_response_maps_statuses():
+    async def run(response):
+        return await error_from_response(response)
+
+    error = asyncio.run(run(FakeResponse(status=503, text="loading", body={"estimated_time": 12.5})))
+    assert isinstance(error, RetryableError)
+    assert (error.status, error.retry_after) == (503, 12.5)
+
+    error = asyncio.run(run(FakeResponse(status=429, headers={"Retry-After": "2"})))
+    assert error.retry_after == 2.0
+
+    error = asyncio.run(run(FakeResponse(status=401, text="unauthorized")))
+    assert not isinstance(error, RetryableError)
+
+def test_manager_retries_transient_failures(manager, isolated_settings):
+    isolated_settings.set(0.001, "retry", "base_delay")
+    service = FakeService(replies=[RetryableError("busy", status=502), "recovered"])
+    manager.run_sync(setattr, manager, "_service", service)
+
+    response = manager.request("hi").result(timeout=5)
+    assert response.text == "recovered"
+    assert response.metadata["retries"] == 1
+    assert response.metadata["metrics"]["retries"] == 1
@@ -0,0 +1,138 @@
+import asyncio
+import time
+import pytest
+from core.router import BackendStats, RoutingService
+from fakes import FakeService
+
+def router(*services, hedge=False):
+    routing = RoutingService()
+    routing.hedge = hedge
+    routing.hedge_min_samples = 3
+    for service in services:
+        routing.backends[service.name] = service
+        routing.stats[service.name] = BackendStats(failure_threshold=2, cooldown=30)
+        routing.weights[service.name] = 1.0
+    return routing
+
+def test_circuit_opens_after_consecutive_failures():
+    stats = BackendStats(failure_threshold=2, cooldown=30)
+    stats.record_failure()
+    assert not stats.circuit_open
+    stats.record_failure()
+    assert stats.circuit_open
+    stats.record_success(0.1)
+    assert not stats.circuit_open
+
+def test_circuit_half_opens_after_the_cooldown(monkeypatch):
+    stats = BackendStats(failure_threshold=1, cooldown=30)
+    stats.record_failure()
+    later = time.monotonic() + 31
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert not stats.circuit_open
+
+def test_percentiles_and_error_rate():
+    stats = BackendStats(window=4)
+    for latency in (0.1, 0.2, 0.3, 0.4, 0.5):
+        stats.record_success(latency)
+    assert stats.p50 == 0.4
+    stats.record_failure()
+    assert stats.error_rate == 0.25
+
+def test_ranking_prefers_fast_healthy_backends():
+    fast, slow = FakeService("fast"), FakeService("slow")
+    routing = router(slow, fast)
+    routing.stats["fast"].record_success(0.1)
+    routing.stats["slow"].record_success(1.0)
+    assert routing.ranked() == ["fast", "slow"]
+
+    routing.weights["fast"] = 20.0
+    assert routing.ranked() == ["slow", "fast"]
+
+    routing.weights["fast"] = 1.0
+    routing.stats["fast"].record_failure()
+    routing.stats["fast"].record_failure()
+    assert routing.ranked() == ["slow", "fast"]
+
+def test_unavailable_backends_are_skipped():
+    down, up = FakeService("down"), FakeService("up")
+    down.available = False
+    assert router(down, up).ranked() == ["up"]
+
+def test_failover_to_the_next_backend():
+    broken = FakeService("broken", replies=[RuntimeError("refused")])
+    backup = FakeService("backup", replies=["from backup"])
+    routing = router(broken, backup)
+    response = asyncio.run(routing.generate_response("hi"))
+    assert response.text == "from backup"
+    assert routing.stats["broken"].consecutive_failures == 1
+    assert routing.stats["backup"].outcomes[-1] is True
+
+def test_all_backends_failing_raises_the_last_error():
+    routing = router(FakeService("a", replies=[RuntimeError("a down")]),
+                     FakeService("b", replies=[RuntimeError("b down")]))
+    with pytest.raises(RuntimeError, match="b down"):
+        asyncio.run(routing.generate_response("hi"))
+
+def test_stream_fails_over_before_the_first_delta():
+    routing = router(FakeService("broken", replies=[RuntimeError("refused")]),
+                     FakeService("backup", replies=["streamed answer"]))
+
+    async def run():
+        return "".join([delta async for delta in routing.stream_response("hi")])
+
+    assert asyncio.run(run()) == "streamed answer "
+
+def test_hedge_races_the_runner_up():
+    slow = FakeService("slow", replies=["slow answer"] * 4, delay=0.5)
+    fast = FakeService("fast", replies=["fast answer"])
+    routing = router(slow, fast, hedge=True)
+    for _ in range(3):
+        routing.stats["slow"].record_success(0.01)
+    routing.stats["fast"].record_success(0.02)
+
+    response = asyncio.run(routing.generate_response("hi"))
+    assert response.text == "fast answer"
+    assert response.metadata["hedged"] is True
+
+def slow_primary_router(*others):
+    slow = FakeService("slow", replies=[RuntimeError("slow down")], delay=0.2)
+    routing = router(slow, *others, hedge=True)
+    for _ in range(3):
+        routing.stats["slow"].record_success(0.01)
+    for other in others:
+        routing.stats[other.name].record_success(0.02)
+    return routing
+
+def test_failed_hedge_does_not_call_the_runner_up_again():
+    runner_up = FakeService("runner_up", replies=[RuntimeError("also down")] * 2, delay=0.05)
+    last = FakeService("last", replies=["from last"])
+    routing = slow_primary_router(runner_up, last)
+    routing.weights["last"] = 2.0
+
+    response = asyncio.run(routing.generate_response("hi"))
+    assert response.text == "from last"
+    assert runner_up.calls == 1
+    assert routing.stats["runner_up"].consecutive_failures == 1
+
+def test_hedge_skips_runner_ups_with_an_open_circuit():
+    slow = FakeService("slow", replies=["slow answer"], delay=0.1)
+    tripped = FakeService("tripped", replies=["from tripped"])
+    routing = router(slow, tripped, hedge=True)
+    for _ in range(3):
+        routing.stats["slow"].record_success(0.01)
+    routing.stats["tripped"].open_until = time.monotonic() + 30
+
+    response = asyncio.run(routing.generate_response("hi"))
+    assert response.text == "slow answer"
+    assert tripped.calls == 0
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_requests_are_credited_to_the_backend_that_answered(manager, stream):
+    routing = router(FakeService("broken", replies=[RuntimeError("refused")]),
+                     FakeService("backup", replies=["from backup"], model="backup-model"))
+    routing.model = "backup:backup-model+broken:fake-model"
+    manager.run_sync(setattr, manager, "_service", routing)
+    response = manager.request("hi", stream=stream).result(timeout=5)
+    assert (response.metadata["backend"], response.metadata["model"]) == ("backup", "backup-model")
+    recorded = manager.recent_metrics(1)[0]
+    assert (recorded["backend"], recorded["model"]) == ("backup", "backup-model")
@@ -0,0 +1,112 @@
+import asyncio
+from core.scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, RequestScheduler
+
+async def served_order(scheduler, requests):
+    """Queue ``(key, priority, name)`` requests behind a held slot; return the serving order."""
+    order = []
+    release = asyncio.Event()
+
+    async def holder():
+        async with scheduler.slot():
+            await release.wait()
+
+    async def request(key, priority, name):
+        async with scheduler.slot(key, priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    blocker = asyncio.ensure_future(holder())
+    await asyncio.sleep(0)
+    tasks = [asyncio.ensure_future(request(*spec)) for spec in requests]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+    return order
+
+def test_keys_take_turns():
+    order = asyncio.run(served_order(RequestScheduler(1), [
+        ("a", PRIORITY_INTERACTIVE, "a1"),
+        ("a", PRIORITY_INTERACTIVE, "a2"),
+        ("a", PRIORITY_INTERACTIVE, "a3"),
+        ("b", PRIORITY_INTERACTIVE, "b1"),
+        ("b", PRIORITY_INTERACTIVE, "b2")
+    ]))
+    assert order == ["a1", "b1", "a2", "b2", "a3"]
+
+def test_interactive_requests_go_first():
+    order = asyncio.run(served_order(RequestScheduler(1), [
+        (None, PRIORITY_BACKGROUND, "summary"),
+        ("a", PRIORITY_INTERACTIVE, "prompt")
+    ]))
+    assert order == ["prompt", "summary"]
+
+def test_limit_bounds_concurrency():
+    async def run():
+        scheduler = RequestScheduler(2)
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with scheduler.slot():
+                peak = max(peak, scheduler.active)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request() for _ in range(6)))
+        return peak, scheduler.stats()
+
+    peak, stats = asyncio.run(run())
+    assert peak == 2
+    assert stats == {"limit": 2, "active": 0, "queued": 0}
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        scheduler = RequestScheduler(1)
+        release = asyncio.Event()
+
+        async def holder():
+            async with scheduler.slot():
+                await release.wait()
+
+        async def waiter():
+            async with scheduler.slot("a"):
+                pass
+
+        blocker = asyncio.ensure_future(holder())
+        await asyncio.sleep(0)
+        waiting = asyncio.ensure_future(waiter())
+        await asyncio.sleep(0)
+        queued = scheduler.queued
+        waiting.cancel()
+        release.set()
+        await blocker
+        await asyncio.gather(waiting, return_exceptions=True)
+        return queued, scheduler.stats()
+
+    queued, stats = asyncio.run(run())
+    assert queued == 1
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+def test_raising_the_limit_admits_waiters():
+    async def run():
+        scheduler = RequestScheduler(1)
+        release = asyncio.Event()
+        admitted = []
+
+        async def request(name):
+            async with scheduler.slot(name):
+                admitted.append(name)
+                await release.wait()
+
+        tasks = [asyncio.ensure_future(request(name)) for name in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        before = list(admitted)
+        scheduler.set_limit(3)
+        await asyncio.sleep(0)
+        after = list(admitted)
+        release.set()
+        await asyncio.gather(*tasks)
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert before == ["a"]
+    assert after == ["a", "b", "c"]
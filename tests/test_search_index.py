@@ -0,0 +1,95 @@
+import pytest
+from core.history_store import HistoryStore
+from core.search_index import SearchIndex
+
+@pytest.fixture
+def index(tmp_path):
+    search_index = SearchIndex(str(tmp_path / "search.db"))
+    yield search_index
+    search_index.close()
+
+def make_history(tmp_path, name, messages):
+    store = HistoryStore(str(tmp_path / f"{name}.jsonl"))
+    for role, content, timestamp in messages:
+        store.append({"role": role, "content": content, "timestamp": timestamp})
+    return store
+
+def contents(results):
+    return sorted(result["content"] for result in results)
+
+def test_scheduled_update_is_searchable(tmp_path, index):
+    history = make_history(tmp_path, "a", [
+        ("user", "How do I chamfer an edge?", "2024-01-01T10:00:00"),
+        ("assistant", "Select the edge and use Part Chamfer.", "2024-01-01T10:00:05")
+    ])
+    assert index.schedule_update("a", history).result() == 2
+    results = index.search("chamfer")
+    assert contents(results) == ["How do I chamfer an edge?", "Select the edge and use Part Chamfer."]
+    assert all(result["conversation"] == "a" for result in results)
+
+def test_updates_read_only_what_was_appended(tmp_path, index):
+    history = make_history(tmp_path, "a", [("user", "first sketch", "2024-01-01")])
+    assert index.update("a", history) == 1
+    assert index.update("a", history) == 0
+    history.append({"role": "user", "content": "second sketch", "timestamp": "2024-01-02"})
+    assert index.update("a", history) == 1
+    assert contents(index.search("sketch")) == ["first sketch", "second sketch"]
+
+def test_shrunk_log_is_reindexed(tmp_path, index):
+    history = make_history(tmp_path, "a", [("user", "old revolve", "2024-01-01")])
+    index.update("a", history)
+    history.clear()
+    history.append({"role": "user", "content": "new loft", "timestamp": "2024-01-02"})
+    index.update("a", history)
+    assert index.search("revolve") == []
+    assert contents(index.search("loft")) == ["new loft"]
+
+def test_filters(tmp_path, index):
+    index.update("a", make_history(tmp_path, "a", [
+        ("user", "sweep along a helix", "2024-01-01T09:00:00"),
+        ("assistant", "Use a sweep with the Frenet option", "2024-03-01T09:00:00")
+    ]))
+    index.update("b", make_history(tmp_path, "b", [("user", "sweep a circle", "2024-02-01T09:00:00")]))
+    assert contents(index.search("sweep", role="assistant")) == ["Use a sweep with the Frenet option"]
+    assert contents(index.search("sweep", since="2024-02-01")) == [
+        "Use a sweep with the Frenet option", "sweep a circle"
+    ]
+    assert contents(index.search("sweep", until="2024-02-01")) == ["sweep along a helix"]
+    assert contents(index.search("sweep", conversation="b")) == ["sweep a circle"]
+    assert len(index.search("sweep", limit=1)) == 1
+
+def test_prefix_match_and_highlight(tmp_path, index):
+    if not index.fts:
+        pytest.skip("SQLite was built without FTS5")
+    index.update("a", make_history(tmp_path, "a", [("user", "mirror the pocket", "2024-01-01")]))
+    results = index.search("mirror poc")
+    assert len(results) == 1
+    assert "[mirror]" in results[0]["snippet"]
+
+def test_queries_without_words_find_nothing(tmp_path, index):
+    index.update("a", make_history(tmp_path, "a", [("user", "anything", "2024-01-01")]))
+    assert index.match_expression("?!") is None
+    assert index.search("?!") == []
+
+def test_plain_scan_without_fts(tmp_path, index):
+    index.update("a", make_history(tmp_path, "a", [("user", "100% infill", "2024-01-01")]))
+    index.fts = False
+    assert contents(index.search("100%")) == ["100% infill"]
+    assert index.search("50%") == []
+
+def test_scheduled_delete(tmp_path, index):
+    history = make_history(tmp_path, "a", [("user", "thicken the shell", "2024-01-01")])
+    index.schedule_update("a", history)
+    index.schedule_delete("a").result()
+    assert index.search("shell") == []
+    # The stored offset went with it, so the log is indexed again from the start
+    assert index.update("a", history) == 1
+
+def test_usable_after_close(tmp_path, index):
+    history = make_history(tmp_path, "a", [("user", "fillet radius", "2024-01-01")])
+    index.schedule_update("a", history)
+    index.close()
+    assert contents(index.search("fillet")) == ["fillet radius"]
+    history.append({"role": "user", "content": "fillet all edges", "timestamp": "2024-01-02"})
+    assert index.schedule_update("a", history).result() == 1
+    assert len(index.search("fillet")) == 2
@@ -0,0 +1,39 @@
+import asyncio
+from core.session_pool import SessionPool
+
+def test_origin_keeps_scheme_host_and_port():
+    assert SessionPool.origin("http://localhost:1234/v1/chat/completions") == "http://localhost:1234"
+
+def test_sessions_are_shared_per_origin():
+    async def run():
+        pool = SessionPool()
+        first = pool.get_session("http://localhost:1234/v1/models")
+        second = pool.get_session("http://localhost:1234/v1/chat/completions")
+        other = pool.get_session("https://api-inference.huggingface.co/models/x")
+        await pool.close()
+        return first, second, other
+
+    first, second, other = asyncio.run(run())
+    assert first is second
+    assert other is not first
+    assert first.closed and other.closed
+
+def test_closed_session_is_replaced():
+    async def run():
+        pool = SessionPool()
+        first = pool.get_session("http://localhost:1234")
+        await pool.close_endpoint("http://localhost:1234/v1")
+        second = pool.get_session("http://localhost:1234")
+        await pool.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.closed
+    assert second is not first
+
+def test_request_timeout_follows_settings(isolated_settings):
+    isolated_settings.set(7, "ai_backend", "timeouts", "connect")
+    isolated_settings.set(0, "ai_backend", "timeouts", "total")
+    timeout = SessionPool.request_timeout()
+    assert timeout.connect == 7
+    assert timeout.total is None
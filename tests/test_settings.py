@@ -0,0 +1,76 @@
+import json
+import os
+import time
+import pytest
+
+@pytest.fixture
+def writes(isolated_settings, monkeypatch):
+    """Count user settings writes, with a short debounce."""
+    monkeypatch.setattr(isolated_settings, "SAVE_DELAY", 0.05)
+    calls = []
+    write = isolated_settings._write
+
+    def counting_write(data):
+        calls.append(data)
+        write(data)
+    monkeypatch.setattr(isolated_settings, "_write", counting_write)
+    return calls
+
+def stored(settings):
+    with open(settings.user_settings_path) as f:
+        return json.load(f)
+
+def test_burst_of_sets_is_written_once(isolated_settings, writes):
+    for port in (1001, 1002, 1003):
+        isolated_settings.set(port, "ai_backend", "lmstudio", "port")
+    assert isolated_settings.dirty and not writes
+    time.sleep(0.3)
+    assert len(writes) == 1
+    assert stored(isolated_settings)["ai_backend"]["lmstudio"]["port"] == 1003
+    assert not isolated_settings.dirty
+
+def test_flush_writes_atomically_now(isolated_settings, writes):
+    isolated_settings.set(4444, "ai_backend", "lmstudio", "port")
+    isolated_settings.flush()
+    assert len(writes) == 1
+    assert not os.path.exists(isolated_settings.user_settings_path + ".tmp")
+    isolated_settings.flush()
+    assert len(writes) == 1
+
+def test_unchanged_value_is_a_no_op(isolated_settings, writes):
+    port = isolated_settings.get("ai_backend", "lmstudio", "port")
+    isolated_settings.set(port, "ai_backend", "lmstudio", "port")
+    assert not isolated_settings.dirty
+
+def test_batch_writes_and_notifies_once(isolated_settings, writes):
+    notified = []
+    unsubscribe = isolated_settings.subscribe("ai_backend", notified.append)
+    with isolated_settings.batch():
+        isolated_settings.set(4444, "ai_backend", "lmstudio", "port")
+        with isolated_settings.batch():
+            isolated_settings.set("example", "ai_backend", "lmstudio", "host")
+        assert not writes and not notified
+    unsubscribe()
+
+    assert len(writes) == 1
+    assert notified == [{
+        "ai_backend.lmstudio.port": 4444,
+        "ai_backend.lmstudio.host": "example"
+    }]
+
+def test_subscribers_only_see_their_keys(isolated_settings):
+    lmstudio, everything = [], []
+    unsubscribe_lmstudio = isolated_settings.subscribe("ai_backend.lmstudio", lmstudio.append)
+    unsubscribe_everything = isolated_settings.subscribe("", everything.append)
+    isolated_settings.set(64, "ui", "font", "size")
+    isolated_settings.set(4321, "ai_backend", "lmstudio", "port")
+    unsubscribe_lmstudio()
+    isolated_settings.set(4322, "ai_backend", "lmstudio", "port")
+    unsubscribe_everything()
+
+    assert lmstudio == [{"ai_backend.lmstudio.port": 4321}]
+    assert everything == [
+        {"ui.font.size": 64},
+        {"ai_backend.lmstudio.port": 4321},
+        {"ai_backend.lmstudio.port": 4322}
+    ]
@@ -0,0 +1,77 @@
+import copy
+import json
+import pytest
+from utils.settings_schema import SettingsError, SettingsSchema
+
+@pytest.fixture
+def schema(isolated_settings):
+    return SettingsSchema.load(f"{isolated_settings.config_dir}/settings_schema.json")
+
+@pytest.fixture
+def defaults(isolated_settings):
+    with open(isolated_settings.default_settings_path) as f:
+        return json.load(f)
+
+def test_strings_are_coerced_to_the_declared_type(schema):
+    assert schema.check("1234", ("ai_backend", "lmstudio", "port")) == 1234
+    assert schema.check("true", ("ai_backend", "streaming")) is True
+    assert schema.check("0.5", ("ai_backend", "generation", "temperature")) == 0.5
+
+@pytest.mark.parametrize("value, keys", [
+    (70000, ("ai_backend", "lmstudio", "port")),
+    ("openai", ("ai_backend", "active_backend")),
+    (3, ("ai_backend", "generation", "temperature")),
+    ("red", ("ui", "chat_colors", "user_bubble")),
+    ("many", ("history", "page_size"))
+])
+def test_bad_values_are_rejected(schema, value, keys):
+    with pytest.raises(SettingsError):
+        schema.check(value, keys)
+
+@pytest.mark.parametrize("value, keys", [
+    ({"lmstudio": 1.0, "bogus": 2.0}, ("routing", "priorities")),
+    ({"lmstudio": 0}, ("routing", "priorities")),
+    ([{"model": "x"}], ("fanout", "targets")),
+    ([{"backend": "nope", "model": None}], ("fanout", "targets")),
+    ({"chat": 100}, ("context", "budgets")),
+    ({"default": 0}, ("context", "budgets"))
+])
+def test_load_checker_agrees_with_jsonschema(schema, value, keys):
+    with pytest.raises(SettingsError):
+        schema.check(value, keys)
+    with pytest.raises(SettingsError):
+        schema.check(value, keys, compiled=False)
+
+def test_containers_are_coerced_at_load(schema):
+    targets = [{"backend": "lmstudio", "model": None}]
+    assert schema.check(targets, ("fanout", "targets"), compiled=False) == targets
+    assert schema.check({"default": "500"}, ("context", "budgets"), compiled=False) == {"default": 500}
+
+def test_loading_does_not_compile_validators(schema, defaults):
+    data = copy.deepcopy(defaults)
+    data["ai_backend"]["lmstudio"]["port"] = "4321"
+    data["ai_backend"]["lmstudio"]["host"] = ""
+    coerced = schema.coerce_tree(data, defaults)
+    assert coerced["ai_backend"]["lmstudio"]["port"] == 4321
+    # The empty host falls back to the default
+    assert coerced["ai_backend"]["lmstudio"]["host"] == defaults["ai_backend"]["lmstudio"]["host"]
+    assert schema._validators == {}
+
+def test_set_rejects_and_keeps_the_old_value(isolated_settings):
+    port = isolated_settings.get("ai_backend", "lmstudio", "port")
+    with pytest.raises(SettingsError):
+        isolated_settings.set(-1, "ai_backend", "lmstudio", "port")
+    assert isolated_settings.get("ai_backend", "lmstudio", "port") == port
+
+def test_rejected_value_rolls_back_the_batch(isolated_settings):
+    notified = []
+    unsubscribe = isolated_settings.subscribe("", notified.append)
+    host = isolated_settings.get("ai_backend", "lmstudio", "host")
+    with pytest.raises(SettingsError):
+        with isolated_settings.batch():
+            isolated_settings.set("example", "ai_backend", "lmstudio", "host")
+            isolated_settings.set("not a port", "ai_backend", "lmstudio", "port")
+    unsubscribe()
+    assert isolated_settings.get("ai_backend", "lmstudio", "host") == host
+    assert notified == []
+    assert not isolated_settings.dirty
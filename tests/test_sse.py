@@ -0,0 +1,51 @@
+import asyncio
+from core.metrics import RequestMetrics, current_request
+from core.sse import iter_sse_events
+from fakes import FakeResponse, FakeService
+
+def collect(response):
+    async def run():
+        return [event async for event in iter_sse_events(response)]
+    return asyncio.run(run())
+
+def test_decodes_data_lines():
+    response = FakeResponse([
+        b'data: {"choices": [{"delta": {"content": "Hel"}}]}\n',
+        b'\n',
+        b'data: {"choices": [{"delta": {"content": "lo"}}]}\n'
+    ])
+    events = collect(response)
+    assert [event["choices"][0]["delta"]["content"] for event in events] == ["Hel", "lo"]
+
+def test_stops_at_done():
+    response = FakeResponse([b'data: {"a": 1}\n', b'data: [DONE]\n', b'data: {"a": 2}\n'])
+    assert collect(response) == [{"a": 1}]
+
+def test_skips_comments_other_fields_and_bad_json():
+    response = FakeResponse([
+        b': keep-alive\n',
+        b'event: message\n',
+        b'data: not json\n',
+        b'data:{"token": {"text": "x"}}\n'
+    ])
+    assert collect(response) == [{"token": {"text": "x"}}]
+
+def test_counts_response_bytes():
+    lines = [b'data: {"a": 1}\n', b'data: [DONE]\n']
+    metrics = RequestMetrics()
+
+    async def run():
+        current_request.set(metrics)
+        return [event async for event in iter_sse_events(FakeResponse(lines))]
+
+    asyncio.run(run())
+    assert metrics.response_bytes == sum(len(line) for line in lines)
+
+def test_default_stream_is_one_delta():
+    class Plain(FakeService):
+        stream_response = FakeService.__bases__[0].stream_response
+
+    async def run():
+        return [delta async for delta in Plain(replies=["whole answer"]).stream_response("hi")]
+
+    assert asyncio.run(run()) == ["whole answer"]
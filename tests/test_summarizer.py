@@ -0,0 +1,59 @@
+import asyncio
+from core.ai_service import AIResponse
+from core.summarizer import ConversationSummarizer
+
+def turns(*stamps):
+    return [{"role": "user", "content": f"turn {stamp}", "timestamp": stamp} for stamp in stamps]
+
+def generator(text, error=None):
+    prompts = []
+
+    async def generate(prompt):
+        prompts.append(prompt)
+        return AIResponse(text, {"error": error} if error else {})
+    return generate, prompts
+
+def test_update_stores_the_summary(tmp_path):
+    path = str(tmp_path / "summary.json")
+    summarizer = ConversationSummarizer(path)
+    generate, prompts = generator("  A cube of 10 mm was made.  ")
+    assert asyncio.run(summarizer.update(turns("1", "2"), generate)) == "A cube of 10 mm was made."
+    assert "User: turn 1" in prompts[0]
+
+    reloaded = ConversationSummarizer(path)
+    assert reloaded.summary == "A cube of 10 mm was made."
+    assert reloaded.covered_until == "2"
+
+def test_previous_summary_is_folded_in(tmp_path):
+    summarizer = ConversationSummarizer(str(tmp_path / "summary.json"))
+    summarizer.summary = "Earlier facts."
+    assert "Summary so far:\nEarlier facts." in summarizer.build_prompt(turns("1"))
+
+def test_failed_generation_keeps_the_summary(tmp_path):
+    summarizer = ConversationSummarizer(str(tmp_path / "summary.json"))
+    summarizer.summary = "kept"
+    generate, _ = generator("", error="backend down")
+    assert asyncio.run(summarizer.update(turns("1"), generate)) is None
+    assert summarizer.summary == "kept"
+    assert not summarizer.updating
+
+def test_summary_is_capped(tmp_path):
+    summarizer = ConversationSummarizer(str(tmp_path / "summary.json"), max_summary_chars=10)
+    generate, _ = generator("x" * 100)
+    asyncio.run(summarizer.update(turns("1"), generate))
+    assert summarizer.summary == "x" * 10
+
+def test_uncovered_skips_summarized_turns(tmp_path):
+    summarizer = ConversationSummarizer(str(tmp_path / "summary.json"))
+    history = turns("1", "2", "3", "4")
+    assert summarizer.uncovered(history) == history
+    summarizer.covered_until = "2"
+    assert summarizer.uncovered(history) == history[2:]
+
+def test_should_update_waits_for_the_threshold(tmp_path):
+    summarizer = ConversationSummarizer(str(tmp_path / "summary.json"), threshold_tokens=10)
+    count = lambda text: len(text.split())
+    assert not summarizer.should_update(turns("1"), count)
+    assert summarizer.should_update(turns(*map(str, range(6))), count)
+    summarizer.updating = True
+    assert not summarizer.should_update(turns(*map(str, range(6))), count)
@@ -1,20 +1,54 @@
 import os
+import copy
 import json
-import jsonschema
+import atexit
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from .settings_schema import SettingsError, SettingsSchema
 
 class Settings:
-    """Settings manager for the FreeCAD AI Chat addon."""
+    """Settings manager for the FreeCAD AI Chat addon.
+    
+    Changes are kept in memory and written out once they settle: ``set``
+    marks the settings dirty and schedules a save ``SAVE_DELAY`` seconds
+    later, so a burst of changes costs a single write. Inside ``batch()``
+    nothing is scheduled and the changes are written once when the outermost
+    batch ends. Writes go to a temporary file that replaces the user
+    settings file, so a crash never leaves it half-written.
+    
+    Observers registered with ``subscribe`` are told which keys changed,
+    once per ``set`` or once per outermost batch.
+    
+    Values are checked against ``config/settings_schema.json`` when loaded
+    and on every ``set``; ``set`` raises ``SettingsError`` for values that
+    do not fit, while bad values in the user settings file fall back to
+    their defaults.
+    """
+    
+    SAVE_DELAY = 0.5
     
     def __init__(self):
         self.addon_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.config_dir = os.path.join(self.addon_path, "config")
         self.default_settings_path = os.path.join(self.config_dir, "default_settings.json")
         self.user_settings_path = os.path.join(self.config_dir, "user_settings.json")
+        self.schema = SettingsSchema.load(os.path.join(self.config_dir, "settings_schema.json"))
+        
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._batch_depth = 0
+        self._save_timer = None
+        self._subscribers = []
+        self._changes = {}
+        self._batch_snapshot = None
         
         # Load settings
         self.settings = self._load_settings()
         
+        # Write out changes still waiting for the debounce on exit
+        atexit.register(self.flush)
+        
     def _load_settings(self):
         """Load settings from files, creating user settings if needed."""
         # Load default settings
@@ -23,8 +57,7 @@ class Settings:
             
         # Create user settings if they don't exist
         if not os.path.exists(self.user_settings_path):
-            with open(self.user_settings_path, 'w') as f:
-                json.dump(default_settings, f, indent=4)
+            self._write(default_settings)
             return default_settings
             
         # Load and merge user settings
@@ -33,7 +66,7 @@ class Settings:
             
         # Merge with defaults (to ensure new settings are included)
         merged = self._merge_settings(default_settings, user_settings)
-        return merged
+        return self.schema.coerce_tree(merged, default_settings)
         
     def _merge_settings(self, default, user):
         """Recursively merge user settings with defaults."""
@@ -47,11 +80,143 @@ class Settings:
                 
         return merged
         
-    def save(self):
-        """Save current settings to user settings file."""
+    def _write(self, data):
+        """Atomically replace the user settings file with ``data``."""
         os.makedirs(os.path.dirname(self.user_settings_path), exist_ok=True)
-        with open(self.user_settings_path, 'w') as f:
-            json.dump(self.settings, f, indent=4)
+        temp_path = f"{self.user_settings_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.user_settings_path)
+        
+    def save(self):
+        """Save current settings to user settings file now."""
+        with self._lock:
+            self._cancel_save()
+            # Serialize under the lock; the write itself can happen outside
+            data = json.loads(json.dumps(self.settings))
+            self._dirty = False
+        self._write(data)
+        
+    def flush(self):
+        """Write pending changes, if any, without waiting for the debounce."""
+        with self._lock:
+            dirty = self._dirty
+        if dirty:
+            self.save()
+        
+    @property
+    def dirty(self) -> bool:
+        """Whether there are changes not yet written to disk."""
+        return self._dirty
+        
+    def _cancel_save(self):
+        """Cancel a scheduled save."""
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+        
+    def _schedule_save(self):
+        """Save after ``SAVE_DELAY`` seconds, restarting the wait on every change."""
+        self._cancel_save()
+        self._save_timer = threading.Timer(self.SAVE_DELAY, self._save_scheduled)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+        
+    def _save_scheduled(self):
+        """Run a scheduled save, unless a batch is open and will save itself."""
+        with self._lock:
+            if self._batch_depth > 0:
+                return
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Failed to save settings: {str(e)}")
+        
+    @contextmanager
+    def batch(self):
+        """Group several ``set`` calls into a single write.
+        
+        Batches nest; the changes are written when the outermost one exits.
+        If an exception (such as a ``SettingsError`` from a later ``set``)
+        leaves the outermost batch, every change made in it is rolled back
+        and nothing is written or announced.
+        """
+        with self._lock:
+            if self._batch_depth == 0:
+                self._batch_snapshot = (copy.deepcopy(self.settings), dict(self._changes), self._dirty)
+            self._batch_depth += 1
+        failed = False
+        try:
+            yield self
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                outermost = self._batch_depth == 0
+                if outermost:
+                    if failed:
+                        self.settings, self._changes, self._dirty = self._batch_snapshot
+                    self._batch_snapshot = None
+            if outermost and not failed:
+                self.flush()
+                self._notify()
+            
+    def subscribe(self, path: str, callback):
+        """Call ``callback(changes)`` when a key at or below ``path`` changes.
+        
+        ``path`` is a dotted key path such as ``"ai_backend.lmstudio.port"``
+        or ``"ai_backend"``; an empty path matches every key. ``changes`` maps
+        the dotted path of each changed leaf under ``path`` to its new value
+        (None if it was removed). Callbacks run on the thread that changed
+        the settings. Returns a function that cancels the subscription.
+        """
+        entry = (path, callback)
+        with self._lock:
+            self._subscribers.append(entry)
+        
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+        
+    @staticmethod
+    def _diff(path: str, old, new, changes: dict):
+        """Record the leaves that differ between ``old`` and ``new`` under ``path``."""
+        if isinstance(old, dict) or isinstance(new, dict):
+            old_items = old if isinstance(old, dict) else {}
+            new_items = new if isinstance(new, dict) else {}
+            for key in set(old_items) | set(new_items):
+                Settings._diff(f"{path}.{key}" if path else key,
+                               old_items.get(key), new_items.get(key), changes)
+            if not isinstance(new, dict) and old != new:
+                # A subtree replaced by a plain value
+                changes[path] = new
+        elif old != new:
+            changes[path] = new
+        
+    def _notify(self):
+        """Deliver the accumulated changes to the matching subscribers."""
+        with self._lock:
+            changes, self._changes = self._changes, {}
+            subscribers = list(self._subscribers)
+        if not changes:
+            return
+        for path, callback in subscribers:
+            matching = {
+                key: value for key, value in changes.items()
+                if not path or key == path or key.startswith(path + ".")
+            }
+            if not matching:
+                continue
+            try:
+                callback(matching)
+            except Exception as e:
+                print(f"Settings observer for '{path}' failed: {str(e)}")
             
     def get(self, *keys):
         """Get a setting value using dot notation."""
@@ -61,18 +226,38 @@ class Settings:
         return value
         
     def set(self, value, *keys):
-        """Set a setting value using dot notation."""
-        target = self.settings
-        for key in keys[:-1]:
-            target = target[key]
-        target[keys[-1]] = value
-        self.save()
+        """Set a setting value using dot notation.
+        
+        The value is validated (and coerced, e.g. ``"1234"`` to ``1234``)
+        first; ``SettingsError`` is raised if it does not fit the schema.
+        Setting a key to the value it already has is a no-op.
+        """
+        value = self.schema.check(value, keys)
+        with self._lock:
+            target = self.settings
+            for key in keys[:-1]:
+                target = target[key]
+            if keys[-1] in target and target[keys[-1]] == value:
+                return
+            self._diff(".".join(keys), target.get(keys[-1]), value, self._changes)
+            target[keys[-1]] = value
+            self._dirty = True
+            if self._batch_depth > 0:
+                return
+            self._schedule_save()
+        self._notify()
         
     def reset(self):
         """Reset settings to default."""
-        if os.path.exists(self.user_settings_path):
-            os.remove(self.user_settings_path)
-        self.settings = self._load_settings()
+        with self._lock:
+            self._cancel_save()
+            self._dirty = False
+            if os.path.exists(self.user_settings_path):
+                os.remove(self.user_settings_path)
+            old_settings = self.settings
+            self.settings = self._load_settings()
+            self._diff("", old_settings, self.settings, self._changes)
+        self._notify()
         
     def get_ai_backend_config(self):
         """Get current AI backend configuration."""
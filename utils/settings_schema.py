@@ -0,0 +1,240 @@
+import re
+import json
+from typing import Dict, Optional, Tuple
+
+class SettingsError(ValueError):
+    """A settings value that does not match the schema."""
+
+    def __init__(self, path: str, message: str):
+        super().__init__(f"{path}: {message}" if path else message)
+        self.path = path
+
+# Strings accepted for booleans in hand-edited settings files
+TRUE_STRINGS = ("true", "yes", "on", "1")
+FALSE_STRINGS = ("false", "no", "off", "0")
+
+_INVALID = object()
+
+def _convert(value, kind: str):
+    """Return ``value`` as JSON schema type ``kind``, or ``_INVALID``."""
+    if kind == "null":
+        return None if value is None else _INVALID
+    if kind == "boolean":
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            lowered = value.strip().lower()
+            if lowered in TRUE_STRINGS:
+                return True
+            if lowered in FALSE_STRINGS:
+                return False
+        return _INVALID
+    if kind in ("integer", "number"):
+        # bool is an int subclass, but True is not a port number
+        if isinstance(value, bool):
+            return _INVALID
+        if isinstance(value, str):
+            try:
+                value = float(value.strip()) if kind == "number" or "." in value else int(value.strip())
+            except ValueError:
+                return _INVALID
+        if kind == "integer":
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            return value if isinstance(value, int) else _INVALID
+        return value if isinstance(value, (int, float)) else _INVALID
+    if kind == "string":
+        return value if isinstance(value, str) else _INVALID
+    if kind == "object":
+        return value if isinstance(value, dict) else _INVALID
+    if kind == "array":
+        return value if isinstance(value, list) else _INVALID
+    return _INVALID
+
+def _inline_refs(node, root):
+    """Return ``node`` with local ``#/...`` references replaced by their targets."""
+    if isinstance(node, dict):
+        if "$ref" in node:
+            target = root
+            for part in node["$ref"].lstrip("#/").split("/"):
+                target = target[part]
+            return _inline_refs(target, root)
+        return {key: _inline_refs(value, root) for key, value in node.items() if key != "definitions"}
+    if isinstance(node, list):
+        return [_inline_refs(item, root) for item in node]
+    return node
+
+class SettingsSchema:
+    """Validates and coerces settings against the bundled JSON schema.
+
+    Scalar values are checked by a small hand-written checker covering the
+    keywords the schema uses (type, enum, bounds, pattern, minLength), so a
+    ``set`` costs a few dictionary lookups. Objects and arrays passed to
+    ``set`` are checked by ``jsonschema`` validators compiled once per key
+    path and cached. Loading the settings file walks objects and arrays
+    with the hand-written checker instead (properties, additionalProperties,
+    propertyNames, required, items), so startup never imports
+    ``jsonschema``. Strings holding numbers or booleans (a hand-edited
+    ``"port": "1234"``) are coerced to the declared type.
+    """
+
+    def __init__(self, schema: Dict):
+        self.schema = _inline_refs(schema, schema)
+        self._subschemas: Dict[Tuple[str, ...], Optional[Dict]] = {}
+        self._validators = {}
+        self._patterns = {}
+
+    @classmethod
+    def load(cls, path: str):
+        """Load a schema file."""
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def subschema(self, keys: Tuple[str, ...]) -> Optional[Dict]:
+        """Return the schema for a key path, or None for keys it does not describe."""
+        if keys in self._subschemas:
+            return self._subschemas[keys]
+        node = self.schema
+        for key in keys:
+            properties = node.get("properties", {})
+            if key in properties:
+                node = properties[key]
+            elif isinstance(node.get("additionalProperties"), dict):
+                node = node["additionalProperties"]
+            else:
+                node = None
+                break
+        self._subschemas[keys] = node
+        return node
+
+    def _validator(self, keys: Tuple[str, ...], schema: Dict):
+        """Return the compiled ``jsonschema`` validator for a key path."""
+        validator = self._validators.get(keys)
+        if validator is None:
+            # Imported on first use; most checks never need it
+            import jsonschema
+            validator_class = jsonschema.validators.validator_for(schema)
+            validator_class.check_schema(schema)
+            validator = validator_class(schema)
+            self._validators[keys] = validator
+        return validator
+
+    def check(self, value, keys: Tuple[str, ...], compiled: bool = True):
+        """Return ``value`` coerced for the key path, or raise ``SettingsError``.
+
+        With ``compiled`` unset, objects and arrays are checked by the
+        hand-written checker rather than ``jsonschema``.
+        """
+        schema = self.subschema(keys)
+        if schema is None:
+            return value
+        return self._check_node(value, schema, ".".join(keys), keys if compiled else None)
+
+    def _check_node(self, value, schema: Dict, path: str, keys: Optional[Tuple[str, ...]]):
+        """Check ``value`` against ``schema``; ``keys`` selects the compiled validator."""
+        kinds = schema.get("type")
+        if kinds is not None:
+            for kind in ([kinds] if isinstance(kinds, str) else kinds):
+                converted = _convert(value, kind)
+                if converted is not _INVALID:
+                    value = converted
+                    break
+            else:
+                expected = kinds if isinstance(kinds, str) else " or ".join(kinds)
+                raise SettingsError(path, f"expected {expected}, got {value!r}")
+
+        if isinstance(value, (dict, list)):
+            if keys is None:
+                return self._check_container(value, schema, path)
+            error = self._first_error(self._validator(keys, schema), value)
+            if error is not None:
+                error_path = ".".join([path] + [str(part) for part in error.path])
+                raise SettingsError(error_path, error.message)
+            return value
+
+        if "enum" in schema and value not in schema["enum"]:
+            choices = ", ".join(repr(choice) for choice in schema["enum"])
+            raise SettingsError(path, f"{value!r} is not one of {choices}")
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if "minimum" in schema and value < schema["minimum"]:
+                raise SettingsError(path, f"{value!r} is less than {schema['minimum']}")
+            if "maximum" in schema and value > schema["maximum"]:
+                raise SettingsError(path, f"{value!r} is greater than {schema['maximum']}")
+            if "exclusiveMinimum" in schema and value <= schema["exclusiveMinimum"]:
+                raise SettingsError(path, f"{value!r} must be greater than {schema['exclusiveMinimum']}")
+        if isinstance(value, str):
+            if len(value) < schema.get("minLength", 0):
+                raise SettingsError(path, "must not be empty")
+            if "pattern" in schema:
+                pattern = self._patterns.get(schema["pattern"])
+                if pattern is None:
+                    pattern = self._patterns[schema["pattern"]] = re.compile(schema["pattern"])
+                if not pattern.search(value):
+                    raise SettingsError(path, f"{value!r} does not match {schema['pattern']}")
+        return value
+
+    def _check_container(self, value, schema: Dict, path: str):
+        """Check the members of an object or array with the hand-written checker."""
+        if isinstance(value, list):
+            items = schema.get("items")
+            if not isinstance(items, dict):
+                return value
+            return [
+                self._check_node(item, items, f"{path}.{index}", None)
+                for index, item in enumerate(value)
+            ]
+
+        for key in schema.get("required", ()):
+            if key not in value:
+                raise SettingsError(path, f"{key!r} is a required property")
+        names = schema.get("propertyNames", {}).get("enum")
+        properties = schema.get("properties", {})
+        additional = schema.get("additionalProperties")
+        result = {}
+        for key, item in value.items():
+            if names is not None and key not in names:
+                raise SettingsError(path, f"{key!r} is not one of {', '.join(repr(name) for name in names)}")
+            item_schema = properties.get(key, additional if isinstance(additional, dict) else None)
+            if item_schema is not None:
+                item = self._check_node(item, item_schema, f"{path}.{key}", None)
+            elif additional is False:
+                raise SettingsError(path, f"unexpected property {key!r}")
+            result[key] = item
+        return result
+
+    @staticmethod
+    def _first_error(validator, value):
+        """Return the most relevant validation error, or None."""
+        from jsonschema.exceptions import best_match
+        return best_match(validator.iter_errors(value))
+
+    def validate(self, data: Dict):
+        """Validate a whole settings tree with the compiled validator."""
+        error = self._first_error(self._validator((), self.schema), data)
+        if error is not None:
+            raise SettingsError(".".join(str(part) for part in error.path), error.message)
+
+    def coerce_tree(self, data: Dict, defaults: Dict, keys: Tuple[str, ...] = ()) -> Dict:
+        """Validate a loaded settings tree, coercing values where possible.
+
+        Values that cannot be coerced fall back to ``defaults`` with a
+        warning, so one bad entry in ``user_settings.json`` does not stop the
+        addon from loading.
+        """
+        result = {}
+        for key, value in data.items():
+            path = keys + (key,)
+            schema = self.subschema(path)
+            default = defaults.get(key) if isinstance(defaults, dict) else None
+            if (schema is not None and "properties" in schema and
+                    isinstance(value, dict)):
+                result[key] = self.coerce_tree(value, default or {}, path)
+                continue
+            try:
+                result[key] = self.check(value, path, compiled=False)
+            except SettingsError as e:
+                if default is None:
+                    raise
+                print(f"Invalid setting {e}; using the default {default!r}")
+                result[key] = default
+        return result